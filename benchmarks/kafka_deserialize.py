@@ -0,0 +1,91 @@
+"""Benchmark of deserializing Kafka message bodies into events.
+
+Compares deserializing and validating every message on its own with
+:func:`serializer.loads`, as the Kafka reader does without batch mode, to
+:func:`serializer.loads_batch` on whole polls of messages, run inline and on the
+reader's thread and process pools::
+
+    python -m benchmarks.kafka_deserialize --events 20000 --workers 4
+"""
+import argparse
+import os
+import sys
+import timeit
+from functools import partial
+
+from uptimer.events import ProbeEvent, serializer
+from uptimer.plugins.readers.kafka import DESERIALIZER_POOLS
+
+
+def make_bodies(count):
+    return [
+        serializer.dumps(
+            ProbeEvent(
+                protocol="https",
+                hostname="example.com",
+                port=443,
+                path="/",
+                status_code=200,
+                response_time_ms=idx % 1000,
+                error="",
+                regex="Example Domain",
+                matches_regex=True,
+                validate=False,
+            )
+        )
+        for idx in range(count)
+    ]
+
+
+def loads_each(bodies):
+    return [serializer.loads(body) for body in bodies]
+
+
+def loads_pooled(pool_name, workers):
+    def loads(bodies):
+        chunk_size = -(-len(bodies) // workers)
+        chunks = [
+            bodies[start : start + chunk_size]
+            for start in range(0, len(bodies), chunk_size)
+        ]
+        with DESERIALIZER_POOLS[pool_name](workers) as pool:
+            return [
+                batch
+                for batches in pool.map(serializer.loads_batch, chunks)
+                for batch in batches
+            ]
+
+    return loads
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    bodies = make_bodies(args.events)
+    results = {}
+    for name, loads in (
+        ("loads per message", loads_each),
+        ("loads_batch", serializer.loads_batch),
+        (f"loads_batch, {args.workers} threads", loads_pooled("thread", args.workers)),
+        (
+            f"loads_batch, {args.workers} processes",
+            loads_pooled("process", args.workers),
+        ),
+    ):
+        timing = min(
+            timeit.repeat(partial(loads, bodies), number=1, repeat=args.repeat)
+        )
+        results[name] = args.events / timing
+        sys.stdout.write(f"{name:<32} {results[name]:>12,.0f} events/s\n")
+
+    before, *after = results.values()
+    for name, rate in zip(list(results)[1:], after):
+        sys.stdout.write(f"{'speedup of ' + name:<32} {rate / before:>12.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
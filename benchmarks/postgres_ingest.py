@@ -0,0 +1,146 @@
+"""Benchmark of writing probe events to Postgres.
+
+Compares the throughput of the postgres writer's ingest paths: INSERT statements sent
+through :func:`psycopg2.extras.execute_batch`, and a single ``COPY ... FROM STDIN``
+in text and in binary format. Rows are written to a temporary table shaped like the
+``probe_events`` table, in pages as the writer does::
+
+    DATABASE_URL=postgres://postgres@localhost/test_db \\
+        python -m benchmarks.postgres_ingest --events 20000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+from psycopg2 import sql
+from psycopg2.extras import execute_batch
+
+from uptimer.events import ProbeEvent
+from uptimer.helpers.pgcopy import copy_rows, get_column_types
+from uptimer.helpers.postgres import get_postgres_conn
+
+TABLE = "benchmark_probe_events"
+COLUMN_TYPES = {
+    "uuid": "uuid",
+    "event_time": "timestamptz",
+    "schema_title": "varchar",
+    "schema_version": "varchar",
+    "protocol": "varchar",
+    "hostname": "varchar",
+    "port": "integer",
+    "path": "varchar",
+    "status_code": "integer",
+    "response_time_ms": "integer",
+    "error": "varchar",
+    "regex": "varchar",
+    "matches_regex": "boolean",
+    "dns_ms": "integer",
+    "connect_ms": "integer",
+    "tls_ms": "integer",
+    "ttfb_ms": "integer",
+    "transfer_ms": "integer",
+}
+
+
+def make_rows(count):
+    return [
+        ProbeEvent(
+            protocol="https",
+            hostname="example.com",
+            port=443,
+            path="/",
+            status_code=200,
+            response_time_ms=idx % 1000,
+            regex="Example Domain",
+            matches_regex=True,
+            dns_ms=1,
+            connect_ms=10,
+            tls_ms=20,
+            ttfb_ms=30,
+            transfer_ms=idx % 7,
+            validate=False,
+        ).to_tuple()
+        for idx in range(count)
+    ]
+
+
+def insert_pages(cursor, pages):
+    query = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
+        sql.Identifier(TABLE),
+        sql.SQL(", ").join(map(sql.Identifier, ProbeEvent.properties)),
+        sql.SQL(", ").join(sql.Placeholder() * len(ProbeEvent.properties)),
+    )
+    for page in pages:
+        execute_batch(cursor, query, page, page_size=len(page))
+
+
+def copy_pages(copy_format):
+    def copy(cursor, pages):
+        column_types = get_column_types(cursor, TABLE)
+        for page in pages:
+            copy_rows(
+                cursor,
+                TABLE,
+                ProbeEvent.properties,
+                page,
+                copy_format=copy_format,
+                column_types=column_types,
+            )
+
+    return copy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    if not args.database_url:
+        parser.error("Set --database-url or the DATABASE_URL environment variable")
+
+    connection = get_postgres_conn(args.database_url)
+    rows = make_rows(args.events)
+    pages = [
+        rows[start : start + args.page_size]
+        for start in range(0, len(rows), args.page_size)
+    ]
+
+    with connection.cursor() as cursor:
+        columns = sql.SQL(", ").join(
+            sql.SQL("{} {}").format(sql.Identifier(name), sql.SQL(type_))
+            for name, type_ in COLUMN_TYPES.items()
+        )
+        cursor.execute(
+            sql.SQL("CREATE TEMPORARY TABLE {} ({})").format(
+                sql.Identifier(TABLE), columns
+            )
+        )
+        results = {}
+        for name, write in (
+            ("INSERT (execute_batch)", insert_pages),
+            ("COPY text", copy_pages("text")),
+            ("COPY binary", copy_pages("binary")),
+        ):
+            timings = []
+            for _ in range(args.repeat):
+                cursor.execute(sql.SQL("TRUNCATE {}").format(sql.Identifier(TABLE)))
+                connection.commit()
+                timings.append(
+                    timeit.timeit(lambda write=write: write(cursor, pages), number=1)
+                )
+                connection.commit()
+            results[name] = args.events / min(timings)
+            sys.stdout.write(f"{name:<26} {results[name]:>12,.0f} events/s\n")
+        cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(TABLE)))
+    connection.commit()
+
+    before, *after = results.values()
+    for name, rate in zip(list(results)[1:], after):
+        sys.stdout.write(f"{'speedup of ' + name:<26} {rate / before:>12.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
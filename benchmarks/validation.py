@@ -0,0 +1,86 @@
+"""Benchmark of validating events against their JSON schema.
+
+Compares the validation through the per-class compiled validator used by
+:meth:`Event.validate` to the previous approach of calling :func:`jsonschema.validate`
+on the event's JSON round-tripped `naive_repr`, which checks the schema and creates a
+new validator for every event, and to the column by column validation of an
+:class:`EventBatch` holding all events::
+
+    python -m benchmarks.validation --events 5000
+"""
+import argparse
+import sys
+import timeit
+
+import jsonschema
+
+from uptimer.events import EventBatch, ProbeEvent
+from uptimer.events.formats import format_checker
+
+
+def make_event():
+    return ProbeEvent(
+        protocol="https",
+        hostname="example.com",
+        port=443,
+        path="/",
+        status_code=200,
+        response_time_ms=123,
+        error="",
+        regex="Example Domain",
+        matches_regex=True,
+        validate=False,
+    )
+
+
+def validate_round_trip(event):
+    jsonschema.validate(
+        instance=event.naive_repr,
+        schema=event.schema_spec,
+        resolver=event._resolver,
+        format_checker=format_checker,
+    )
+
+
+def validate_compiled(event):
+    event.validate()
+
+
+def validate_events(validate):
+    return lambda events: [validate(event) for event in events]
+
+
+def validate_batch(events):
+    EventBatch(ProbeEvent, events).errors()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    events = [make_event() for _ in range(args.events)]
+    results = {}
+    for name, validate in (
+        ("jsonschema.validate(naive_repr)", validate_events(validate_round_trip)),
+        ("compiled validator", validate_events(validate_compiled)),
+        ("columnar EventBatch", validate_batch),
+    ):
+        best = min(
+            timeit.repeat(
+                lambda validate=validate: validate(events),
+                repeat=args.repeat,
+                number=1,
+            )
+        )
+        results[name] = args.events / best
+        sys.stdout.write(f"{name:<34} {results[name]:>12,.0f} events/s\n")
+
+    before, *after = results.values()
+    for name, rate in zip(list(results)[1:], after):
+        sys.stdout.write(f"{'speedup of ' + name:<34} {rate / before:>12.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
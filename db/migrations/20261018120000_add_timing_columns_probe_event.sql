@@ -0,0 +1,13 @@
+-- migrate:up
+ALTER TABLE probe_events ADD COLUMN dns_ms integer;
+ALTER TABLE probe_events ADD COLUMN connect_ms integer;
+ALTER TABLE probe_events ADD COLUMN tls_ms integer;
+ALTER TABLE probe_events ADD COLUMN ttfb_ms integer;
+ALTER TABLE probe_events ADD COLUMN transfer_ms integer;
+
+-- migrate:down
+ALTER TABLE probe_events DROP COLUMN dns_ms;
+ALTER TABLE probe_events DROP COLUMN connect_ms;
+ALTER TABLE probe_events DROP COLUMN tls_ms;
+ALTER TABLE probe_events DROP COLUMN ttfb_ms;
+ALTER TABLE probe_events DROP COLUMN transfer_ms;
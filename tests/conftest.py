@@ -143,15 +143,16 @@ mock_postgres_tuple = namedtuple(
 
 @pytest.fixture()
 def mockpg(mocker):
-    get_conn = mocker.patch("uptimer.plugins.writers.postgres.get_postgres_conn")
-    get_conn.return_values = mocker.MagicMock(name="connection instance")
-    get_conn.return_value.cursor = mocker.MagicMock()
-    get_conn.return_value.cursor.return_value = mocker.MagicMock()
+    get_pool = mocker.patch("uptimer.plugins.writers.postgres.get_postgres_pool")
+    connection = mocker.MagicMock(name="connection instance")
+    connection.cursor = mocker.MagicMock()
+    connection.cursor.return_value = mocker.MagicMock()
+    get_pool.return_value.connection.return_value.__enter__.return_value = connection
 
     return mock_postgres_tuple(
-        get_conn.return_value,
-        get_conn.return_value.cursor,
-        get_conn.return_value.cursor.return_value.__enter__.return_value,
+        connection,
+        connection.cursor,
+        connection.cursor.return_value.__enter__.return_value,
     )
 
 
@@ -18,6 +18,9 @@ class FixtureTestReader(BasePlugin):
     def read(self):
         return static_yield
 
+    def acknowledge(self, items):
+        pass
+
 
 def test_static_reader_writer(mocker):
     writer = mocker.MagicMock()
@@ -25,6 +28,8 @@ def test_static_reader_writer(mocker):
 
     static_reader_writer_processor(writer, FixtureTestReader)
     writer.write.assert_called_with(static_yield)
+    # The writer reports the events it has written back to the reader
+    assert writer.on_written.__func__ is FixtureTestReader.acknowledge
 
 
 def test_queue_processor(mocker):
@@ -1,12 +1,15 @@
+import pickle
 from datetime import datetime
 from json import JSONDecodeError
 from uuid import UUID as uuid
 
+import jsonschema
 import pytest
 from jsonschema import ValidationError
 
 from tests.events.event_fixtures import DoublyNestedEvent, SimpleEvent, TypecastingEvent
 from uptimer.events import Event
+from uptimer.events.formats import format_checker
 from uptimer.events.meta import EventDefinitionError
 
 
@@ -42,6 +45,11 @@ def test_nested_schema_properties():
         "error",
         "regex",
         "matches_regex",
+        "dns_ms",
+        "connect_ms",
+        "tls_ms",
+        "ttfb_ms",
+        "transfer_ms",
         "customer",
         "cool_thing",
         "something_nested",
@@ -78,6 +86,124 @@ def test_datetime_validation():
         Event(event_time="boat", uuid="52c76d2c-514f-49ba-b8f7-09065b214e95")
 
 
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"event_time": datetime(2021, 1, 5, 12, 34), "uuid": uuid(int=1)},
+        {"event_time": "2021-01-05T12:34:00+00:00", "uuid": str(uuid(int=1))},
+        {"event_time": "boat"},
+        {"event_time": 1609850040},
+        {"uuid": "not-a-uuid"},
+        {"uuid": 1},
+        {"schema_version": datetime(2021, 1, 5, 12, 34)},
+        {"schema_title": ["Event"]},
+    ],
+)
+def test_native_validation_matches_json_validation(data):
+    testevent = Event(validate=False, **data)
+
+    def validate_json():
+        jsonschema.validate(
+            instance=testevent.naive_repr,
+            schema=testevent.schema_spec,
+            format_checker=format_checker,
+        )
+
+    try:
+        validate_json()
+    except ValidationError:
+        with pytest.raises(ValidationError):
+            testevent.validate()
+    else:
+        testevent.validate()
+
+
+def test_validation_skips_json_round_trip(mocker):
+    validate = mocker.spy(jsonschema, "validate")
+    naive_repr = mocker.patch.object(
+        Event, "naive_repr", new_callable=mocker.PropertyMock
+    )
+
+    SimpleEvent(data="some", more_data="data")
+
+    validate.assert_not_called()
+    naive_repr.assert_not_called()
+    assert SimpleEvent._validator is not Event._validator
+
+
+def test_validation_tracking():
+    testevent = Event(validate=False)
+    assert testevent.is_validated is False
+
+    testevent.validate()
+    assert testevent.is_validated is True
+
+    testevent["event_time"] = datetime(2021, 1, 5, 12, 34)
+    assert testevent.is_validated is False
+    testevent.ensure_validated()
+    assert testevent.is_validated is True
+
+    del testevent["uuid"]
+    assert testevent.is_validated is False
+    with pytest.raises(ValidationError):
+        testevent.ensure_validated()
+    assert testevent.is_validated is False
+
+
+def test_compact_storage():
+    testevent = SimpleEvent(data="some", more_data="data", not_in_schema=42)
+
+    assert not hasattr(testevent, "__dict__")
+    assert len(testevent._values) == len(SimpleEvent.properties)
+    assert list(testevent) == [
+        "schema_title",
+        "schema_version",
+        "uuid",
+        "event_time",
+        "data",
+        "more_data",
+        "not_in_schema",
+    ]
+    assert len(testevent) == 7
+    assert testevent["not_in_schema"] == 42
+    assert "data" in testevent and "not_in_schema" in testevent
+
+    del testevent["data"]
+    del testevent["not_in_schema"]
+    assert "data" not in testevent and "not_in_schema" not in testevent
+    assert len(testevent) == 5
+    for key in ("data", "not_in_schema", "unknown"):
+        with pytest.raises(KeyError):
+            testevent[key]
+        with pytest.raises(KeyError):
+            del testevent[key]
+    assert testevent.get("data") is None
+
+    testevent["data"] = "again"
+    assert testevent["data"] == "again"
+    assert testevent == pickle.loads(pickle.dumps(testevent))
+
+
+def test_to_tuple():
+    testevent = SimpleEvent(data="some", more_data="data")
+    del testevent["more_data"]
+
+    assert testevent.to_tuple() == (
+        "SimpleEvent",
+        "0.1.0",
+        testevent["uuid"],
+        testevent["event_time"],
+        "some",
+        None,
+    )
+    assert testevent.to_tuple(SimpleEvent.properties) == testevent.to_tuple()
+    assert testevent.to_tuple(["more_data", "data", "unknown"]) == (
+        None,
+        "some",
+        None,
+    )
+
+
 def test_collection_methods():
     testevent = Event()
     keys = ["uuid", "event_time", "schema_title", "schema_version"]
@@ -288,6 +414,21 @@ def test_subclassing_missing_schema():
     assert "Cannot resolve schema path" in str(excinfo.value)
 
 
+def test_subclassing_invalid_schema(tmp_path):
+    schema_file = tmp_path / "broken-event.json"
+    schema_file.write_text(
+        '{"title": "BrokenEvent", "version": "0.1.0", "type": "no-such-type"}'
+    )
+
+    with pytest.raises(EventDefinitionError) as excinfo:
+
+        class BrokenEvent(Event):
+            schema = str(schema_file)
+            table = "dummy_mapping"
+
+    assert "is invalid" in str(excinfo.value)
+
+
 def test_subclassing_missing_table():
     with pytest.raises(ValueError) as excinfo:
 
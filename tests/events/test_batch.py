@@ -0,0 +1,175 @@
+import json
+import pickle
+from datetime import datetime, timezone
+from uuid import UUID
+
+import pytest
+from jsonschema import ValidationError
+
+from tests.events.event_fixtures import SimpleEvent, TypecastingEvent
+from uptimer.events import EventBatch, ProbeEvent
+from uptimer.events.batch import validation_plan
+
+
+def make_probe_event(**kwargs):
+    data = dict(
+        protocol="https",
+        hostname="example.com",
+        port=443,
+        path="/",
+        status_code=200,
+        response_time_ms=42,
+        dns_ms=None,
+    )
+    data.update(kwargs)
+    return ProbeEvent(**data)
+
+
+def make_batch(count=3, **kwargs):
+    return EventBatch(
+        ProbeEvent,
+        [make_probe_event(response_time_ms=idx, **kwargs) for idx in range(count)],
+    )
+
+
+def test_batch_columns():
+    events = [make_probe_event(response_time_ms=idx) for idx in range(3)]
+    batch = EventBatch(ProbeEvent, events)
+
+    assert len(batch) == 3
+    assert list(batch.columns) == ProbeEvent.properties
+    assert batch.columns["response_time_ms"] == [0, 1, 2]
+    assert batch.columns["uuid"] == [event["uuid"] for event in events]
+    # Properties that are not set are None in their column
+    assert batch.columns["error"] == [None] * 3
+
+
+def test_batch_events():
+    events = [make_probe_event(response_time_ms=idx) for idx in range(3)]
+    batch = EventBatch.from_events(events)
+
+    assert batch.event_type is ProbeEvent
+    assert list(batch) == events
+    assert batch[1] == events[1] and batch[-1] == events[-1]
+    assert "error" not in batch[0]
+    assert list(batch[1:]) == events[1:]
+    assert isinstance(batch[1:], EventBatch)
+
+
+def test_batch_rejects_other_events():
+    batch = make_batch()
+    with pytest.raises(ValueError):
+        batch.append(SimpleEvent(data="some", more_data="data"))
+    with pytest.raises(ValueError):
+        batch.append(make_probe_event(not_in_schema=True, validate=False))
+    with pytest.raises(ValueError):
+        EventBatch.from_events([])
+    assert len(batch) == 3
+
+
+def test_batch_rows():
+    events = [make_probe_event(response_time_ms=idx) for idx in range(3)]
+    batch = EventBatch(ProbeEvent, events)
+
+    assert batch.rows() == [event.to_tuple() for event in events]
+    assert batch.rows(["port", "response_time_ms", "missing"]) == [
+        (443, idx, None) for idx in range(3)
+    ]
+
+
+def test_batch_to_json():
+    events = [make_probe_event(response_time_ms=idx) for idx in range(3)]
+    batch = EventBatch(ProbeEvent, events)
+
+    assert json.loads(batch.to_json()) == [event.naive_repr for event in events]
+    assert [json.loads(body) for body in batch.iter_json(sort_keys=True)] == [
+        event.naive_repr for event in events
+    ]
+
+
+def test_batch_validation_tracking():
+    batch = make_batch()
+    assert batch.is_validated
+
+    batch.append(make_probe_event(validate=False))
+    assert not batch.is_validated
+    batch.validate()
+    assert batch.is_validated
+
+
+def test_batch_columnar_validation():
+    assert validation_plan(ProbeEvent) is not None
+    assert validation_plan(TypecastingEvent) is not None
+
+    batch = make_batch()
+    assert batch.errors() == {}
+
+    batch.extend(
+        [
+            make_probe_event(port=0, validate=False),
+            make_probe_event(port="443", validate=False),
+            make_probe_event(response_time_ms=-1, validate=False),
+            make_probe_event(dns_ms=2.5, validate=False),
+            make_probe_event(uuid="nope", validate=False),
+            make_probe_event(status_code=True, validate=False),
+        ]
+    )
+    event = make_probe_event(validate=False)
+    del event["hostname"]
+    batch.append(event)
+
+    errors = batch.errors()
+    assert sorted(errors) == list(range(3, 10))
+    assert "port" in errors[3] and "minimum" in errors[3]
+    assert "hostname" in errors[9]
+
+    with pytest.raises(ValidationError):
+        batch.validate()
+    assert not batch.is_validated
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        {"port": 65535},
+        {"port": 65536},
+        {"port": 8080.0},
+        {"port": None},
+        {"regex": None},
+        {"regex": 5},
+        {"matches_regex": 1},
+        {"tls_ms": 0},
+        {"tls_ms": -1},
+        {"event_time": "2020-02-21T11:56:52.399558+00:00"},
+        {"event_time": "yesterday"},
+        {"uuid": "0e436b7c-4814-46ec-bcbc-3884060f735b"},
+        {"uuid": UUID("0e436b7c-4814-46ec-bcbc-3884060f735b")},
+        {"event_time": datetime(2020, 2, 21, tzinfo=timezone.utc)},
+    ],
+)
+def test_batch_validation_matches_events(values):
+    event = make_probe_event(validate=False, **values)
+    batch = EventBatch(ProbeEvent, [make_probe_event(), event])
+
+    try:
+        event.validate()
+        expected = set()
+    except ValidationError:
+        expected = {1}
+    assert set(batch.errors()) == expected
+
+
+def test_batch_valid():
+    batch = make_batch()
+    batch.append(make_probe_event(port=0, validate=False))
+    batch.append(make_probe_event(validate=False))
+
+    valid, errors = batch.valid()
+    assert list(errors) == [3]
+    assert len(valid) == 4 and valid.is_validated
+    assert valid.valid() == (valid, {})
+
+
+def test_batch_pickle():
+    batch = make_batch()
+    assert list(pickle.loads(pickle.dumps(batch))) == list(batch)
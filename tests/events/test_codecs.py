@@ -0,0 +1,109 @@
+from datetime import datetime, timezone
+from uuid import UUID
+
+import pytest
+
+from uptimer.events import DummyEvent, EventBatch
+from uptimer.events.codecs import (
+    MsgpackCodec,
+    from_epoch,
+    from_row,
+    get_codec,
+    to_epoch,
+    to_row,
+)
+from uptimer.events.serializer import loads_batch
+from uptimer.exceptions import ImproperlyConfigured
+
+
+def make_events(count):
+    return [
+        DummyEvent(target="t", reader="r", integer_value=idx, float_value=1.5)
+        for idx in range(count)
+    ]
+
+
+def test_epoch():
+    timestamp = datetime(2021, 3, 4, 5, 6, 7, 891011, tzinfo=timezone.utc)
+    assert from_epoch(to_epoch(timestamp)) == timestamp
+    # Naive datetimes are taken as UTC
+    assert to_epoch(timestamp.replace(tzinfo=None)) == to_epoch(timestamp)
+
+
+def test_rows():
+    event = make_events(1)[0]
+    row = to_row(DummyEvent, event._values)
+
+    # UUIDs and timestamps are converted by their schema format, in schema order
+    assert row[DummyEvent.properties.index("uuid")] == event["uuid"].bytes
+    assert row[DummyEvent.properties.index("event_time")] == to_epoch(
+        event["event_time"]
+    )
+    assert row[DummyEvent.properties.index("target")] == "t"
+    assert from_row(DummyEvent, row) == event._values
+
+    # Values of unexpected types are kept as they are
+    event._values[DummyEvent.properties.index("event_time")] = "2021-03-04"
+    assert "2021-03-04" in to_row(DummyEvent, event._values)
+
+
+def test_json_codec():
+    codec = get_codec("json")
+    events = make_events(2)
+    assert codec.loads(codec.dumps(events[0])) == events[0]
+    event_type, loaded = codec.loads_envelope(
+        codec.dumps_envelope(EventBatch(DummyEvent, events))
+    )
+    assert event_type is DummyEvent
+    assert list(loaded) == events
+
+
+def test_msgpack_codec():
+    pytest.importorskip("msgpack")
+    codec = get_codec("msgpack")
+    events = make_events(3)
+    del events[1]["float_value"]
+
+    event = codec.loads(codec.dumps(events[0]))
+    assert event == events[0]
+    assert isinstance(event["uuid"], UUID)
+    assert event.is_validated
+    assert len(codec.dumps(events[0])) < len(get_codec("json").dumps(events[0])) / 2
+
+    event_type, loaded = codec.loads_envelope(
+        codec.dumps_envelope(EventBatch(DummyEvent, events))
+    )
+    assert event_type is DummyEvent
+    assert [list(event) for event in loaded] == [list(event) for event in events]
+
+
+def test_msgpack_codec_missing(mocker):
+    mocker.patch("uptimer.events.codecs.import_module", side_effect=ImportError)
+    with pytest.raises(ImproperlyConfigured):
+        MsgpackCodec()
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        get_codec("xml")
+
+
+def test_msgpack_codec_schema_version(mocker):
+    msgpack = pytest.importorskip("msgpack")
+    codec = get_codec("msgpack")
+    events = make_events(2)
+    body = codec.dumps(events[0])
+    envelope = codec.dumps_envelope(EventBatch(DummyEvent, events))
+
+    # Rows of another schema version, or of another length, are not decoded
+    mocker.patch.dict(DummyEvent.schema_spec, {"version": "99.0.0"})
+    with pytest.raises(ValueError, match="schema version"):
+        codec.loads(body)
+    with pytest.raises(ValueError, match="schema version"):
+        codec.loads_envelope(envelope)
+    assert loads_batch([body], codecs=["msgpack"]) == []
+    mocker.stopall()
+
+    classname, version, present, row = msgpack.unpackb(body)
+    with pytest.raises(ValueError, match="must hold"):
+        codec.loads(msgpack.packb([classname, version, present, row[:-1]]))
@@ -1,10 +1,17 @@
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 from uuid import UUID
 
 import pytest
+from jsonschema import Draft7Validator
 
-from uptimer.events.formats import JSONEncoder, is_uuid
+from uptimer.events.formats import (
+    JSONEncoder,
+    format_checker,
+    is_uuid,
+    native_format_checker,
+    native_validator_for,
+)
 
 
 @pytest.mark.parametrize(
@@ -39,3 +46,72 @@ def test_jsonencoder_types(data_input, expected_output):
 )
 def test_format_checker_is_uuid(data_input, expected_output):
     assert is_uuid(data_input) == expected_output
+
+
+@pytest.mark.parametrize(
+    "data_input,expected_output",
+    [
+        (UUID("52c76d2c-514f-49ba-b8f7-09065b214e99"), True),
+        ("52c76d2c-514f-49ba-b8f7-09065b214e99", True),
+        ("52c76d2x-514f-49ba-b8f7-09065b214eyy", False),
+    ],
+)
+def test_native_format_checker_uuid(data_input, expected_output):
+    assert native_format_checker.conforms(data_input, "uuid") == expected_output
+
+
+@pytest.mark.parametrize(
+    "data_input,expected_output",
+    [
+        (datetime(2021, 1, 5, 12, 34), True),
+        (datetime(2021, 1, 5, 12, 34, tzinfo=timezone.utc), True),
+        ("2021-01-05T12:34:00+00:00", True),
+        ("boat", False),
+    ],
+)
+def test_native_format_checker_date_time(data_input, expected_output):
+    assert native_format_checker.conforms(data_input, "date-time") == expected_output
+
+
+ROUND_TRIP_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "when": {
+            "type": "string",
+            "format": "date-time",
+            "pattern": "^2021-",
+            "maxLength": 25,
+        },
+        "id": {"type": "string", "format": "uuid", "pattern": "^52c7"},
+        "address": {"format": "ipv4"},
+        "pair": {"const": [1, 2]},
+        "choice": {"enum": ["52c76d2c-514f-49ba-b8f7-09065b214e99"]},
+    },
+}
+EXAMPLE_UUID = UUID("52c76d2c-514f-49ba-b8f7-09065b214e99")
+
+
+@pytest.mark.parametrize(
+    "instance, expected",
+    [
+        ({"when": datetime(2021, 1, 5, 12, 34, tzinfo=timezone.utc)}, True),
+        ({"when": datetime(2021, 1, 5, 12, 34)}, True),
+        ({"when": datetime(2020, 1, 5, 12, 34, tzinfo=timezone.utc)}, False),
+        ({"when": datetime(2021, 1, 5, 12, 34, 0, 1, tzinfo=timezone.utc)}, False),
+        ({"id": EXAMPLE_UUID}, True),
+        ({"id": UUID("ffffffff-514f-49ba-b8f7-09065b214e99")}, False),
+        ({"address": EXAMPLE_UUID}, False),
+        ({"pair": (1, 2)}, True),
+        ({"choice": EXAMPLE_UUID}, True),
+    ],
+)
+def test_native_validator_matches_round_trip(instance, expected):
+    native = native_validator_for(ROUND_TRIP_SCHEMA)(
+        ROUND_TRIP_SCHEMA, format_checker=native_format_checker
+    )
+    round_trip = Draft7Validator(ROUND_TRIP_SCHEMA, format_checker=format_checker)
+
+    assert native.is_valid(instance) is expected
+    assert round_trip.is_valid(json.loads(json.dumps(instance, cls=JSONEncoder))) is (
+        expected
+    )
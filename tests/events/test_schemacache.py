@@ -1,12 +1,15 @@
-from os import path
+from os import makedirs, path, utime
+from shutil import copytree
 from unittest.mock import call
 
-from uptimer.events import SCHEMATA_PATH
-from uptimer.events.cache import SchemaCache
+import pytest
 
+from uptimer.events import SCHEMATA_PATH, Event, stubs
+from uptimer.events.cache import SchemaBundle, SchemaCache
+from uptimer.events.meta import EventMeta
 
-def test_schemacache_init(mocker):
 
+def test_schemacache_init(mocker):
     mocked_open = mocker.patch.object(SchemaCache, "__missing__")
 
     schema_cache = SchemaCache()
@@ -15,7 +18,6 @@ def test_schemacache_init(mocker):
 
 
 def test_loading_missing_schema(mocker):
-
     mocked_open = mocker.patch.object(SchemaCache, "__missing__")
     schema_cache = SchemaCache()
 
@@ -60,3 +62,117 @@ def test_return_cached_result(mocker):
     # Resolving should have cached root.json as well; call_count stays the same
     schema_cache["root.json"]
     assert mocked_open.call_count == 2
+
+
+@pytest.fixture()
+def schemata(tmp_path):
+    schemata = tmp_path / "schemata"
+    copytree(SCHEMATA_PATH, schemata)
+    return schemata
+
+
+@pytest.fixture()
+def bundle_path(tmp_path):
+    return str(tmp_path / "bundle")
+
+
+def test_schema_bundle(mocker, bundle_path, schemata):
+    bundle = SchemaBundle(bundle_path, str(schemata))
+    compiled = EventMeta.compile_schema("ProbeEvent", "probe-event.json")
+    assert bundle.get("probe-event.json") is None
+    bundle.add("probe-event.json", compiled)
+    bundle.save()
+
+    # A new process loads the bundle from disk, in a single read, as JSON
+    mocked_open = mocker.patch("builtins.open", side_effect=open)
+    bundle = SchemaBundle(bundle_path, str(schemata))
+    assert bundle.get("probe-event.json") == compiled
+    assert bundle.get("probe-event.json")["property_casts"]["uuid"] == ["uuid"]
+    mocked_open.assert_called_once_with(bundle.filename, "rb")
+
+    # Saving is skipped unless schemata have been added
+    mocked_open.reset_mock()
+    bundle.save()
+    mocked_open.assert_not_called()
+
+
+def test_schema_bundle_invalidation(bundle_path, schemata):
+    bundle = SchemaBundle(bundle_path, str(schemata))
+    bundle.add("root.json", {"schema_spec": {}})
+    bundle.save()
+
+    # Touched files are hashed again, but keep the bundle if they are unchanged
+    root = schemata / "root.json"
+    utime(root, ns=(0, 0))
+    bundle = SchemaBundle(bundle_path, str(schemata))
+    assert bundle.get("root.json") == {"schema_spec": {}}
+    assert bundle.dirty
+
+    # Changed contents discard the bundle
+    root.write_text(root.read_text() + "\n")
+    bundle = SchemaBundle(bundle_path, str(schemata))
+    assert bundle.get("root.json") is None
+
+    # As do new schema files
+    (schemata / "new-event.json").write_text("{}")
+    assert SchemaBundle(bundle_path, str(schemata)).get("root.json") is None
+
+
+def test_schema_bundle_skips_other_paths(bundle_path, schemata):
+    bundle = SchemaBundle(bundle_path, str(schemata))
+    schema = str(schemata / "probe-event.json")
+    bundle.add(schema, {})
+    bundle.save()
+    assert bundle.get(schema) is None
+    assert not path.exists(bundle_path)
+
+
+def test_schema_bundle_disabled(schemata):
+    bundle = SchemaBundle(None, str(schemata))
+    bundle.add("root.json", {"schema_spec": {}})
+    assert bundle.get("root.json") is None
+    assert SchemaBundle().directory is None
+
+
+def test_schema_bundle_unwritable(mocker, bundle_path, schemata):
+    mocker.patch("uptimer.events.cache.makedirs", side_effect=PermissionError)
+    bundle = SchemaBundle(bundle_path, str(schemata))
+    bundle.add("root.json", {"schema_spec": {}})
+    bundle.save()
+
+    # Kept in memory only
+    assert bundle.get("root.json") == {"schema_spec": {}}
+    assert SchemaBundle(bundle_path, str(schemata)).get("root.json") is None
+
+
+def test_schema_bundle_unreadable(bundle_path, schemata):
+    makedirs(bundle_path)
+    with open(path.join(bundle_path, SchemaBundle.FILENAME), "w") as bundle_fp:
+        bundle_fp.write("not json")
+    assert SchemaBundle(bundle_path, str(schemata)).get("root.json") is None
+
+
+def test_event_class_from_bundle(mocker, bundle_path, schemata):
+    bundle = SchemaBundle(bundle_path, str(schemata))
+    mocker.patch("uptimer.events.meta.schema_bundle", bundle)
+    compile_schema = mocker.spy(EventMeta, "compile_schema")
+
+    def define():
+        class DummyEvent(Event):
+            schema = "dummy-event.json"
+            table = "dummy_events"
+
+        return DummyEvent
+
+    define()
+    compile_schema.assert_called_once()
+    bundle.save()
+
+    # Later processes skip loading and checking the schema
+    bundle = SchemaBundle(bundle_path, str(schemata))
+    mocker.patch("uptimer.events.meta.schema_bundle", bundle)
+    dummy_event = define()
+    compile_schema.assert_called_once()
+    assert dummy_event.properties == stubs.DummyEvent.properties
+    assert dummy_event.property_cast_mapping == stubs.DummyEvent.property_cast_mapping
+    dummy_event(target="t", reader="r", integer_value=1, float_value=1.5)
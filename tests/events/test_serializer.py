@@ -3,8 +3,18 @@ from uuid import UUID
 
 import pytest
 
-from uptimer.events import Event
-from uptimer.events.serializer import dumps, loads
+from uptimer.events import DummyEvent, Event, EventBatch
+from uptimer.events.serializer import (
+    codec_headers,
+    dumps,
+    dumps_envelope,
+    envelope_compression,
+    envelope_headers,
+    loads,
+    loads_batch,
+    message_codec,
+)
+from uptimer.exceptions import ImproperlyConfigured
 
 FIXTURE_SERIALIZED = """
 {
@@ -30,7 +40,6 @@ FIXTURE_SERIALIZED_INCOMPLETE = """
 
 
 def test_serializer_loads():
-
     event = loads(FIXTURE_SERIALIZED)
 
     assert isinstance(event["event_time"], datetime)
@@ -52,3 +61,91 @@ def test_serializer_dumps():
     assert isinstance(dumped_event, bytes)
     assert isinstance(event, Event)
     assert event == reloaded_event
+
+
+def test_serializer_loads_batch(log):
+    events = [
+        DummyEvent(target="t", reader="r", integer_value=idx, float_value=1.5)
+        for idx in range(3)
+    ]
+    invalid = DummyEvent(
+        target="t", reader="r", integer_value="x", float_value=1.5, validate=False
+    )
+    bodies = [dumps(events[0]), dumps(Event()), dumps(invalid)]
+    bodies += [b"not json", FIXTURE_SERIALIZED_INCOMPLETE.encode()]
+    bodies += [dumps(event) for event in events[1:]]
+
+    batches = loads_batch(bodies)
+    assert [batch.event_type for batch in batches] == [DummyEvent, Event]
+    assert list(batches[0]) == events
+    assert all(batch.is_validated for batch in batches)
+    assert log.has("Dropping invalid event", event_type="DummyEvent")
+    assert log.has("Dropping message that cannot be deserialized")
+
+    batches = loads_batch(bodies, validate=False)
+    assert len(batches[0]) == 4
+    assert not batches[0].is_validated
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_serializer_envelope(compression):
+    events = [
+        DummyEvent(target="t", reader="r", integer_value=idx, float_value=1.5)
+        for idx in range(3)
+    ]
+    del events[1]["float_value"]
+    body = dumps_envelope(EventBatch(DummyEvent, events), compression)
+    headers = envelope_headers(compression)
+    assert envelope_compression(headers) == compression
+    assert envelope_compression([("other", b"")]) is None
+
+    batch = loads(body, compression=envelope_compression(headers), validate=False)
+    assert isinstance(batch, EventBatch)
+    assert list(batch) == events
+    assert [list(event) for event in batch] == [list(event) for event in events]
+
+
+def test_serializer_envelope_smaller():
+    events = [
+        DummyEvent(target="t", reader="r", integer_value=idx, float_value=1.5)
+        for idx in range(100)
+    ]
+    body = dumps_envelope(EventBatch(DummyEvent, events), "gzip")
+    assert len(body) * 5 < sum(len(dumps(event)) for event in events)
+
+
+def test_serializer_loads_batch_envelopes(log):
+    events = [
+        DummyEvent(target="t", reader="r", integer_value=idx, float_value=1.5)
+        for idx in range(3)
+    ]
+    envelope = dumps_envelope(EventBatch(DummyEvent, events[1:]), "gzip")
+    batches = loads_batch(
+        [dumps(events[0]), envelope, b"not gzip"],
+        compressions=[None, "gzip", "gzip"],
+    )
+    assert [list(batch) for batch in batches] == [events]
+    assert log.has("Dropping message that cannot be deserialized")
+
+
+def test_serializer_envelope_compressions(mocker):
+    events = [DummyEvent(target="t", reader="r", integer_value=1, float_value=1.5)]
+    with pytest.raises(ValueError):
+        dumps_envelope(EventBatch(DummyEvent, events), "rar")
+    with pytest.raises(ValueError):
+        dumps_envelope(EventBatch(DummyEvent), "gzip")
+
+    # Compressions of optional packages fail when these are not installed
+    mocker.patch(
+        "uptimer.events.serializer.import_module", side_effect=ImportError("lz4")
+    )
+    with pytest.raises(ImproperlyConfigured):
+        dumps_envelope(EventBatch(DummyEvent, events), "lz4")
+
+
+def test_serializer_codec_headers():
+    # JSON messages stay without headers
+    assert codec_headers("json") == []
+    assert message_codec([]) == "json"
+    assert message_codec(None, default="msgpack") == "msgpack"
+    assert message_codec(codec_headers("msgpack")) == "msgpack"
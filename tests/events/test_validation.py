@@ -0,0 +1,79 @@
+import pytest
+from jsonschema import ValidationError
+
+from tests.events.event_fixtures import SimpleEvent
+from uptimer.events import EventBatch
+from uptimer.events.validation import ValidationPolicy
+
+
+def make_event(**kwargs):
+    return SimpleEvent(data="some", more_data="data", **kwargs)
+
+
+@pytest.mark.parametrize(
+    "policy, expected", [("creation", True), ("writer", False), ("sampled", False)]
+)
+def test_validate_on_creation(policy, expected):
+    assert ValidationPolicy(policy).validate_on_creation is expected
+
+
+@pytest.mark.parametrize("policy", ["creation", "writer"])
+def test_validate_once(mocker, policy):
+    validation_policy = ValidationPolicy(policy)
+    event = make_event(validate=validation_policy.validate_on_creation)
+    validate = mocker.spy(SimpleEvent, "validate")
+
+    for _ in range(3):
+        assert validation_policy.validate(event) is True
+    assert validate.call_count == (0 if policy == "creation" else 1)
+
+    # Modifications require validating the event again
+    event["data"] = "changed"
+    assert validation_policy.validate(event) is True
+    event["data"] = 42
+    with pytest.raises(ValidationError):
+        validation_policy.validate(event)
+
+
+def test_validate_sampled(mocker):
+    validation_policy = ValidationPolicy("sampled", sample_rate=3)
+    events = [make_event(validate=False) for _ in range(7)]
+
+    validated = [validation_policy.validate(event) for event in events]
+
+    assert validated == [True, False, False, True, False, False, True]
+    assert [event.is_validated for event in events] == validated
+
+
+@pytest.mark.parametrize(
+    "policy, sample_rate", [("never", 1), ("creation", 0), ("sampled", -1)]
+)
+def test_invalid_policy(policy, sample_rate):
+    with pytest.raises(ValueError):
+        ValidationPolicy(policy, sample_rate=sample_rate)
+
+
+@pytest.mark.parametrize("policy", ["creation", "writer"])
+def test_validate_batch(policy):
+    validation_policy = ValidationPolicy(policy)
+    events = [make_event(validate=False) for _ in range(4)]
+    events[2]["data"] = 42
+    batch = EventBatch(SimpleEvent, events)
+
+    valid, errors = validation_policy.validate_batch(batch)
+    assert list(errors) == [2]
+    assert list(valid) == events[:2] + events[3:]
+    assert valid.is_validated
+    assert validation_policy.validate_batch(valid) == (valid, {})
+
+
+def test_validate_batch_sampled():
+    validation_policy = ValidationPolicy("sampled", sample_rate=3)
+    events = [make_event(validate=False) for _ in range(7)]
+    events[1]["data"] = 42
+    events[3]["data"] = 42
+
+    # Events 0, 3, and 6 are sampled, of which event 3 is invalid
+    valid, errors = validation_policy.validate_batch(EventBatch(SimpleEvent, events))
+    assert list(errors) == [3]
+    assert len(valid) == 6 and not valid.is_validated
@@ -0,0 +1,158 @@
+import struct
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from os import environ
+from uuid import UUID
+
+import pytest
+
+from uptimer.helpers.pgcopy import (
+    BINARY_HEADER,
+    binary_encoders,
+    copy_rows,
+    encode_binary,
+    encode_text,
+    get_column_types,
+)
+
+require_postgres = pytest.mark.skipif(
+    "TESTING_DATABASE_URL" not in environ, reason="No real TESTING_DATABASE_URL set"
+)
+
+COLUMNS = {
+    "id": "smallint",
+    "big": "bigint",
+    "flag": "boolean",
+    "ratio": "double precision",
+    "amount": "numeric",
+    "name": "varchar(32)",
+    "note": "text",
+    "uuid": "uuid",
+    "created": "timestamptz",
+    "local": "timestamp",
+    "day": "date",
+    "doc": "jsonb",
+    "port": "ip_port",
+}
+
+ROWS = [
+    (
+        1,
+        2**40,
+        True,
+        0.25,
+        Decimal("123.45"),
+        "name",
+        "tab\tnew\nline \\ backslash",
+        UUID("0e436b7c-4814-46ec-bcbc-3884060f735b"),
+        datetime(2020, 2, 21, 11, 56, 52, 399558, tzinfo=timezone.utc),
+        datetime(1999, 12, 31, 23, 59, 59),
+        date(2021, 1, 15),
+        {"key": [1, "two"]},
+        443,
+    ),
+    (
+        2,
+        -1,
+        False,
+        -1e-10,
+        -0.00001,
+        "name",
+        "",
+        UUID("00000000-0000-0000-0000-000000000001"),
+        datetime(2020, 2, 21, 12, 0, tzinfo=timezone(timedelta(hours=2))),
+        datetime(2000, 1, 1),
+        date(1970, 1, 1),
+        [],
+        1,
+    ),
+    (3, None, None, None, None, None, None, None, None, None, None, None, None),
+]
+
+
+def test_encode_text():
+    buffer = encode_text([(1, None, True, "a\tb\\c", UUID(int=1), {"k": "v"})])
+    assert buffer.read() == (
+        b'1\t\\N\tt\ta\\tb\\\\c\t00000000-0000-0000-0000-000000000001\t{"k": "v"}\n'
+    )
+
+
+def test_encode_text_encoding():
+    assert encode_text([("ünïcödé",)]).read() == "ünïcödé\n".encode("utf-8")
+    with pytest.raises(UnicodeEncodeError):
+        encode_text([("ünïcödé",)], "ascii")
+
+
+def test_encode_binary():
+    encoders = binary_encoders({"a": "integer", "b": "text"}, ["a", "b"])
+    data = encode_binary([(1, None), (2, "x")], encoders).read()
+    assert data == (
+        BINARY_HEADER
+        + struct.pack("!hiiii", 2, 4, 1, -1, 2)[: 2 + 4 + 4 + 4]
+        + struct.pack("!hii", 2, 4, 2)
+        + struct.pack("!i", 1)
+        + b"x"
+        + struct.pack("!h", -1)
+    )
+
+
+def test_binary_encoders_unsupported_type():
+    with pytest.raises(ValueError):
+        binary_encoders({"a": "point"}, ["a"])
+    with pytest.raises(ValueError):
+        binary_encoders({}, ["a"])
+
+
+@pytest.fixture()
+def copy_table(postgres_conn):
+    columns = ", ".join(f"{name} {type_}" for name, type_ in COLUMNS.items())
+    with postgres_conn.cursor() as cursor:
+        cursor.execute(f"CREATE TEMPORARY TABLE copy_test ({columns})")
+    yield "copy_test"
+    postgres_conn.rollback()
+
+
+@require_postgres
+def test_get_column_types(postgres_conn, copy_table):
+    with postgres_conn.cursor() as cursor:
+        column_types = get_column_types(cursor, copy_table)
+    assert column_types["name"] == "character varying"
+    assert column_types["created"] == "timestamp with time zone"
+    # Domains are resolved to their base type
+    assert column_types["port"] == "integer"
+
+
+@require_postgres
+@pytest.mark.parametrize("copy_format", ["text", "binary"])
+def test_copy_rows(postgres_conn, copy_table, copy_format):
+    with postgres_conn.cursor() as cursor:
+        copy_rows(cursor, copy_table, list(COLUMNS), ROWS, copy_format=copy_format)
+        cursor.execute(f"SELECT * FROM {copy_table} ORDER BY id")
+        rows = cursor.fetchall()
+
+    assert len(rows) == len(ROWS)
+    for row, expected in zip(rows, ROWS):
+        for column, value, expected_value in zip(COLUMNS, row, expected):
+            if column == "amount" and expected_value is not None:
+                # Floats are loaded into numeric columns by their shortest repr
+                expected_value = Decimal(str(expected_value))
+            assert value == expected_value, column
+
+
+@require_postgres
+@pytest.mark.parametrize(
+    "number",
+    ["0", "1", "-1", "10000", "123456789.000123", "0.0001", "1E+5", "-0.50", "1e-9"],
+)
+def test_copy_numeric(postgres_conn, copy_table, number):
+    with postgres_conn.cursor() as cursor:
+        copy_rows(
+            cursor,
+            copy_table,
+            ["id", "amount"],
+            [(1, Decimal(number))],
+            copy_format="binary",
+        )
+        cursor.execute(f"SELECT amount::text FROM {copy_table}")
+        (value,) = cursor.fetchone()
+    assert Decimal(value) == Decimal(number)
@@ -0,0 +1,158 @@
+from os import environ
+from threading import Thread
+
+import pytest
+from psycopg2 import OperationalError
+from psycopg2.errors import QueryCanceled
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+from psycopg2.pool import PoolError
+
+from uptimer.helpers.postgres import PostgresPool
+
+require_postgres = pytest.mark.skipif(
+    "TESTING_DATABASE_URL" not in environ, reason="No real TESTING_DATABASE_URL set"
+)
+
+DATABASE_URL = "postgres://postgres@localhost/test_db"
+
+
+@pytest.fixture()
+def connect(mocker):
+    def _connect(**kwargs):
+        conn = mocker.MagicMock(name="connection")
+        conn.closed = 0
+        conn.info.transaction_status = TRANSACTION_STATUS_IDLE
+        conn.kwargs = kwargs
+        return conn
+
+    return mocker.MagicMock(side_effect=_connect)
+
+
+def test_pool_sizes(mocker, connect):
+    monotonic = mocker.patch("uptimer.helpers.postgres.time.monotonic")
+    monotonic.return_value = 100.0
+    pool = PostgresPool(
+        DATABASE_URL, minconn=2, maxconn=3, idle_timeout=10, connect=connect
+    )
+    assert (pool.size, pool.idle) == (2, 2)
+
+    with pool.connection() as conn1, pool.connection() as conn2:
+        with pool.connection() as conn3:
+            assert len({id(conn1), id(conn2), id(conn3)}) == 3
+            assert (pool.size, pool.idle) == (3, 0)
+    # Keeps up to `maxconn` connections while they are idle for less than the timeout
+    assert (pool.size, pool.idle) == (3, 3)
+    with pool.connection() as conn:
+        assert conn is conn1
+    monotonic.return_value = 105.0
+    with pool.connection() as conn:
+        assert conn is conn1
+    assert (pool.size, pool.idle) == (3, 3)
+
+    # Shrinks back to `minconn` connections, closing the ones idle for longest
+    monotonic.return_value = 112.0
+    with pool.connection():
+        pass
+    assert (pool.size, pool.idle) == (2, 2)
+    conn3.close.assert_called_once()
+    conn1.close.assert_not_called()
+    conn2.close.assert_not_called()
+    assert connect.call_count == 3
+
+
+def test_pool_exhausted(connect):
+    pool = PostgresPool(DATABASE_URL, maxconn=1, timeout=0.05, connect=connect)
+    with pool.connection():
+        with pytest.raises(PoolError):
+            pool.getconn()
+
+
+def test_pool_waits_for_connection(connect):
+    pool = PostgresPool(DATABASE_URL, maxconn=1, timeout=5, connect=connect)
+    conn = pool.getconn()
+    borrowed = []
+    thread = Thread(target=lambda: borrowed.append(pool.getconn()))
+    thread.start()
+    pool.putconn(conn)
+    thread.join()
+    assert borrowed == [conn]
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"minconn": 2, "maxconn": 1}, {"maxconn": 0}, {"statement_timeout": -1}]
+)
+def test_pool_invalid_arguments(connect, kwargs):
+    with pytest.raises(ValueError):
+        PostgresPool(DATABASE_URL, connect=connect, **kwargs)
+
+
+def test_pool_statement_timeout(connect):
+    PostgresPool(DATABASE_URL, statement_timeout=500, connect=connect)
+    assert connect.call_args.kwargs["options"] == "-c statement_timeout=500"
+
+
+def test_pool_rolls_back_open_transactions(connect):
+    pool = PostgresPool(DATABASE_URL, connect=connect)
+    with pool.connection() as conn:
+        conn.info.transaction_status = TRANSACTION_STATUS_INTRANS
+    conn.rollback.assert_called_once()
+    assert pool.idle == 1
+
+
+def test_pool_replaces_dead_connections(connect):
+    pool = PostgresPool(DATABASE_URL, check_after=0, connect=connect)
+    with pool.connection() as conn:
+        conn.cursor.return_value.__enter__.return_value.execute.side_effect = (
+            OperationalError("server closed the connection unexpectedly")
+        )
+    with pool.connection() as replacement:
+        assert replacement is not conn
+    conn.close.assert_called_once()
+    assert pool.size == 1
+
+
+def test_pool_discards_failed_connects(connect):
+    pool = PostgresPool(DATABASE_URL, minconn=0, maxconn=1, connect=connect)
+    connect.side_effect = OperationalError("could not connect to server")
+    with pytest.raises(OperationalError):
+        pool.getconn()
+    assert pool.size == 0
+
+
+def test_pool_closeall(connect):
+    pool = PostgresPool(DATABASE_URL, minconn=2, connect=connect)
+    conn = pool.getconn()
+    pool.closeall()
+    assert pool.size == 1
+    with pytest.raises(PoolError):
+        pool.getconn()
+    pool.putconn(conn)
+    assert pool.size == 0
+
+
+@require_postgres
+def test_pool_reconnects_after_termination():
+    pool = PostgresPool(environ["TESTING_DATABASE_URL"], check_after=0)
+    with pool.connection() as conn:
+        backend_pid = conn.info.backend_pid
+    with PostgresPool(environ["TESTING_DATABASE_URL"]).connection() as admin:
+        with admin.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", (backend_pid,))
+        admin.commit()
+
+    with pool.connection() as conn:
+        assert conn.info.backend_pid != backend_pid
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            assert cursor.fetchone() == (1,)
+    pool.closeall()
+
+
+@require_postgres
+def test_pool_statement_timeout_enforced():
+    pool = PostgresPool(environ["TESTING_DATABASE_URL"], statement_timeout=50)
+    with pool.connection() as conn:
+        with pytest.raises(QueryCanceled):
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_sleep(1)")
+    pool.closeall()
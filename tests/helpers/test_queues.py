@@ -0,0 +1,115 @@
+from queue import Empty, Full
+from time import sleep
+
+import pytest
+
+from uptimer.helpers.queues import BoundedQueue
+
+
+def test_bounded_queue_blocks_when_full():
+    queue = BoundedQueue(2)
+    queue.put("a")
+    queue.put("b")
+    with pytest.raises(Full):
+        queue.put("c", timeout=0.01)
+    assert queue.get() == "a"
+    queue.put("c", timeout=0.01)
+    assert [queue.get_nowait() for _ in range(2)] == ["b", "c"]
+
+
+def test_bounded_queue_weights():
+    queue = BoundedQueue(5, weight=len)
+    queue.put("abc")
+    with pytest.raises(Full):
+        queue.put("abc", block=False)
+    assert queue.qsize() == 3
+
+    # Items weighing more than the queue's size are accepted when it's empty
+    queue.get()
+    queue.put("abcdefgh")
+    assert queue.full()
+    assert queue.high_watermark == 8
+
+
+def test_bounded_queue_unbounded():
+    queue = BoundedQueue()
+    for idx in range(1000):
+        queue.put(idx, block=False)
+    assert queue.qsize() == queue.high_watermark == 1000
+
+
+def test_bounded_queue_spill():
+    queue = BoundedQueue(3, weight=len, spill=True)
+    items = [[idx] * (idx % 3 + 1) for idx in range(10)]
+    for item in items:
+        queue.put(item, block=False)
+    assert queue.spilled == 8
+    assert queue.qsize() <= 3
+    assert queue.high_watermark == sum(map(len, items))
+
+    # Spilled items are loaded back in order
+    assert [queue.get_nowait() for _ in items] == items
+    assert queue.spilled == 0
+    assert queue._spill_file is None
+    with pytest.raises(Empty):
+        queue.get_nowait()
+
+
+def test_bounded_queue_put_unbounded():
+    queue = BoundedQueue(1)
+    queue.put("a")
+    queue.put_unbounded("marker")
+    assert [queue.get_nowait() for _ in range(2)] == ["a", "marker"]
+
+    # Keeps the order behind spilled items
+    queue = BoundedQueue(1, spill=True)
+    queue.put("a")
+    queue.put("b")
+    queue.put_unbounded("marker")
+    assert [queue.get_nowait() for _ in range(3)] == ["a", "b", "marker"]
+
+
+def test_bounded_queue_flush_delay():
+    queue = BoundedQueue(10, weight=len)
+    assert queue.flush_delay(3, max_age=1.0) is None
+    queue.put("a")
+    assert 0.5 < queue.flush_delay(3, max_age=1.0) <= 1.0
+    assert queue.flush_delay(3) is None
+    sleep(0.02)
+    assert queue.flush_delay(3, max_age=0.01) == 0
+
+    # Due by number of items, weight, or a full queue
+    queue.put("b")
+    queue.put("c")
+    assert queue.flush_delay(3, max_age=1.0) == 0
+    assert queue.flush_delay(10, max_weight=3, max_age=1.0) == 0
+    queue.put("defghij")
+    assert queue.flush_delay(10, max_age=1.0) == 0
+
+
+def test_bounded_queue_flush_delay_marker():
+    queue = BoundedQueue()
+    queue.put("a")
+    queue.put_unbounded("marker")
+    assert queue.flush_delay(10, max_age=60) == 0
+    assert queue.get_page(10) == ["a", "marker"]
+    queue.put("b")
+    assert queue.flush_delay(10, max_age=60) > 0
+
+
+def test_bounded_queue_get_page():
+    queue = BoundedQueue(20, weight=len, spill=True)
+    for item in ("ab", "cd", "efg", "h"):
+        queue.put(item)
+    queue.put_unbounded("!")
+    queue.put("i")
+
+    assert queue.get_page(2) == ["ab", "cd"]
+    # The first item is included regardless of its weight
+    assert queue.get_page(10, max_weight=2) == ["efg"]
+    # Pages end after markers
+    assert queue.get_page(10) == ["h", "!"]
+    assert queue.get_page(10) == ["i"]
+    assert queue.get_page(10) == []
+    assert queue.unfinished_tasks == 0
+    queue.join()
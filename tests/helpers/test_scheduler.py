@@ -0,0 +1,78 @@
+import pytest
+
+from uptimer.helpers.scheduler import Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_scheduler_fixed_cadence():
+    clock = FakeClock()
+    scheduler = Scheduler(jitter=0, clock=clock)
+    scheduler.add("a", "item-a", interval=10)
+    scheduler.add("b", "item-b", interval=25)
+
+    assert len(scheduler) == 2
+    assert scheduler.time_until_due() == 0
+    assert scheduler.pop_due() == ["item-a", "item-b"]
+    assert scheduler.time_until_due() == 10
+
+    # Popping late does not shift the cadence, the lag is recorded instead
+    clock.now = 113.0
+    assert scheduler.pop_due() == ["item-a"]
+    assert scheduler.lag == {"a": 3.0, "b": 0.0}
+    assert scheduler.time_until_due() == 7
+
+    clock.now = 125.0
+    assert scheduler.pop_due() == ["item-a", "item-b"]
+    assert scheduler.max_lag == 5.0
+
+
+def test_scheduler_skips_missed_runs():
+    clock = FakeClock()
+    scheduler = Scheduler(jitter=0, clock=clock)
+    scheduler.add("a", "item-a", interval=10)
+    scheduler.pop_due()
+
+    clock.now = 135.0
+    assert scheduler.pop_due() == ["item-a"]
+    assert scheduler.missed == {"a": 2}
+    assert scheduler.lag == {"a": 25.0}
+    assert scheduler.time_until_due() == 5
+
+
+def test_scheduler_jitter_spreads_start_times():
+    clock = FakeClock()
+    random_values = iter([0.0, 0.5, 0.9])
+    scheduler = Scheduler(jitter=0.5, clock=clock, rng=lambda: next(random_values))
+    for key in ("a", "b", "c"):
+        scheduler.add(key, key, interval=20)
+
+    assert scheduler.pop_due() == ["a"]
+    clock.now = 105.0
+    assert scheduler.pop_due() == ["b"]
+    clock.now = 109.0
+    assert scheduler.pop_due() == ["c"]
+
+
+def test_scheduler_empty():
+    scheduler = Scheduler()
+    assert scheduler.time_until_due() is None
+    assert scheduler.pop_due() == []
+    assert scheduler.max_lag == 0.0
+
+
+@pytest.mark.parametrize("kwargs", [dict(jitter=-0.1), dict(jitter=1.5)])
+def test_scheduler_invalid_jitter(kwargs):
+    with pytest.raises(ValueError):
+        Scheduler(**kwargs)
+
+
+def test_scheduler_invalid_interval():
+    with pytest.raises(ValueError):
+        Scheduler().add("a", "item-a", interval=0)
@@ -1,4 +1,6 @@
-from queue import Empty, Queue
+from queue import Queue
+from threading import Barrier, Thread
+from time import monotonic, sleep
 from unittest.mock import call
 
 import pytest
@@ -50,46 +52,69 @@ def test_processing_thread_create_queues(mocker):
 
 def test_processing_thread_queue_page(mocker):
     expected = ["Some Queue Value", "Another Value"]
-    expected_data_args = dict(block=True, timeout=5.0)
     processor = ProcessingThread(mocker.MagicMock(name="callback"), page_size=2)
+    for item in expected + ["Third Value"]:
+        processor.put(item)
 
-    processor._data["main"] = mocker.MagicMock(name="data")
-    processor._data["main"].get.side_effect = expected
-
-    returns = processor._get_page_from_queue()
-    assert returns == expected
-    processor._data["main"].assert_has_calls(
-        [
-            call.get(**expected_data_args),
-            call.task_done(),
-            call.get(**expected_data_args),
-            call.task_done(),
-        ]
+    # Pages are drained in bulk once full, without waiting for the timeout
+    assert processor._get_page_from_queue() == expected
+    assert processor._data["main"].qsize() == 1
+
+
+def test_processing_thread_queue_page_max_age(mocker):
+    processor = ProcessingThread(
+        mocker.MagicMock(name="callback"), page_size=10, timeout=0.05
     )
+    processor.put("Value")
 
+    started = monotonic()
+    assert processor._get_page_from_queue() == ["Value"]
+    assert 0.04 <= monotonic() - started < 1
 
-def test_processing_thread_queue_page_empty(mocker):
-    processor = ProcessingThread(mocker.MagicMock(name="callback"), page_size=10)
-    processor._data["main"] = mocker.MagicMock(name="data")
-    processor._data["main"].get.side_effect = Empty
 
-    assert processor._get_page_from_queue() == []
-    processor._data["main"].get.assert_called_once()
+def test_processing_thread_queue_page_max_weight(mocker):
+    processor = ProcessingThread(
+        mocker.MagicMock(name="callback"),
+        page_size=10,
+        item_weight=len,
+        max_page_weight=4,
+    )
+    for item in ("ab", "cd", "ef"):
+        processor.put(item)
+
+    assert processor._get_page_from_queue() == ["ab", "cd"]
 
 
 def test_processing_thread_no_queue(mocker, log):
     processor = ProcessingThread(mocker.MagicMock(name="callback"), page_size=10)
+    processor._stop_event.set()
     assert processor._get_page_from_queue() == []
-    assert log.has("No queues present, cannot get page.", level="debug")
+
+
+def test_processing_thread_waits_for_items(mocker, log):
+    processor = ProcessingThread(
+        mocker.MagicMock(name="callback"), page_size=1, timeout=5.0
+    )
+    pages = []
+    worker = Thread(target=lambda: pages.append(processor._get_page_from_queue()))
+    worker.start()
+    sleep(0.05)
+    assert log.has("No queues present, waiting for items.", level="debug")
+    assert worker.is_alive()
+
+    processor.put("Value")
+    worker.join(timeout=1)
+    assert pages == [["Value"]]
 
 
 def test_processing_thread_shutdown_marker(mocker, log):
     processor = ProcessingThread(mocker.MagicMock(name="callback"), page_size=10)
-    processor._data["main"] = mocker.MagicMock(name="data")
-    processor._data["main"].get.return_value = ShutdownMarker()
+    processor.put("Value")
+    processor._data["main"].put_unbounded(ShutdownMarker())
 
-    assert processor._get_page_from_queue() == []
+    assert processor._get_page_from_queue() == ["Value"]
     assert len(processor._data) == 0
+    assert processor.stopped
     assert log.has("Received shutdown marker")
 
 
@@ -108,23 +133,21 @@ def test_processing_thread_check_liveness(mocker, log):
 
 def test_processing_thread_run(mocker, log):
     expected_data = ["Some Queue Value", "Another Value"]
-    expected_empty_state = [False, True]
     mock_callback = mocker.MagicMock(name="callback")
     processor = ProcessingThread(mock_callback, page_size=1)
-    processor._data["main"] = mocker.MagicMock(name="data")
-    processor._data["main"].get.side_effect = expected_data
-    processor._data["main"].empty.side_effect = expected_empty_state
-    processor._stop_event = mocker.MagicMock(name="stop_event")
-    processor._stop_event.is_set.return_value = True
+    for item in expected_data:
+        processor.put(item)
+    processor._data["main"].put_unbounded(ShutdownMarker())
 
     processor.run()
     mock_callback.assert_has_calls([call([expected_data[0]]), call([expected_data[1]])])
     assert log.has("Finished processing queue after stop signal")
     assert log.has("Current page size: 1 events", page_size=1)
 
-    processor._data["main"].get.side_effect = expected_data
     mock_callback.reset_mock()
     mock_callback.side_effect = Exception("Callback failed")
+    for item in expected_data:
+        processor.put(item)
     processor.run()
     mock_callback.assert_called_once_with([expected_data[0]])
     assert log.has("Caught an unexpected exception")
@@ -136,11 +159,8 @@ def test_processing_thread_run_with_callbarg_args(mocker, log):
     processor = ProcessingThread(
         mock_callback, page_size=1, some_arg="present", another_arg=False
     )
-    processor._data["main"] = mocker.MagicMock(name="data")
-    processor._data["main"].get.return_value = expected_data
-    processor._data["main"].empty.return_value = True
-    processor._stop_event = mocker.MagicMock(name="stop_event")
-    processor._stop_event.is_set.return_value = True
+    processor.put(expected_data)
+    processor._data["main"].put_unbounded(ShutdownMarker())
 
     processor.run()
     mock_callback.assert_called_once_with(
@@ -161,3 +181,111 @@ def test_processing_thread_as_context_manager(mocker):
         assert p.is_alive()
 
     assert not processor.is_alive()
+
+
+def test_processing_thread_round_robin(mocker):
+    processor = ProcessingThread(mocker.MagicMock(name="callback"), page_size=2)
+    for idx in range(6):
+        processor.put(idx, queue_name="busy")
+    processor.put("quiet", queue_name="quiet")
+    processor.block = False
+
+    pages = [processor._get_page_from_queue() for _ in range(3)]
+    # The quiet queue gets its turn despite the busy one still holding items
+    assert pages == [[0, 1], ["quiet"], [2, 3]]
+
+
+def test_processing_thread_prefers_due_pages(mocker):
+    processor = ProcessingThread(
+        mocker.MagicMock(name="callback"), page_size=2, timeout=5.0
+    )
+    processor.put("waiting", queue_name="waiting")
+    processor.put("a", queue_name="full")
+    processor.put("b", queue_name="full")
+
+    # Does not wait for the page of the queue that was never flushed to fill up
+    assert processor._get_page_from_queue() == ["a", "b"]
+
+
+def test_processing_thread_skips_busy_queues(mocker):
+    processor = ProcessingThread(mocker.MagicMock(name="callback"), timeout=0.01)
+    processor.put("Value")
+    processor._busy.add("main")
+    worker = Thread(target=processor._get_page_from_queue)
+    worker.start()
+    worker.join(timeout=0.1)
+    assert worker.is_alive()
+
+    with processor._changed:
+        processor._busy.discard("main")
+        processor._changed.notify_all()
+    worker.join(timeout=1)
+    assert not worker.is_alive()
+    assert processor._data["main"].empty()
+
+
+@pytest.mark.parametrize("workers", [2, None])
+def test_processing_thread_workers(workers):
+    # Both callbacks have to run at the same time to pass the barrier
+    barrier = Barrier(2, timeout=5)
+    pages = []
+
+    def callback(page):
+        barrier.wait()
+        pages.append(page)
+
+    with ProcessingThread(
+        callback, page_size=2, timeout=0.1, workers=workers
+    ) as processor:
+        for idx in range(2):
+            processor.put(idx, queue_name="a")
+            processor.put(-idx, queue_name="b")
+
+    assert processor.exception is None
+    assert sorted(pages) == [[0, -1], [0, 1]]
+    assert len(processor._helpers) == 1
+    assert not any(helper.is_alive() for helper in processor._helpers)
+
+
+def test_processing_thread_invalid_workers(mocker):
+    with pytest.raises(ValueError):
+        ProcessingThread(mocker.MagicMock(name="callback"), workers=0)
+
+
+def test_processing_thread_backpressure(mocker):
+    puts_done = []
+
+    def callback(page):
+        # The producer is held back while the page is being processed
+        assert len(puts_done) <= 3
+        puts_done.clear()
+
+    with ProcessingThread(
+        callback, page_size=1, timeout=0.1, max_queue_size=2
+    ) as processor:
+        for idx in range(6):
+            processor.put(idx)
+            puts_done.append(idx)
+
+    assert processor.exception is None
+    assert processor.high_watermarks["main"] <= 2
+
+
+def test_processing_thread_full_queue_dead_worker(mocker):
+    callback = mocker.MagicMock(side_effect=Exception("Callback failed"))
+    processor = ProcessingThread(callback, page_size=1, timeout=0.05, max_queue_size=1)
+    with pytest.raises(Exception, match="Callback failed"):
+        with processor:
+            for idx in range(10):
+                processor.put(idx)
+
+
+def test_processing_thread_spill(mocker):
+    pages = []
+    with ProcessingThread(
+        pages.append, page_size=5, timeout=0.05, max_queue_size=2, spill=True
+    ) as processor:
+        for idx in range(20):
+            processor.put(idx)
+
+    assert [item for page in pages for item in page] == list(range(20))
@@ -1,7 +1,15 @@
+import re
+import threading
+import time
+from collections import Counter
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from urllib.parse import urlparse
 
 import pytest
 
+from uptimer.helpers.scheduler import Scheduler
 from uptimer.plugins.readers.probes import http
 
 
@@ -129,3 +137,419 @@ def test_compile_target_list_with_errors(input_val, expected):
 
     with pytest.raises(expected):
         prober._compile_target_list([None], [input_val])
+
+
+@pytest.mark.parametrize(
+    "input_val, expected",
+    [
+        (None, "sequential"),
+        ("", "sequential"),
+        ("asyncio", "asyncio"),
+        ("AsyncIO", "asyncio"),
+        ("threads", "threads"),
+    ],
+)
+def test_parse_probe_mode(input_val, expected):
+    assert http.HTTPProbe._parse_probe_mode(input_val) == expected
+
+
+@pytest.mark.parametrize("input_val", ["twisted", 1])
+def test_parse_probe_mode_with_errors(input_val):
+    with pytest.raises(ValueError):
+        http.HTTPProbe._parse_probe_mode(input_val)
+
+
+@pytest.mark.parametrize("probe_mode", ["asyncio", "threads"])
+def test_probe_concurrently(mocker, probe_mode):
+    lock = threading.Lock()
+    in_flight = Counter()
+    max_in_flight = Counter()
+
+    def fake_get(url, timeout, **kwargs):
+        hostname = urlparse(url).hostname
+        with lock:
+            in_flight[hostname] += 1
+            in_flight["total"] += 1
+            for key in (hostname, "total"):
+                max_in_flight[key] = max(max_in_flight[key], in_flight[key])
+        time.sleep(0.05)
+        with lock:
+            in_flight[hostname] -= 1
+            in_flight["total"] -= 1
+        return mocker.MagicMock(status_code=200)
+
+    mocker.patch("requests.Session.get", side_effect=fake_get)
+    urls = [f"http://host-{idx % 3}.example.com/{idx}" for idx in range(12)]
+    prober = http.HTTPProbe(
+        probe_urls=urls,
+        probe_mode=probe_mode,
+        probe_concurrency=5,
+        probe_concurrency_per_host=2,
+        probe_interval=-1,
+    )
+
+    events = list(prober.read())
+
+    assert len(events) == len(urls)
+    assert all(isinstance(e, http.events.ProbeEvent) for e in events)
+    assert sorted(e["path"] for e in events) == sorted(urlparse(u).path for u in urls)
+    # Probes overlap, within the limits
+    assert 1 < max_in_flight["total"] <= 5
+    assert all(max_in_flight[f"host-{idx}.example.com"] <= 2 for idx in range(3))
+
+
+@pytest.mark.parametrize(
+    "input_val, expected",
+    [
+        (None, [30, 30]),
+        (5, [5.0, 5.0]),
+        ("5", [5.0, 5.0]),
+        ([5, 10], [5.0, 10.0]),
+        ("[0.5, 2]", [0.5, 2.0]),
+    ],
+    ids=["default", "common_int", "common_str", "native_list", "yaml_list"],
+)
+def test_parse_probe_intervals(input_val, expected):
+    prober = http.HTTPProbe(probe_interval=30)
+    assert prober._parse_probe_intervals(input_val, expected_count=2) == expected
+
+
+@pytest.mark.parametrize("input_val", [[1, 2, 3], "0", "[-1, 2]"])
+def test_parse_probe_intervals_with_errors(input_val):
+    prober = http.HTTPProbe()
+    with pytest.raises(ValueError):
+        prober._parse_probe_intervals(input_val, expected_count=2)
+
+
+def test_read_with_scheduler(mocker):
+    mocker.patch("requests.Session.get", return_value=mocker.MagicMock(status_code=200))
+    prober = http.HTTPProbe(
+        probe_urls=["http://fast.example.com", " http://slow.example.com"],
+        probe_intervals=[0.05, 0.2],
+        probe_interval=1,
+        probe_jitter=0,
+    )
+
+    # Sleeping advances the scheduler's clock instantly
+    now = [0.0]
+    mocker.patch(
+        "uptimer.plugins.readers.probes.http.Scheduler",
+        partial(Scheduler, clock=lambda: now[0]),
+    )
+    sleep = mocker.patch(
+        "time.sleep", side_effect=lambda seconds: now.__setitem__(0, now[0] + seconds)
+    )
+
+    hostnames = []
+    for event in prober.read():
+        hostnames.append(event["hostname"])
+        if len(hostnames) == 5:
+            prober.stop()
+
+    # Both targets are due immediately, after that 3 more runs of the fast target
+    # happen before the slow one is due again.
+    assert hostnames.count("fast.example.com") == 4
+    assert hostnames.count("slow.example.com") == 1
+    assert sleep.call_count == 3
+    assert now[0] == pytest.approx(0.15)
+    assert prober.scheduling_lag == {
+        "http://fast.example.com": 0.0,
+        "http://slow.example.com": 0.0,
+    }
+
+
+def test_read_with_scheduler_without_targets(mocker):
+    prober = http.HTTPProbe(probe_urls=["http://example.com"], probe_interval=1)
+    prober.targets = []
+    sleep = mocker.patch("time.sleep", side_effect=lambda _: prober.stop())
+
+    assert list(prober.read()) == []
+    sleep.assert_called_once_with(http.IDLE_INTERVAL)
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.client_ports.append(self.client_address[1])
+        body = getattr(self.server, "body", b"All Systems Operational")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    server.client_ports = []
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize(
+    "input_val, keepalive, expected",
+    [
+        (None, None, ["warm", "warm"]),
+        (None, "false", ["cold", "cold"]),
+        ("cold", True, ["cold", "cold"]),
+        (["Warm", "cold"], False, ["warm", "cold"]),
+    ],
+    ids=["default", "no_keepalive", "common", "native_list"],
+)
+def test_parse_connection_modes(input_val, keepalive, expected):
+    prober = http.HTTPProbe()
+    modes = prober._parse_connection_modes(
+        input_val, keepalive=keepalive, expected_count=2
+    )
+    assert modes == expected
+
+
+@pytest.mark.parametrize("input_val", ["lukewarm", ["warm", "cold", "warm"]])
+def test_parse_connection_modes_with_errors(input_val):
+    prober = http.HTTPProbe()
+    with pytest.raises(ValueError):
+        prober._parse_connection_modes(input_val, expected_count=2)
+
+
+@pytest.mark.parametrize(
+    "connection_mode, expected_connections", [("warm", 1), ("cold", 3)]
+)
+def test_connection_modes(http_server, connection_mode, expected_connections):
+    url = f"http://127.0.0.1:{http_server.server_port}/status"
+    prober = http.HTTPProbe(
+        probe_urls=[url],
+        probe_connection_modes=connection_mode,
+        probe_interval=-1,
+    )
+
+    for _ in range(3):
+        events = list(prober.read())
+        assert len(events) == 1
+        assert events[0]["status_code"] == 200
+
+    assert len(http_server.client_ports) == 3
+    assert len(set(http_server.client_ports)) == expected_connections
+
+
+@pytest.mark.parametrize("connection_mode", ["warm", "cold"])
+def test_timing_breakdown(http_server, connection_mode):
+    url = f"http://localhost:{http_server.server_port}/status"
+    prober = http.HTTPProbe(
+        probe_urls=[url], probe_connection_modes=connection_mode, probe_interval=-1
+    )
+
+    first, second = [list(prober.read())[0] for _ in range(2)]
+
+    for event in (first, second):
+        assert event["tls_ms"] is None  # Plain-text HTTP
+        assert event["ttfb_ms"] >= 0
+        if connection_mode == "warm":
+            assert event["transfer_ms"] >= 0  # Drained to reuse the connection
+        else:
+            assert event["transfer_ms"] is None  # Skipped without a regex
+    assert first["dns_ms"] >= 0
+    assert first["connect_ms"] >= 0
+    if connection_mode == "warm":
+        # The connection is reused, so there's no connection setup to measure
+        assert second["dns_ms"] is None
+        assert second["connect_ms"] is None
+    else:
+        assert second["dns_ms"] >= 0
+        assert second["connect_ms"] >= 0
+
+
+@pytest.mark.parametrize(
+    "body_size, expected_connections",
+    [(http.MAX_DRAIN_SIZE, 1), (http.MAX_DRAIN_SIZE + 1, 3)],
+)
+def test_warm_connections_drain_small_bodies(
+    http_server, body_size, expected_connections
+):
+    http_server.body = b"x" * body_size
+    url = f"http://127.0.0.1:{http_server.server_port}/status"
+    prober = http.HTTPProbe(
+        probe_urls=[url], probe_connection_modes="warm", probe_interval=-1
+    )
+
+    events = [list(prober.read())[0] for _ in range(3)]
+
+    # Large bodies are not downloaded, and their connection is closed instead
+    assert len(set(http_server.client_ports)) == expected_connections
+    drained = expected_connections == 1
+    assert all((event["transfer_ms"] is not None) is drained for event in events)
+
+
+def test_timing_breakdown_of_failed_connection():
+    prober = http.HTTPProbe(
+        probe_urls=["http://unresolvable.invalid/"], probe_interval=-1
+    )
+
+    event = list(prober.read())[0]
+
+    assert event["status_code"] == 0
+    assert event["dns_ms"] >= 0
+    for phase in ("connect", "tls", "ttfb", "transfer"):
+        assert event[f"{phase}_ms"] is None
+
+
+def test_limit_bytes():
+    chunks = iter([b"abc", b"def", b"ghi"])
+
+    assert list(http.limit_bytes(chunks, 5)) == [b"abc", b"de"]
+    assert list(chunks) == [b"ghi"]  # Not consumed past the limit
+    assert list(http.limit_bytes([b"abc"], 10)) == [b"abc"]
+
+
+@pytest.mark.parametrize(
+    "chunks, window, expected",
+    [
+        ([b"All Systems ", b"Operational"], 100, True),
+        ([b"All Systems ", b"Operational"], 5, False),  # Match exceeds the window
+        ([b"All Systems Operational"], 0, True),
+        ([b"All ", b"Sys", b"tems Op", b"erational"], 100, True),
+        ([b"Some Systems ", b"Degraded"], 100, False),
+        ([], 100, False),
+    ],
+)
+def test_search_stream(chunks, window, expected):
+    regex = re.compile("All Systems Operational")
+    assert http.search_stream(regex, chunks, window=window) is expected
+
+
+def test_search_stream_decoding():
+    regex = re.compile("Größe")
+    encoded = "Größe".encode("utf-8")
+    # Split within the multi-byte sequence of "ö"
+    chunks = [encoded[:3], encoded[3:]]
+
+    assert http.search_stream(regex, chunks, encoding="utf-8") is True
+    assert http.search_stream(regex, chunks, encoding="unknown-codec") is True
+    assert (
+        http.search_stream(regex, ["Größe".encode("latin-1")], encoding="latin-1")
+        is True
+    )
+
+
+def test_search_stream_stops_at_match():
+    consumed = []
+
+    def chunks():
+        for chunk in (b"foo", b"bar", b"baz"):
+            consumed.append(chunk)
+            yield chunk
+
+    assert http.search_stream(re.compile("bar"), chunks()) is True
+    assert consumed == [b"foo", b"bar"]
+
+
+@pytest.mark.parametrize(
+    "regex, max_body_size, expected",
+    [
+        ("Operational", None, True),
+        ("Operational", 1024, False),  # Found only after the limit
+        ("^x+", 1024, True),
+        ("Degraded", None, False),
+    ],
+)
+@pytest.mark.parametrize("connection_mode", ["warm", "cold"])
+def test_probe_streaming_regex(
+    http_server, connection_mode, regex, max_body_size, expected
+):
+    http_server.body = b"x" * 300_000 + b"All Systems Operational"
+    url = f"http://127.0.0.1:{http_server.server_port}/status"
+    prober = http.HTTPProbe(
+        probe_urls=[url],
+        probe_regexes=regex,
+        probe_max_body_size=max_body_size,
+        probe_connection_modes=connection_mode,
+        probe_interval=-1,
+    )
+
+    for _ in range(2):
+        event = list(prober.read())[0]
+        assert event["status_code"] == 200
+        assert event["matches_regex"] is expected
+        assert event["transfer_ms"] >= 0
+
+
+@pytest.mark.parametrize(
+    "settings", [{"probe_max_body_size": -1}, {"probe_regex_window": -1}]
+)
+def test_body_settings_with_errors(settings):
+    with pytest.raises(ValueError):
+        http.HTTPProbe(**settings)
+
+
+@pytest.mark.parametrize(
+    "input_val, expected",
+    [
+        (None, [True, True]),
+        (False, [False, False]),
+        ("false", [False, False]),
+        ("[true, false]", [True, False]),
+        (["false", "true"], [False, True]),
+    ],
+)
+def test_parse_dns_cache(input_val, expected):
+    prober = http.HTTPProbe()
+    assert prober._parse_dns_cache(input_val, expected_count=2) == expected
+
+
+def test_parse_dns_cache_with_errors():
+    prober = http.HTTPProbe()
+    with pytest.raises(ValueError):
+        prober._parse_dns_cache([True, False, True], expected_count=2)
+
+
+def test_dns_cache(mocker, http_server):
+    urls = [
+        f"http://localhost:{http_server.server_port}/cached",
+        f"http://127.0.0.1:{http_server.server_port}/uncached",
+    ]
+    prober = http.HTTPProbe(
+        probe_urls=urls,
+        probe_dns_cache=[True, False],
+        probe_connection_modes="cold",
+        probe_interval=-1,
+    )
+    spy = mocker.spy(prober.dns_cache, "resolver")
+    shutdown = mocker.spy(prober.dns_cache, "shutdown")
+
+    for _ in range(3):
+        events = list(prober.read())
+        assert [event["status_code"] for event in events] == [200, 200]
+
+    spy.assert_called_once_with("localhost", http_server.server_port)
+    # Background refreshes are waited for once done reading
+    assert shutdown.call_count == 3
+    assert prober.dns_cache_stats["hits"] == 2
+    assert prober.dns_cache_stats["misses"] == 1
+
+
+def test_dns_cache_without_addresses(mocker, http_server):
+    prober = http.HTTPProbe(
+        probe_urls=[f"http://localhost:{http_server.server_port}/"],
+        probe_dns_cache=True,
+        probe_interval=-1,
+    )
+    mocker.patch.object(prober.dns_cache, "resolver", return_value=[])
+
+    # Reported as a failed connection
+    (event,) = prober.read()
+    assert event["status_code"] == 0
+    assert "no addresses for localhost" in event["error"]
+
+
+def test_dns_cache_disabled():
+    prober = http.HTTPProbe(probe_urls=["https://example.com"], probe_dns_cache="no")
+    assert prober.dns_cache is None
+    assert prober.dns_cache_stats == {}
@@ -0,0 +1,106 @@
+import socket
+
+import pytest
+
+from uptimer.plugins.readers.probes.resolver import DNSCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture()
+def resolver(mocker):
+    return mocker.Mock(side_effect=lambda host, port: [f"10.0.0.{len(host)}"])
+
+
+def test_hits_and_misses(clock, resolver):
+    cache = DNSCache(ttl=60, refresh_ahead=0, resolver=resolver, clock=clock)
+
+    assert cache.resolve("example.com", 443) == ["10.0.0.11"]
+    assert cache.resolve("example.com", 80) == ["10.0.0.11"]
+    assert cache.resolve("example.org", 443) == ["10.0.0.11"]
+    assert resolver.call_count == 2
+    assert cache.stats == {
+        "hits": 1,
+        "misses": 2,
+        "refreshes": 0,
+        "errors": 0,
+        "entries": 2,
+    }
+
+
+def test_expiry(clock, resolver):
+    cache = DNSCache(ttl=60, refresh_ahead=0, resolver=resolver, clock=clock)
+
+    cache.resolve("example.com", 443)
+    clock.now = 59.9
+    cache.resolve("example.com", 443)
+    assert resolver.call_count == 1
+
+    clock.now = 60.0
+    cache.resolve("example.com", 443)
+    assert resolver.call_count == 2
+    assert cache.misses == 2
+
+
+def test_background_refresh(clock, resolver):
+    cache = DNSCache(ttl=60, refresh_ahead=0.2, resolver=resolver, clock=clock)
+
+    cache.resolve("example.com", 443)
+    clock.now = 47.0  # Not yet within the last 20% of the TTL
+    cache.resolve("example.com", 443)
+    cache.shutdown()
+    assert cache.refreshes == 0
+
+    clock.now = 50.0
+    cache.resolve("example.com", 443)
+    cache.shutdown()
+    assert cache.refreshes == 1
+    assert resolver.call_count == 2
+
+    # The refreshed entry is valid for another TTL from the time of its refresh
+    clock.now = 100.0
+    cache.resolve("example.com", 443)
+    assert cache.misses == 1
+    assert cache.hits == 3
+
+
+def test_failed_refresh_keeps_entry(clock, resolver):
+    cache = DNSCache(ttl=60, refresh_ahead=0.5, resolver=resolver, clock=clock)
+    cache.resolve("example.com", 443)
+
+    resolver.side_effect = socket.gaierror("Temporary failure in name resolution")
+    clock.now = 40.0
+    assert cache.resolve("example.com", 443) == ["10.0.0.11"]
+    cache.shutdown()
+    assert cache.errors == 1
+    assert cache.resolve("example.com", 443) == ["10.0.0.11"]
+
+
+def test_errors_are_not_cached(clock, resolver):
+    cache = DNSCache(ttl=60, resolver=resolver, clock=clock)
+    resolver.side_effect = socket.gaierror("Name or service not known")
+
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            cache.resolve("unresolvable.invalid", 443)
+    assert len(cache) == 0
+    assert cache.misses == 2
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"ttl": 0}, {"refresh_ahead": -0.1}, {"refresh_ahead": 1.1}]
+)
+def test_invalid_settings(kwargs):
+    with pytest.raises(ValueError):
+        DNSCache(**kwargs)
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from uptimer.plugins.readers.executors import (
+    AsyncioProbeExecutor,
+    SequentialProbeExecutor,
+    ThreadPoolProbeExecutor,
+    get_executor,
+)
+
+
+class ConcurrencyTracker:
+    def __init__(self, duration=0.02):
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.in_flight = Counter()
+        self.max_in_flight = Counter()
+
+    def __call__(self, item):
+        key, value = item
+        with self.lock:
+            self.in_flight[key] += 1
+            self.in_flight["total"] += 1
+            for k in (key, "total"):
+                self.max_in_flight[k] = max(self.max_in_flight[k], self.in_flight[k])
+        time.sleep(self.duration)
+        with self.lock:
+            self.in_flight[key] -= 1
+            self.in_flight["total"] -= 1
+        return value
+
+
+@pytest.mark.parametrize(
+    "executor_cls", [ThreadPoolProbeExecutor, AsyncioProbeExecutor]
+)
+def test_executor_limits(executor_cls):
+    items = [(f"key-{idx % 2}", idx) for idx in range(10)]
+    tracker = ConcurrencyTracker()
+    executor = executor_cls(max_workers=3, max_per_key=2)
+
+    try:
+        results = list(executor.map(tracker, items, key=lambda item: item[0]))
+    finally:
+        executor.shutdown()
+
+    assert sorted(results) == list(range(10))
+    assert tracker.max_in_flight["total"] == 3
+    assert tracker.max_in_flight["key-0"] <= 2
+    assert tracker.max_in_flight["key-1"] <= 2
+
+
+@pytest.mark.parametrize(
+    "executor_cls", [ThreadPoolProbeExecutor, AsyncioProbeExecutor]
+)
+def test_executor_yields_as_completed(executor_cls):
+    def sleepy(duration):
+        time.sleep(duration)
+        return duration
+
+    executor = executor_cls(max_workers=3)
+    try:
+        results = list(executor.map(sleepy, [0.1, 0.05, 0.0]))
+    finally:
+        executor.shutdown()
+
+    assert results == [0.0, 0.05, 0.1]
+
+
+@pytest.mark.parametrize(
+    "executor_cls",
+    [SequentialProbeExecutor, ThreadPoolProbeExecutor, AsyncioProbeExecutor],
+)
+def test_executor_raises(executor_cls):
+    def failing(item):
+        raise RuntimeError(item)
+
+    executor = executor_cls(max_workers=2)
+    try:
+        with pytest.raises(RuntimeError):
+            list(executor.map(failing, [1, 2]))
+    finally:
+        executor.shutdown()
+
+
+def test_sequential_executor():
+    executor = get_executor("sequential")
+    assert isinstance(executor, SequentialProbeExecutor)
+    assert list(executor.map(lambda x: x * 2, [1, 2, 3])) == [2, 4, 6]
+
+
+@pytest.mark.parametrize(
+    "mode, kwargs, expected",
+    [
+        ("twisted", {}, ValueError),
+        ("threads", dict(max_workers=0), ValueError),
+        ("asyncio", dict(max_workers=2, max_per_key=0), ValueError),
+    ],
+)
+def test_get_executor_with_errors(mode, kwargs, expected):
+    with pytest.raises(expected):
+        get_executor(mode, **kwargs)
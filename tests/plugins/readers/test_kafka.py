@@ -0,0 +1,317 @@
+from collections import namedtuple
+from itertools import islice
+
+import pytest
+from kafka.structs import TopicPartition
+
+from uptimer.events import DummyEvent, EventBatch
+from uptimer.events.serializer import dumps, dumps_envelope, envelope_headers
+from uptimer.helpers.queues import BoundedQueue
+from uptimer.plugins.readers import kafka
+
+Record = namedtuple("Record", ["value", "offset", "headers"], defaults=[None])
+
+SETTINGS = dict(
+    kafka_bootstrap_server="localhost:9092",
+    kafka_reader_topic="events",
+    kafka_ssl_cafile="ca.pem",
+    kafka_ssl_certfile="cert.pem",
+    kafka_ssl_keyfile="key.pem",
+)
+
+
+def make_events(count):
+    return [
+        DummyEvent(target="t", reader="r", integer_value=idx, float_value=1.5)
+        for idx in range(count)
+    ]
+
+
+@pytest.fixture()
+def consumer(mocker):
+    get_consumer = mocker.patch("uptimer.plugins.readers.kafka.get_consumer")
+    return get_consumer.return_value
+
+
+def records(values, start=0):
+    return [Record(value, offset) for offset, value in enumerate(values, start)]
+
+
+def test_kafka_read(consumer):
+    events = make_events(3)
+    bodies = [dumps(event) for event in events]
+    polls = [
+        {"partition-0": records(bodies[:2] + [b"not json"])},
+        {"partition-1": records(bodies[2:])},
+    ]
+    consumer.poll.side_effect = lambda **kwargs: polls.pop(0) if polls else {}
+
+    reader = kafka.Plugin(**SETTINGS)
+    assert list(islice(reader.read(), 3)) == events
+    _, kwargs = kafka.get_consumer.call_args
+    assert kwargs["enable_auto_commit"] is False
+
+
+def test_kafka_read_envelopes(consumer):
+    events = make_events(3)
+    envelope = Record(
+        dumps_envelope(EventBatch(DummyEvent, events[1:])), 1, envelope_headers()
+    )
+    consumer.poll.return_value = {
+        "partition-0": [Record(dumps(events[0]), 0), envelope]
+    }
+
+    # Envelopes are read as batches, also when reading messages one by one
+    reader = kafka.Plugin(**SETTINGS)
+    event, batch = islice(reader.read(), 2)
+    assert event == events[0]
+    assert isinstance(batch, EventBatch)
+    assert list(batch) == events[1:]
+
+    reader = kafka.Plugin(kafka_batch_size="500", **SETTINGS)
+    (batch,) = islice(reader.read(), 1)
+    assert list(batch) == events
+
+
+@pytest.mark.parametrize("pool", ["thread", "process"])
+def test_kafka_read_batches(mocker, consumer, pool):
+    mocker.patch("uptimer.plugins.readers.kafka.MIN_CHUNK_SIZE", 2)
+    events = make_events(7)
+    bodies = [dumps(event) for event in events]
+    polls = [
+        {"partition-0": records(bodies[:3])},
+        {
+            "partition-0": records(bodies[3:5], start=3),
+            "partition-1": records(bodies[5:]),
+        },
+    ]
+    consumer.poll.side_effect = lambda **kwargs: polls.pop(0) if polls else {}
+
+    reader = kafka.Plugin(
+        kafka_batch_size="500",
+        kafka_deserializer_pool=pool,
+        kafka_deserializer_workers="2",
+        **SETTINGS,
+    )
+    batches = list(islice(reader.read(), 4))
+
+    consumer.poll.assert_called_with(timeout_ms=1000, max_records=500)
+    assert all(isinstance(batch, EventBatch) for batch in batches)
+    assert [len(batch) for batch in batches] == [2, 1, 2, 2]
+    assert [event for batch in batches for event in batch] == events
+
+
+def test_kafka_pool(consumer):
+    # Processes are opt-in, and spawned instead of forked from the consumer
+    assert kafka.Plugin(**SETTINGS).deserializer_pool == "thread"
+    assert (
+        kafka.DESERIALIZER_POOLS["process"].keywords["mp_context"].get_start_method()
+        == "spawn"
+    )
+
+    with pytest.raises(ValueError):
+        kafka.Plugin(kafka_deserializer_pool="fibers", **SETTINGS)
+
+
+def test_offset_tracker():
+    tracker = kafka.OffsetTracker()
+    first, second, third = make_events(3)
+    tracker.track({"partition-0": 2, "partition-1": 1}, [first, second], 3)
+    tracker.track({"partition-0": 3}, [third], 1)
+    tracker.track({"partition-1": 5}, [], 4)
+
+    # Later deliveries are not committed before earlier ones are written
+    tracker.acknowledge([third, second])
+    assert (tracker.take_committable(), tracker.written) == ({}, 0)
+    tracker.acknowledge([first])
+    assert tracker.written == 8
+    assert tracker.take_committable() == {"partition-0": 3, "partition-1": 5}
+    assert (tracker.take_committable(), tracker.written) == ({}, 0)
+
+    # Unknown and repeated acknowledgements are ignored
+    tracker.acknowledge([first, object()])
+    assert tracker.take_committable() == {}
+
+
+def test_kafka_commit_after_spilled(consumer):
+    events = make_events(3)
+    consumer.poll.return_value = {
+        "partition-0": records([dumps(event) for event in events], start=10)
+    }
+
+    # Writers may acknowledge copies of the items read, e.g. spilled to disk
+    reader = kafka.Plugin(kafka_commit_interval_ms="0", **SETTINGS)
+    queue = BoundedQueue(1, spill=True)
+    for event in islice(reader.read(), 3):
+        queue.put(event)
+    assert queue.spilled == 2
+    written = [queue.get_nowait() for _ in events]
+    assert written == events
+    assert all(a is not b for a, b in zip(written, events))
+
+    reader.acknowledge(written)
+    reader.commit(consumer)
+    consumer.commit.assert_called_once_with(
+        {"partition-0": kafka.offset_and_metadata(13)}
+    )
+
+
+def test_kafka_commit_after_written(consumer):
+    events = make_events(3)
+    bodies = [dumps(event) for event in events]
+    consumer.poll.return_value = {"partition-0": records(bodies, start=10)}
+
+    reader = kafka.Plugin(kafka_commit_interval_ms="0", **SETTINGS)
+    read = list(islice(reader.read(), 3))
+    assert read == events
+
+    reader.acknowledge(read[1:])
+    reader.commit(consumer)
+    consumer.commit.assert_not_called()
+    reader.acknowledge(read[:1])
+    reader.commit(consumer)
+    consumer.commit.assert_called_once_with(
+        {"partition-0": kafka.offset_and_metadata(13)}
+    )
+
+
+def test_kafka_commit_on_stop(consumer):
+    events = make_events(2)
+    consumer.poll.return_value = {
+        "partition-0": records([dumps(event) for event in events])
+    }
+
+    # Nothing to commit before reading
+    reader = kafka.Plugin(**SETTINGS)
+    reader.stop()
+
+    # Written messages are committed on shutdown, even though no commit is due yet
+    read = list(islice(reader.read(), 2))
+    reader.acknowledge(read[:1])
+    reader.commit(consumer)
+    consumer.commit.assert_not_called()
+    reader.stop()
+    consumer.commit.assert_called_once_with(
+        {"partition-0": kafka.offset_and_metadata(1)}
+    )
+
+
+def test_kafka_commit_batched(consumer):
+    events = make_events(3)
+    consumer.poll.return_value = {
+        "partition-0": records([dumps(event) for event in events])
+    }
+
+    # Commits are due every 2 messages written, as the interval is far off
+    reader = kafka.Plugin(kafka_commit_messages="2", **SETTINGS)
+    read = list(islice(reader.read(), 3))
+    assert read == events
+    reader.acknowledge(read[:1])
+    reader.commit(consumer)
+    consumer.commit.assert_not_called()
+    reader.acknowledge(read[1:])
+    reader.commit(consumer)
+    consumer.commit.assert_called_once_with(
+        {"partition-0": kafka.offset_and_metadata(3)}
+    )
+
+
+def test_kafka_commit_batches(mocker, consumer):
+    mocker.patch("uptimer.plugins.readers.kafka.MIN_CHUNK_SIZE", 2)
+    events = make_events(4)
+    consumer.poll.return_value = {
+        "partition-0": records([dumps(event) for event in events])
+    }
+
+    reader = kafka.Plugin(
+        kafka_batch_size="500",
+        kafka_deserializer_pool="thread",
+        kafka_deserializer_workers="2",
+        kafka_commit_interval_ms="0",
+        **SETTINGS,
+    )
+    first, second = islice(reader.read(), 2)
+    reader.acknowledge([first])
+    reader.commit(consumer)
+    consumer.commit.assert_called_once_with(
+        {"partition-0": kafka.offset_and_metadata(2)}
+    )
+
+
+def test_kafka_auto_commit(consumer):
+    events = make_events(1)
+    consumer.poll.return_value = {"partition-0": records([dumps(events[0])])}
+
+    reader = kafka.Plugin(kafka_commit="auto", kafka_commit_interval_ms="0", **SETTINGS)
+    event = next(reader.read())
+    assert event == events[0]
+    _, kwargs = kafka.get_consumer.call_args
+    assert kwargs["enable_auto_commit"] is True
+    reader.acknowledge([event])
+    reader.commit(consumer)
+    consumer.commit.assert_not_called()
+
+
+def test_kafka_static_partitions(consumer):
+    events = make_events(2)
+    first, second = TopicPartition("events", 0), TopicPartition("events", 1)
+    consumer.poll.return_value = {
+        first: records([dumps(events[0])]),
+        second: records([dumps(events[1])]),
+    }
+
+    reader = kafka.Plugin(
+        kafka_partitions="0, 2", kafka_commit_interval_ms="0", **SETTINGS
+    )
+    read = list(islice(reader.read(), 2))
+    _, kwargs = kafka.get_consumer.call_args
+    assert kwargs["partitions"] == (0, 2)
+
+    # Offsets of partitions the reader does not consume are not committed
+    reader.acknowledge(read)
+    reader.commit(consumer)
+    consumer.commit.assert_called_once_with({first: kafka.offset_and_metadata(1)})
+
+
+@pytest.mark.parametrize(
+    "setting, expected",
+    [(3, (3,)), (0, (0,)), ("1,2", (1, 2)), ([0, "1"], (0, 1)), ("", ())],
+)
+def test_kafka_partitions_setting(consumer, setting, expected):
+    reader = kafka.Plugin(kafka_partitions=setting, **SETTINGS)
+    assert reader.static_partitions == expected
+
+
+def test_kafka_rebalance(consumer):
+    events = make_events(2)
+    first, second = TopicPartition("events", 0), TopicPartition("events", 1)
+    consumer.poll.return_value = {
+        first: records([dumps(events[0])]),
+        second: records([dumps(events[1])]),
+    }
+
+    reader = kafka.Plugin(**SETTINGS)
+    read = list(islice(reader.read(), 2))
+    _, kwargs = kafka.get_consumer.call_args
+    assert kwargs["partitions"] is None
+    listener = kwargs["listener"]
+    listener.on_partitions_assigned([first, second])
+    assert reader.partitions == {first, second}
+
+    # Written messages are committed before their partition is revoked, even though
+    # no commit is due yet
+    reader.acknowledge(read)
+    listener.on_partitions_revoked([second])
+    consumer.commit.assert_called_once_with(
+        {first: kafka.offset_and_metadata(1), second: kafka.offset_and_metadata(1)}
+    )
+    assert reader.partitions == {first}
+
+
+@pytest.mark.parametrize(
+    "setting",
+    [{"kafka_commit": "sometimes"}, {"kafka_codec": "xml"}, {"kafka_partitions": "a"}],
+)
+def test_kafka_invalid_settings(consumer, setting):
+    with pytest.raises(ValueError):
+        kafka.Plugin(**setting, **SETTINGS)
@@ -3,7 +3,6 @@ from uptimer.plugins.settings import PluginSettings
 
 
 def test_baseplugin_init():
-
     bp = BasePlugin()
 
     assert hasattr(bp, "settings")
@@ -13,3 +12,11 @@ def test_baseplugin_init():
 
     # Module string (uptimer.plugins) is removed for posterity on "included" plugins
     assert str(bp) == "BasePlugin"
+
+
+def test_baseplugin_validation_policy():
+    assert BasePlugin().validation_policy.policy == "creation"
+
+    bp = BasePlugin(event_validation="sampled", event_validation_sample_rate="10")
+    assert bp.validation_policy.policy == "sampled"
+    assert bp.validation_policy.sample_rate == 10
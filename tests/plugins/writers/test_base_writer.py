@@ -1,6 +1,6 @@
 import pytest
 
-from uptimer.events import Event
+from uptimer.events import Event, EventBatch
 from uptimer.events.stubs import DummyEvent
 from uptimer.exceptions import ValidationError
 from uptimer.plugins.writers import WriterPlugin
@@ -84,3 +84,29 @@ def test_validate_event_type_mutually_exclusive_params():
         writer.validate_event_type(
             dummy, strict=False, to_json=True, to_tuple_by_keys=("something")
         )
+
+
+def test_iter_valid_reports_dropped_items(mocker):
+    invalid = DummyEvent(
+        target="this", reader="that", integer_value="nope", validate=False
+    )
+    invalid_batch = EventBatch(DummyEvent, [invalid])
+    partial_batch = EventBatch(DummyEvent, [dummy, invalid])
+    partial_batch.delivery_tag = 7
+
+    writer = ConcreteTestClass(event_validation="writer")
+    writer.on_written = mocker.MagicMock()
+    valid = list(writer.iter_valid([invalid, dummy, invalid_batch, partial_batch]))
+
+    # Dropped items are reported right away, as they will never be written
+    assert writer.on_written.call_args_list == [
+        mocker.call([invalid]),
+        mocker.call([invalid_batch]),
+    ]
+    assert valid[0] is dummy
+    assert list(valid[1]) == [dummy]
+
+    # Batches keep the delivery tag of the payload's originals
+    assert valid[1].delivery_tag == 7
+    writer.written(valid)
+    writer.on_written.assert_called_with(valid)
@@ -0,0 +1,252 @@
+import itertools
+
+import pytest
+from kafka.errors import KafkaTimeoutError, MessageSizeTooLargeError
+from kafka.future import Future
+
+from uptimer.events import DummyEvent, EventBatch
+from uptimer.events.serializer import ENVELOPE_HEADER, dumps, loads
+from uptimer.plugins.writers import kafka
+
+SETTINGS = dict(
+    kafka_bootstrap_server="localhost:9092",
+    kafka_writer_topic="events",
+    kafka_ssl_cafile="ca.pem",
+    kafka_ssl_certfile="cert.pem",
+    kafka_ssl_keyfile="key.pem",
+)
+
+
+def make_events(count):
+    return [
+        DummyEvent(target="t", reader="r", integer_value=idx, float_value=1.5)
+        for idx in range(count)
+    ]
+
+
+@pytest.fixture()
+def producer(mocker):
+    get_producer = mocker.patch("uptimer.plugins.writers.kafka.get_producer")
+    producer = get_producer.return_value
+    producer.futures = []
+
+    def send(topic, value, key=None, headers=None):
+        future = Future()
+        producer.futures.append(future)
+        return future
+
+    producer.send.side_effect = send
+    return producer
+
+
+def test_kafka_write_sync(mocker, producer):
+    events = make_events(3)
+    writer = kafka.Plugin(kafka_linger_ms="20", kafka_max_in_flight="1", **SETTINGS)
+    writer.on_written = mocker.MagicMock()
+    writer.write(iter([EventBatch(DummyEvent, events[:2]), events[2]]))
+
+    _, kwargs = kafka.get_producer.call_args
+    assert (kwargs["linger_ms"], kwargs["max_in_flight"]) == (20, 1)
+    assert [value for (_, value), _ in producer.send.call_args_list] == [
+        dumps(event) for event in events
+    ]
+    producer.flush.assert_called_once()
+
+    # Items are reported as written once all of their messages have been sent
+    for future in producer.futures[:2]:
+        future.success(None)
+    assert writer.on_written.call_count == 1
+    producer.futures[2].success(None)
+    assert writer.on_written.call_count == 2
+
+
+def test_kafka_write_async(producer):
+    writer = kafka.Plugin(kafka_producer_mode="async", **SETTINGS)
+    writer.write(iter(make_events(3)))
+    producer.flush.assert_not_called()
+
+    # Flushes once enough bytes are unflushed
+    writer.flush_bytes = 2 * len(dumps(make_events(1)[0]))
+    writer.write(iter(make_events(1)))
+    producer.flush.assert_called_once()
+
+    writer.stop()
+    assert producer.flush.call_count == 2
+
+
+def test_kafka_write_retries(mocker, producer):
+    events = make_events(4)
+    writer = kafka.Plugin(kafka_retry_buffer_size="2", **SETTINGS)
+    writer.on_written = mocker.MagicMock()
+    writer.write(iter(events))
+
+    # Only retriable failures are kept, as far as the buffer has room
+    producer.futures[0].failure(KafkaTimeoutError())
+    producer.futures[1].failure(MessageSizeTooLargeError())
+    producer.futures[2].failure(KafkaTimeoutError())
+    producer.futures[3].failure(KafkaTimeoutError())
+    assert [value for value, _, _, _ in writer.retries] == [
+        dumps(events[0]),
+        dumps(events[2]),
+    ]
+    assert writer.dropped == 2
+
+    # Dropped messages are reported as written, so that readers move past them
+    assert writer.on_written.call_args_list == [
+        mocker.call([events[1]]),
+        mocker.call([events[3]]),
+    ]
+
+    # Failed messages are sent again on the next write
+    producer.send.reset_mock()
+    writer.write(iter([]))
+    assert [value for (_, value), _ in producer.send.call_args_list] == [
+        dumps(events[0]),
+        dumps(events[2]),
+    ]
+    assert not writer.retries
+    assert writer.on_written.call_count == 2
+
+
+def test_kafka_write_envelopes(mocker, producer):
+    events = make_events(7)
+    writer = kafka.Plugin(
+        kafka_wire_format="envelope",
+        kafka_envelope_size="3",
+        kafka_envelope_compression="gzip",
+        **SETTINGS,
+    )
+    writer.on_written = mocker.MagicMock()
+    batch = EventBatch(DummyEvent, events[1:6])
+    writer.write(iter([events[0], batch, events[6]]))
+
+    # Events are packed into envelopes of up to 3 events, in order
+    envelopes = []
+    for (_, value), kwargs in producer.send.call_args_list:
+        assert kwargs["headers"] == [(ENVELOPE_HEADER, b"gzip")]
+        envelopes.append(list(loads(value, compression="gzip")))
+    assert envelopes == [events[:3], events[3:6], events[6:]]
+
+    # The batch is written once both envelopes holding its events are sent
+    producer.futures[0].success(None)
+    writer.on_written.assert_called_once_with([events[0]])
+    producer.futures[1].success(None)
+    writer.on_written.assert_called_with([batch])
+    producer.futures[2].success(None)
+    writer.on_written.assert_called_with([events[6]])
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [
+        {"kafka_envelope_max_age_ms": "5000"},
+        # Envelopes are sent before the producer flushes
+        {
+            "kafka_producer_mode": "async",
+            "kafka_flush_interval_ms": "5000",
+            "kafka_envelope_max_age_ms": "60000",
+        },
+    ],
+)
+def test_kafka_write_envelopes_streaming(mocker, producer, settings):
+    mocker.patch(
+        "uptimer.plugins.writers.kafka.monotonic", side_effect=itertools.count()
+    )
+    writer = kafka.Plugin(
+        kafka_wire_format="envelope",
+        kafka_envelope_compression="none",
+        **settings,
+        **SETTINGS,
+    )
+    sent = []
+
+    def stream():
+        # Streaming readers never exhaust the payload
+        for idx in itertools.count():
+            yield DummyEvent(target="t", reader="r", integer_value=idx, float_value=1)
+            sent.append(producer.send.call_count)
+
+    with pytest.raises(RuntimeError):
+        writer.write(itertools.chain(itertools.islice(stream(), 20), raise_error()))
+
+    # Envelopes are sent long before they are full
+    assert sent[-1] >= 3
+    envelopes = [
+        list(loads(value, compression="none"))
+        for (_, value), _ in producer.send.call_args_list
+    ]
+    assert all(0 < len(envelope) <= 6 for envelope in envelopes)
+
+
+def raise_error():
+    raise RuntimeError("Stopping the stream")
+    yield  # pragma: no cover
+
+
+def keyed_events():
+    return [
+        DummyEvent(target=target, reader="r", integer_value=idx, float_value=1.5)
+        for idx, target in enumerate(["a", "b", "a", "b", "a"])
+    ]
+
+
+def test_kafka_write_keys(producer):
+    events = keyed_events()
+    writer = kafka.Plugin(kafka_partition_key="target:reader", **SETTINGS)
+    writer.write(iter([EventBatch(DummyEvent, events[:2]), *events[2:]]))
+    assert [kwargs["key"] for _, kwargs in producer.send.call_args_list] == [
+        b"a:r",
+        b"b:r",
+        b"a:r",
+        b"b:r",
+        b"a:r",
+    ]
+
+    # Without a partition key, messages are sent without key
+    producer.send.reset_mock()
+    kafka.Plugin(**SETTINGS).write(iter(events))
+    assert {kwargs["key"] for _, kwargs in producer.send.call_args_list} == {None}
+
+
+def test_kafka_write_keyed_envelopes(mocker, producer):
+    events = keyed_events()
+    writer = kafka.Plugin(
+        kafka_wire_format="envelope",
+        kafka_envelope_size="2",
+        kafka_envelope_compression="none",
+        kafka_partition_key="target",
+        **SETTINGS,
+    )
+    writer.on_written = mocker.MagicMock()
+    batch = EventBatch(DummyEvent, events)
+    writer.write(iter([batch]))
+
+    # Envelopes only hold events of the same key
+    envelopes = [
+        (kwargs["key"], list(loads(value, compression="none")))
+        for (_, value), kwargs in producer.send.call_args_list
+    ]
+    assert envelopes == [
+        (b"a", [events[0], events[2]]),
+        (b"b", [events[1], events[3]]),
+        (b"a", [events[4]]),
+    ]
+
+    for future in producer.futures:
+        writer.on_written.assert_not_called()
+        future.success(None)
+    writer.on_written.assert_called_once_with([batch])
+
+
+@pytest.mark.parametrize(
+    "setting",
+    [
+        {"kafka_producer_mode": "later"},
+        {"kafka_wire_format": "xml"},
+        {"kafka_envelope_compression": "rar"},
+        {"kafka_codec": "xml"},
+    ],
+)
+def test_kafka_invalid_settings(producer, setting):
+    with pytest.raises(ValueError):
+        kafka.Plugin(**setting, **SETTINGS)
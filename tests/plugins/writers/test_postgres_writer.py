@@ -1,12 +1,14 @@
+from collections import Counter
 from os import environ
 from unittest.mock import call
 
 import pytest
 from psycopg2 import sql
+from psycopg2.errors import DataError, IntegrityError
 
 from uptimer.core import settings
-from uptimer.events import DummyEvent
-from uptimer.helpers.postgres import get_postgres_conn
+from uptimer.events import DummyEvent, EventBatch, ProbeEvent
+from uptimer.helpers.postgres import get_postgres_conn, get_primary_key
 from uptimer.plugins.writers import postgres
 
 require_postgres = pytest.mark.skipif(
@@ -37,7 +39,7 @@ def test_write_to_postgres(mocker, mockpg):
         sql.SQL(", ").join(sql.Placeholder() * len(keys)),
     )
 
-    writer = postgres.Plugin()
+    writer = postgres.Plugin(postgres_ingest="insert")
     writer.write(iter(writer_argument))
 
     assert processor.call_count == 2  # 1x on __init__, 1x when __enter__'ing
@@ -92,7 +94,7 @@ def test_invalid_event_write_to_postgres(mocker, mockpg):
         sql.SQL(", ").join(sql.Placeholder() * len(keys)),
     )
 
-    writer = postgres.Plugin()
+    writer = postgres.Plugin(postgres_ingest="insert")
     writer.write(iter(writer_argument))
 
     assert processor.call_count == 2  # 1x on __init__, 1x when __enter__'ing
@@ -117,6 +119,45 @@ def test_invalid_event_write_to_postgres(mocker, mockpg):
     processor().__exit__.assert_called_once()
 
 
+def test_write_tables_in_parallel(mocker, mockpg):
+    dummy_event = DummyEvent(
+        target="target", reader="ninjas", integer_value=1, float_value=1.5
+    )
+    probe_event = ProbeEvent(
+        hostname="example.com", port=443, status_code=200, response_time_ms=12
+    )
+    processor = mocker.patch("uptimer.plugins.writers.postgres.ProcessingThread")
+
+    writer = postgres.Plugin()
+    writer.pool.maxconn = 3
+    writer.write(iter([dummy_event, probe_event, dummy_event]))
+
+    # One queue per event type, i.e. table, flushed by a worker per connection
+    _, kwargs = processor.call_args
+    assert kwargs["workers"] == 3
+    assert kwargs["max_queue_size"] == 4 * writer.page_size
+    assert kwargs["spill"] is False
+    puts = processor.return_value.__enter__.return_value.put
+    assert puts.call_args_list == [
+        call(dummy_event, queue_name=DummyEvent),
+        call(probe_event, queue_name=ProbeEvent),
+        call(dummy_event, queue_name=DummyEvent),
+    ]
+
+
+def test_write_callback_borrows_connection(mocker, mockpg):
+    mocker.patch("uptimer.plugins.writers.postgres.copy_rows")
+    event = DummyEvent(
+        target="target", reader="ninjas", integer_value=1, float_value=1.5
+    )
+
+    writer = postgres.Plugin()
+    writer.write_callback([event])
+
+    writer.pool.connection.assert_called_once()
+    mockpg.connection.commit.assert_called_once()
+
+
 @require_postgres
 def test_postgres_connection_cached():
     db_url = settings.get("DATABASE_URL")
@@ -127,7 +168,10 @@ def test_postgres_connection_cached():
 
 
 @require_postgres
-def test_postgres_inserts(postgres_conn):
+@pytest.mark.parametrize(
+    "settings", [{"postgres_ingest": "insert"}, {}, {"postgres_copy_format": "binary"}]
+)
+def test_postgres_inserts(postgres_conn, settings):
     verify_query = sql.SQL(
         """
 SELECT
@@ -149,7 +193,7 @@ FROM
     )
     writer_argument = [event1, event2]
 
-    writer = postgres.Plugin()
+    writer = postgres.Plugin(**settings)
     writer.write(iter(writer_argument))
 
     with postgres_conn.cursor() as cursor:
@@ -198,3 +242,264 @@ FROM
     with postgres_conn.cursor() as cursor:
         cursor.execute(verify_query)
         assert cursor.rowcount == row_count_before + 4
+
+
+def test_write_to_postgres_validated_at_writer(mocker, mockpg):
+    events = [
+        DummyEvent(
+            target=f"target-{idx}",
+            reader="ninjas",
+            integer_value=idx,
+            float_value=123.45,
+            validate=False,
+        )
+        for idx in range(3)
+    ]
+    events[1]["uuid"] = "nope"
+
+    processor = mocker.patch("uptimer.plugins.writers.postgres.ProcessingThread")
+    ctx_processor = mocker.MagicMock(name="contextmanaged_processor")
+    processor().__enter__.return_value = ctx_processor
+
+    writer = postgres.Plugin(event_validation="writer")
+    assert writer.validation_policy.policy == "writer"
+    writer.write(iter(events))
+
+    ctx_processor.put.assert_has_calls(
+        [
+            call(events[0], queue_name=DummyEvent),
+            call(events[2], queue_name=DummyEvent),
+        ]
+    )
+    assert ctx_processor.put.call_count == 2
+    assert events[0].is_validated and events[2].is_validated
+
+
+def test_write_batch_to_postgres(mocker, mockpg):
+    events = [
+        DummyEvent(
+            target=f"target-{idx}",
+            reader="ninjas",
+            integer_value=idx,
+            float_value=123.45,
+            validate=False,
+        )
+        for idx in range(3)
+    ]
+    events[1]["integer_value"] = "nope"
+    single_event = DummyEvent(
+        target="target-3", reader="ninjas", integer_value=3, float_value=123.45
+    )
+
+    execute_batch = mocker.patch("uptimer.plugins.writers.postgres.execute_batch")
+    processor = mocker.patch("uptimer.plugins.writers.postgres.ProcessingThread")
+    ctx_processor = mocker.MagicMock(name="contextmanaged_processor")
+    processor().__enter__.return_value = ctx_processor
+
+    writer = postgres.Plugin(postgres_ingest="insert")
+    writer.on_written = mocker.MagicMock()
+    original = EventBatch(DummyEvent, events)
+    original.delivery_tag = 7
+    writer.write(iter([original, single_event]))
+
+    # The batch is put as a whole, without its invalid event
+    assert ctx_processor.put.call_count == 2
+    (batch,), kwargs = ctx_processor.put.call_args_list[0]
+    assert kwargs == {"queue_name": DummyEvent}
+    assert list(batch) == [events[0], events[2]]
+    assert batch.delivery_tag == 7
+    ctx_processor.put.assert_called_with(single_event, queue_name=DummyEvent)
+
+    writer.write_callback([batch, single_event], connection=mockpg.connection)
+    keys = DummyEvent.properties
+    (_, _, values), _ = execute_batch.call_args
+    assert values == tuple(
+        event.to_tuple(keys) for event in [events[0], events[2], single_event]
+    )
+
+    # Once committed, the items are reported as written
+    writer.on_written.assert_called_once_with([batch, single_event])
+
+
+@pytest.mark.parametrize("copy_format", ["text", "binary"])
+def test_copy_to_postgres(mocker, mockpg, copy_format):
+    events = [
+        DummyEvent(
+            target=f"target-{idx}", reader="ninjas", integer_value=idx, float_value=1.5
+        )
+        for idx in range(2)
+    ]
+    execute_batch = mocker.patch("uptimer.plugins.writers.postgres.execute_batch")
+    copy_rows = mocker.patch("uptimer.plugins.writers.postgres.copy_rows")
+    get_column_types = mocker.patch("uptimer.plugins.writers.postgres.get_column_types")
+
+    writer = postgres.Plugin(postgres_copy_format=copy_format)
+    assert writer.ingest == "copy"
+    for _ in range(2):
+        writer.write_callback(events, connection=mockpg.connection)
+
+    keys = DummyEvent.properties
+    copy_rows.assert_called_with(
+        mockpg.cursor.return_value,
+        "dummy_events",
+        keys,
+        tuple(event.to_tuple(keys) for event in events),
+        copy_format=copy_format,
+        column_types=get_column_types.return_value if copy_format == "binary" else None,
+    )
+    # Column types are looked up once per table
+    assert get_column_types.call_count == (1 if copy_format == "binary" else 0)
+    execute_batch.assert_not_called()
+    assert mockpg.connection.commit.call_count == 2
+
+
+def test_copy_to_postgres_fallback(mocker, mockpg):
+    event = DummyEvent(
+        target="target", reader="ninjas", integer_value=1, float_value=1.5
+    )
+    execute_batch = mocker.patch("uptimer.plugins.writers.postgres.execute_batch")
+    mocker.patch(
+        "uptimer.plugins.writers.postgres.copy_rows",
+        side_effect=ValueError("Cannot encode column"),
+    )
+
+    writer = postgres.Plugin()
+    writer.write_callback([event], connection=mockpg.connection)
+
+    mockpg.connection.rollback.assert_called_once()
+    execute_batch.assert_called_once()
+    mockpg.connection.commit.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "settings", [{"postgres_ingest": "upsert"}, {"postgres_copy_format": "csv"}]
+)
+def test_invalid_ingest_settings(mockpg, settings):
+    with pytest.raises(ValueError):
+        postgres.Plugin(**settings)
+
+
+@pytest.mark.parametrize("bad_rows", [[], [7], [0, 15], [3, 4, 5], list(range(16))])
+def test_write_isolating(mocker, mockpg, bad_rows):
+    statements = []
+
+    def write_rows(cursor, rows):
+        statements.append(rows)
+        for row in rows:
+            if row in bad_rows:
+                raise (IntegrityError if row % 2 else DataError)(f"bad row {row}")
+        return Counter(inserted=len(rows))
+
+    writer = postgres.Plugin()
+    counts, offending = writer.write_isolating(
+        mockpg.connection, mockpg.cursor.return_value, write_rows, list(range(16))
+    )
+
+    assert [row for row, _ in offending] == bad_rows
+    assert counts["inserted"] == 16 - len(bad_rows)
+    assert all(isinstance(exc, postgres.ROW_ERRORS) for _, exc in offending)
+    # Isolating a few rows takes O(k log n) statements instead of one per row
+    if len(bad_rows) == 1:
+        assert len(statements) == 1 + 2 * 4
+    mockpg.connection.commit.assert_called_once()
+    assert mockpg.connection.rollback.call_count == (1 if bad_rows else 0)
+
+
+def test_dead_letter(mocker, mockpg):
+    events = [
+        DummyEvent(
+            target=f"target-{idx}", reader="ninjas", integer_value=idx, float_value=1.5
+        )
+        for idx in range(4)
+    ]
+    del events[2]["target"]
+    dead_letter = mocker.MagicMock(name="dead_letter_writer")
+    load_plugin = mocker.patch(
+        "uptimer.plugins.writers.postgres.load_plugin", return_value=dead_letter
+    )
+
+    def copy_rows(cursor, table, keys, rows, **kwargs):
+        if events[1].to_tuple() in rows or events[2].to_tuple() in rows:
+            raise IntegrityError("duplicate key")
+
+    mocker.patch("uptimer.plugins.writers.postgres.copy_rows", side_effect=copy_rows)
+
+    writer = postgres.Plugin(postgres_dead_letter="writers.stdout")
+    load_plugin.assert_called_once_with("writers.stdout")
+    writer.write_callback(events, connection=mockpg.connection)
+
+    (dead_letters,), _ = dead_letter.write.call_args
+    assert list(dead_letters) == events[1:3]
+
+
+@require_postgres
+@pytest.mark.parametrize("ingest", ["copy", "insert"])
+@pytest.mark.parametrize("on_conflict", ["ignore", "update"])
+def test_postgres_on_conflict(postgres_conn, ingest, on_conflict):
+    events = [
+        DummyEvent(target="target", reader="ninjas", integer_value=idx, float_value=1.5)
+        for idx in range(3)
+    ]
+    writer = postgres.Plugin(postgres_ingest=ingest, postgres_on_conflict=on_conflict)
+    writer.write_callback(events[:2], connection=postgres_conn)
+    assert writer.stats == Counter(inserted=2, updated=0, skipped=0, rejected=0)
+
+    # Re-delivered events don't set off isolating offending rows
+    events[0]["integer_value"] = 42
+    writer.write_callback(events, connection=postgres_conn)
+    if on_conflict == "ignore":
+        expected = Counter(inserted=3, updated=0, skipped=2, rejected=0)
+    else:
+        expected = Counter(inserted=3, updated=2, skipped=0, rejected=0)
+    assert writer.stats == expected
+
+    with postgres_conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT integer_value FROM dummy_events WHERE uuid = %s",
+            (events[0]["uuid"],),
+        )
+        assert cursor.fetchone() == (42 if on_conflict == "update" else 0,)
+
+
+@require_postgres
+def test_get_primary_key(postgres_conn):
+    with postgres_conn.cursor() as cursor:
+        assert get_primary_key(cursor, "dummy_events") == ["event_time", "uuid"]
+        assert get_primary_key(cursor, "probe_events") == ["uuid", "event_time"]
+
+
+def test_queue_settings(mockpg):
+    writer = postgres.Plugin(
+        postgres_queue_limit="100", postgres_queue_overflow="spill"
+    )
+    assert writer.queue_limit == 100
+    assert writer.queue_overflow == "spill"
+
+    events = [
+        DummyEvent(target="target", reader="ninjas", integer_value=1, float_value=1.5)
+    ] * 3
+    assert writer.event_count(events[0]) == 1
+    assert writer.event_count(EventBatch.from_events(events)) == 3
+
+    with pytest.raises(ValueError):
+        postgres.Plugin(postgres_queue_overflow="drop")
+
+
+def test_on_conflict_update_without_values(mockpg):
+    source = sql.SQL("VALUES %s")
+    queries = {}
+    for on_conflict in ("ignore", "update"):
+        writer = postgres.Plugin(postgres_on_conflict=on_conflict)
+        writer._primary_keys["dummy_events"] = ["event_time", "uuid"]
+        queries[on_conflict] = writer.conflict_query(
+            "dummy_events", ["uuid", "event_time"], source
+        )
+
+    # Nothing to update besides the primary key, conflicting rows are skipped
+    assert queries["update"] == queries["ignore"]
+    assert sql.SQL("NOTHING") in queries["update"].seq
+
+
+def test_invalid_on_conflict_mode(mockpg):
+    with pytest.raises(ValueError):
+        postgres.Plugin(postgres_on_conflict="replace")
@@ -1,3 +1,4 @@
+from uptimer.events import DummyEvent, EventBatch
 from uptimer.events.base import Event
 from uptimer.plugins.writers.stdout import Stdout
 
@@ -7,3 +8,46 @@ def test_stdout(capfd):
     writer.write(iter([Event(message="Hello stdout!")]))
     out, err = capfd.readouterr()
     assert '"message": "Hello stdout!"' in out
+
+
+def make_dummy_event(idx):
+    return DummyEvent(
+        target="target", reader="ninjas", integer_value=idx, float_value=1.5
+    )
+
+
+def test_stdout_batch(capfd, mocker):
+    writer = Stdout(stdout_truncate_settings=3)
+    writer.on_written = mocker.MagicMock()
+    batch = EventBatch(DummyEvent, [make_dummy_event(idx) for idx in range(2)])
+    writer.write(iter([batch, make_dummy_event(2), make_dummy_event(3)]))
+    out, err = capfd.readouterr()
+    # Truncation counts the events of batches
+    assert [f'"integer_value": {idx}' in out for idx in range(4)] == [
+        True,
+        True,
+        True,
+        False,
+    ]
+    assert writer.on_written.call_count == 2
+
+
+def test_stdout_acknowledges_truncated(mocker):
+    writer = Stdout(stdout_truncate_settings=3)
+    writer.on_written = mocker.MagicMock()
+    batch = EventBatch(DummyEvent, [make_dummy_event(idx) for idx in range(4)])
+    writer.write(iter([batch]))
+
+    # The batch is cut short, and never written completely
+    writer.on_written.assert_called_once_with([batch])
+
+
+def test_stdout_drops_invalid_events(capfd):
+    writer = Stdout()
+    invalid = make_dummy_event(1)
+    invalid["integer_value"] = "one"
+    batch = EventBatch(DummyEvent, [make_dummy_event(0), invalid])
+    writer.write(iter([batch, invalid]))
+    out, err = capfd.readouterr()
+    assert out.count('"schema_title"') == 1
+    assert '"integer_value": 0' in out
@@ -8,6 +8,11 @@ from uptimer.plugins.state import plugin_state
 logger = get_logger()
 
 
+def connect(writer, reader):
+    """Lets the writer report the events it has written back to the reader."""
+    writer.on_written = getattr(reader, "acknowledge", None)
+
+
 def queue_processor(writer, queue_plugin):
     queue = load_plugin(queue_plugin)
     plugin_state.register(queue=queue)
@@ -25,6 +30,7 @@ def queue_processor(writer, queue_plugin):
 
         reader = load_plugin(job["reader"], parameters=job.get("parameters", None))
         plugin_state.register(queue=queue, reader=reader, writer=writer)
+        connect(writer, reader)
         logger.info(
             "Will process queue entry.", uuid=str(job["uuid"]), reader=job["reader"]
         )
@@ -45,6 +51,7 @@ def queue_processor(writer, queue_plugin):
 def static_reader_writer_processor(writer, reader_plugin):
     reader = load_plugin(reader_plugin)
     plugin_state.register(reader=reader, writer=writer)
+    connect(writer, reader)
 
     logger.info("Entering read/write loop.")
     while True:
@@ -1,4 +1,5 @@
-from os import path
+from os import environ, path
+from typing import Optional
 
 ROOT_SCHEMA: str = "root.json"
 """The default root JSON schema to be used for all event (sub)classes."""
@@ -11,5 +12,13 @@ SCHEMATA_PATH: str = path.join(HERE, SCHEMATA_SUBDIR, "")
 ROOT_SCHEMA_FULLPATH: str = path.join(SCHEMATA_PATH, ROOT_SCHEMA)
 DEFAULT_TABLE: str = "event"
 
+SCHEMA_BUNDLE_PATH: Optional[str] = environ.get("UPTIMER_SCHEMA_BUNDLE_PATH") or None
+"""Directory of the precompiled schema bundle, the bundle is disabled if unset."""
+
 from uptimer.events.base import Event  # noqa: F401, E402
+from uptimer.events.batch import EventBatch  # noqa: F401, E402
+from uptimer.events.cache import schema_bundle  # noqa: E402
 from uptimer.events.stubs import *  # noqa: F401, E402, F403
+
+# Persists the schemata compiled while defining the event classes above
+schema_bundle.save()
@@ -1,14 +1,14 @@
 import json
 from collections.abc import MutableMapping
 from datetime import datetime, timezone
-from typing import Any, ClassVar, Optional
+from typing import Any, ClassVar, Dict, Iterable, List, Optional
 from uuid import UUID, uuid4
 
-import jsonschema
+from jsonschema.exceptions import best_match
 from structlog import get_logger
 
 from uptimer.events import DEFAULT_TABLE, ROOT_SCHEMA
-from uptimer.events.formats import JSONEncoder, format_checker
+from uptimer.events.formats import JSONEncoder
 from uptimer.events.meta import EventMeta
 from uptimer.exceptions import ValidationError
 
@@ -50,8 +50,17 @@ class Event(MutableMapping, metaclass=EventMeta):
                 }
             ]
         }
+
+    To keep the memory footprint of large numbers of events low, events are stored
+    in a compact layout generated by :class:`EventMeta` from the schema: the values
+    of the schema's properties are kept in a list with one fixed slot per property
+    (in the order of :attr:`properties`), alongside a bitmask of the properties that
+    are set. Only properties that are not part of the schema are stored in a dict.
+    Event classes use ``__slots__``, so their instances don't carry a ``__dict__``.
     """
 
+    __slots__ = ("_values", "_present", "_extra", "_validated", "delivery_tag")
+
     schema: ClassVar[str] = ROOT_SCHEMA
     """Filename of the JSON schema to load."""
 
@@ -64,6 +73,12 @@ class Event(MutableMapping, metaclass=EventMeta):
     properties_dict: ClassVar[dict]
     """Properties of the loaded JSON schema."""
 
+    properties: ClassVar[List[str]]
+    """Names of the properties of the loaded JSON schema."""
+
+    _property_index: ClassVar[Dict[str, int]]
+    """Slot index of each of the schema's properties (derived from `properties`)."""
+
     def __init__(
         self,
         *,
@@ -84,7 +99,12 @@ class Event(MutableMapping, metaclass=EventMeta):
 
         .. _`RFC3339`: https://tools.ietf.org/html/rfc3339#section-5.6
         """
-        self._data: dict = dict()
+        self._values: list = [None] * len(self.properties)
+        self._present = 0
+        self._extra: Optional[dict] = None
+        self._validated = False
+        self.delivery_tag: Optional[int] = None
+        """Tag of the reader's delivery the event is part of, kept when pickled."""
         self.update(
             {
                 "schema_title": self.schema_spec["title"],
@@ -102,28 +122,121 @@ class Event(MutableMapping, metaclass=EventMeta):
         if validate:
             self.validate()
 
+    @classmethod
+    def _from_slots(cls, values: Iterable, present: int) -> "Event":
+        """Instantiates an event from its slots, bypassing defaults and validation."""
+        event = cls.__new__(cls)
+        event._values = list(values)
+        event._present = present
+        event._extra = None
+        event._validated = False
+        event.delivery_tag = None
+        return event
+
     def __getitem__(self, key):
-        return self._data[key]
+        idx = self._property_index.get(key)
+        if idx is None:
+            if self._extra is None:
+                raise KeyError(key)
+            return self._extra[key]
+        if not self._present >> idx & 1:
+            raise KeyError(key)
+        return self._values[idx]
 
     def __setitem__(self, key, value):
-        self._data[key] = value
+        idx = self._property_index.get(key)
+        if idx is None:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+        else:
+            self._values[idx] = value
+            self._present |= 1 << idx
+        self._validated = False
 
     def __delitem__(self, key):
-        del self._data[key]
+        idx = self._property_index.get(key)
+        if idx is None:
+            if self._extra is None:
+                raise KeyError(key)
+            del self._extra[key]
+        else:
+            if not self._present >> idx & 1:
+                raise KeyError(key)
+            self._values[idx] = None
+            self._present &= ~(1 << idx)
+        self._validated = False
+
+    def __contains__(self, key):
+        idx = self._property_index.get(key)
+        if idx is None:
+            return self._extra is not None and key in self._extra
+        return bool(self._present >> idx & 1)
 
     def __iter__(self):
-        return iter(self._data)
+        present = self._present
+        for idx, key in enumerate(self.properties):
+            if present >> idx & 1:
+                yield key
+        if self._extra:
+            yield from self._extra
 
     def __len__(self):
-        return len(self._data)
+        return bin(self._present).count("1") + len(self._extra or ())
 
     def __repr__(self):
         return f"<{self.__class__.__name__} {repr(self._data)}>"
 
+    @property
+    def _data(self) -> dict:
+        """The event's properties as a dict (in the order of :attr:`properties`)."""
+        present = self._present
+        data = {
+            key: value
+            for idx, (key, value) in enumerate(zip(self.properties, self._values))
+            if present >> idx & 1
+        }
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def to_tuple(self, keys: Optional[Iterable[str]] = None) -> tuple:
+        """Returns the values of the given properties as a tuple.
+
+        Missing properties are returned as None. When `keys` are the event class'es
+        :attr:`properties` (the default), the tuple is a copy of the event's slots,
+        without looking up the properties one by one.
+
+        Args:
+            keys (:obj:`iter`): Names of the properties to return, in order.
+        """
+        if keys is None or keys is self.properties or keys == self.properties:
+            return tuple(self._values)
+        return tuple(self.get(key) for key in keys)
+
     @property
     def naive_repr(self):
         return json.loads(self.to_json(validate=False))
 
+    @property
+    def is_validated(self) -> bool:
+        """Whether the event has been validated, and not been modified since.
+
+        Modifications are tracked through setting and deleting the event's properties.
+        Changes to mutable property values (e.g. appending to a list) cannot be
+        tracked, and require calling :meth:`validate` explicitly.
+        """
+        return self._validated
+
+    def ensure_validated(self):
+        """Validates the event, unless it has been validated and not modified since.
+
+        Raises:
+            ValidationError: If the validation of the event data fails.
+        """
+        if not self._validated:
+            self.validate()
+
     def validate(self):
         """Validate the event's data against its JSON schema.
 
@@ -134,12 +247,12 @@ class Event(MutableMapping, metaclass=EventMeta):
             ValidationError: If the validation of the event data fails.
         """
         try:
-            jsonschema.validate(
-                instance=self.naive_repr,
-                schema=self.schema_spec,
-                resolver=self._resolver,
-                format_checker=format_checker,
-            )
+            # Validate the python-native data directly, saving the round-trip through
+            # JSON that `naive_repr` would take.
+            error = best_match(self._validator.iter_errors(self._data))
+            if error is not None:
+                raise error
+            self._validated = True
         except Exception:
             logger.exception(
                 "Encountered exception during validation",
@@ -148,11 +261,13 @@ class Event(MutableMapping, metaclass=EventMeta):
             raise
 
     @classmethod
-    def from_json(cls, data):
+    def from_json(cls, data, *, validate=True):
         """Instantiates a class object from a given JSON object or string.
 
         Args:
             data (dict or str): JSON object, or string to be parsed into a JSON object.
+            validate (bool): Set to false to prevent the event from being validated on
+                creation.
 
         Returns:
             Event: Event object with the input data as its state.
@@ -164,10 +279,10 @@ class Event(MutableMapping, metaclass=EventMeta):
         if not isinstance(data, dict):
             raise ValueError("Input must be JSON object (or python-native dict)")
 
-        return cls.from_uncast_dict(data)
+        return cls.from_uncast_dict(data, validate=validate)
 
     @classmethod
-    def from_uncast_dict(cls, data):
+    def from_uncast_dict(cls, data, *, validate=True):
         """Instantiates a class object from a given dict of uncast values.
 
         When an event is written to a plain-text destination (e.g. a CSV file), the
@@ -180,6 +295,8 @@ class Event(MutableMapping, metaclass=EventMeta):
 
         Args:
             data (dict): Dict of string values to be parsed into the class object
+            validate (bool): Set to false to prevent the event from being validated on
+                creation.
 
         Returns:
             Event: Event object with the input data as its state.
@@ -207,7 +324,7 @@ class Event(MutableMapping, metaclass=EventMeta):
                 except ValueError:
                     continue
 
-        return cls(**cast_data)
+        return cls(**cast_data, validate=validate)
 
     def to_json(self, *, validate=False, **kwargs):
         """Validates the Event and serializes it to a JSON formatted string.
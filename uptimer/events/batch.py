@@ -0,0 +1,405 @@
+"""Columnar container for bulk processing of events of a single event class.
+
+An :class:`EventBatch` stores its events as columns, one list per property of the
+event class'es schema, which lets pipelines handling large numbers of events operate
+on whole columns instead of one event object at a time::
+
+    from uptimer.events import EventBatch, ProbeEvent
+
+    batch = EventBatch(ProbeEvent, events)
+    errors = batch.errors()  # Validates the columns, {row index: error message}
+    rows = batch.rows()  # List of row tuples in the order of ProbeEvent.properties
+    body = batch.to_json()  # JSON array of the events
+
+Iterating over a batch, or indexing it, materializes :class:`Event` objects.
+"""
+import json
+from datetime import datetime
+from functools import lru_cache
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
+from uuid import UUID
+
+from jsonschema.exceptions import ValidationError, best_match
+
+from uptimer.events.base import Event
+from uptimer.events.formats import (
+    JSONEncoder,
+    native_format_checker,
+    native_validator_for,
+)
+
+# Types a column's values may have to pass the columnar type check. Values of other
+# types are checked one by one, see `ColumnCheck`.
+NATIVE_TYPES = {
+    "string": {str, datetime, UUID},
+    "integer": {int},
+    "number": {int, float},
+    "boolean": {bool},
+    "null": {type(None)},
+    "array": {list, tuple},
+    "object": {dict},
+}
+
+NATIVE_FORMATS = {"uuid": {UUID}, "date-time": {datetime}}
+
+BOUNDS = {
+    "minimum": lambda low, bound: low >= bound,
+    "exclusiveMinimum": lambda low, bound: low > bound,
+    "maximum": lambda high, bound: high <= bound,
+    "exclusiveMaximum": lambda high, bound: high < bound,
+}
+
+COLUMN_KEYWORDS = {"type", "format", "default", "title", "description", *BOUNDS}
+SCHEMA_KEYWORDS = {
+    "$schema",
+    "$id",
+    "title",
+    "version",
+    "description",
+    "type",
+    "allOf",
+    "properties",
+    "required",
+}
+
+
+class ColumnCheck(NamedTuple):
+    """Checks of the values of one property, compiled from its subschemas."""
+
+    index: int
+    types: Optional[set]
+    bounds: Dict[str, float]
+    formats: set
+    columnar: bool
+    validators: list
+
+    def passes(self, values: list) -> bool:
+        """Whether all values are valid, as far as decidable for the whole column."""
+        if not self.columnar:
+            return False
+        value_types = set(map(type, values))
+        if self.types is not None and not value_types <= self.types:
+            return False
+        for format_ in self.formats:
+            if not value_types <= NATIVE_FORMATS.get(format_, set()):
+                return False
+        if self.bounds:
+            numbers = [value for value in values if value is not None]
+            if not numbers or not value_types <= NATIVE_TYPES["number"] | {type(None)}:
+                return not numbers
+            low, high = min(numbers), max(numbers)
+            for keyword, bound in self.bounds.items():
+                if not BOUNDS[keyword](high if "max" in keyword else low, bound):
+                    return False
+        return True
+
+    def errors(self, prop: str, values: Iterable, rows: Iterable[int]):
+        """Yields the row index and error message of every invalid value."""
+        for row, value in zip(rows, values):
+            for validator in self.validators:
+                error = best_match(validator.iter_errors(value))
+                if error is not None:
+                    yield row, f"Property '{prop}' is invalid: {error.message}"
+                    break
+
+
+class ValidationPlan(NamedTuple):
+    required_mask: int
+    checks: Dict[str, ColumnCheck]
+
+
+def _walk_schema(schema: dict, subschemas: Dict[str, list], required: set) -> bool:
+    """Collects subschemas and required properties, False if not columnar."""
+    if not set(schema) <= SCHEMA_KEYWORDS or schema.get("type", "object") != "object":
+        return False
+    for prop, subschema in schema.get("properties", {}).items():
+        subschemas.setdefault(prop, []).append(subschema)
+    required.update(schema.get("required", ()))
+    return all(
+        _walk_schema(sub, subschemas, required) for sub in schema.get("allOf", ())
+    )
+
+
+@lru_cache(maxsize=None)
+def validation_plan(event_type: Type[Event]) -> Optional[ValidationPlan]:
+    """Compiles the columnar validation of the event type, None if unsupported.
+
+    Columnar validation supports schemas made up of (nested) ``allOf`` combinations
+    of ``properties`` and ``required`` statements. Property values are checked for
+    their type, bounds, and format column by column. Columns failing these checks, or
+    with property subschemas using other keywords, are validated value by value.
+    """
+    subschemas: Dict[str, list] = {}
+    required: set = set()
+    if not _walk_schema(event_type.schema_spec, subschemas, required):
+        return None
+
+    validator_cls = native_validator_for(event_type.schema_spec)
+    required_mask = 0
+    checks = {}
+    for prop, idx in event_type._property_index.items():
+        if prop in required:
+            required_mask |= 1 << idx
+
+        types: Optional[set] = None
+        bounds: Dict[str, float] = {}
+        formats = set()
+        columnar = True
+        for subschema in subschemas[prop]:
+            columnar = columnar and set(subschema) <= COLUMN_KEYWORDS
+            if "type" in subschema:
+                json_types = subschema["type"]
+                if not isinstance(json_types, list):
+                    json_types = [json_types]
+                allowed = set().union(*(NATIVE_TYPES[t] for t in json_types))
+                types = allowed if types is None else types & allowed
+            if "format" in subschema:
+                formats.add(subschema["format"])
+            bounds.update({k: v for k, v in subschema.items() if k in BOUNDS})
+
+        validators = [
+            validator_cls(
+                subschema,
+                resolver=event_type._resolver,
+                format_checker=native_format_checker,
+            )
+            for subschema in subschemas[prop]
+        ]
+        checks[prop] = ColumnCheck(idx, types, bounds, formats, columnar, validators)
+
+    if not required <= set(checks):
+        return None
+    return ValidationPlan(required_mask, checks)
+
+
+class EventBatch(Sequence):
+    """Stores events of one event class as columns, one list per schema property."""
+
+    def __init__(self, event_type: Type[Event], events: Iterable[Event] = ()) -> None:
+        """Instantiates an EventBatch, optionally adding the given events.
+
+        Args:
+            event_type (:obj:`type`): Event class of the events in the batch.
+            events (:obj:`iter`): Events to add to the batch.
+        """
+        self.event_type = event_type
+        self.columns: Dict[str, list] = {prop: [] for prop in event_type.properties}
+        self._column_lists = list(self.columns.values())
+        self._present: List[int] = []
+        self._validated = True
+        self.delivery_tag: Optional[int] = None
+        """Tag of the reader's delivery the batch is part of, see :class:`Event`."""
+        self.extend(events)
+
+    @classmethod
+    def from_events(cls, events: Iterable[Event]) -> "EventBatch":
+        """Creates a batch of the given events, taking the event type from the first.
+
+        Raises:
+            ValueError: If there are no events.
+        """
+        events = iter(events)
+        try:
+            first = next(events)
+        except StopIteration:
+            raise ValueError("Cannot infer the event type of an empty batch")
+        batch = cls(type(first), [first])
+        batch.extend(events)
+        return batch
+
+    def __repr__(self):
+        return f"<EventBatch of {len(self)} {self.event_type.__name__}s>"
+
+    def __len__(self):
+        return len(self._present)
+
+    def __iter__(self) -> Iterator[Event]:
+        for values, present in zip(zip(*self._column_lists), self._present):
+            yield self.event_type._from_slots(values, present)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return self.take(range(len(self))[idx])
+        return self.event_type._from_slots(
+            [column[idx] for column in self._column_lists], self._present[idx]
+        )
+
+    @property
+    def is_validated(self) -> bool:
+        """Whether all events in the batch have been validated."""
+        return self._validated
+
+    def append(self, event: Event) -> None:
+        """Adds the event to the batch.
+
+        Raises:
+            ValueError: If the event is not of the batch's event type, or has
+                properties that are not part of the schema.
+        """
+        if type(event) is not self.event_type:
+            raise ValueError(
+                f"Cannot add {type(event).__name__} to a batch of "
+                f"{self.event_type.__name__}s"
+            )
+        if event._extra:
+            raise ValueError(
+                f"Cannot add events with properties outside of the schema to a batch: "
+                f"{list(event._extra)}"
+            )
+        for column, value in zip(self._column_lists, event._values):
+            column.append(value)
+        self._present.append(event._present)
+        self._validated = self._validated and event.is_validated
+
+    def extend(self, events: Iterable[Event]) -> None:
+        for event in events:
+            self.append(event)
+
+    def take(self, indices: Iterable[int]) -> "EventBatch":
+        """Returns a new batch of the events at the given indices."""
+        indices = list(indices)
+        batch = EventBatch(self.event_type)
+        for column, taken in zip(self._column_lists, batch._column_lists):
+            taken.extend(column[idx] for idx in indices)
+        batch._present = [self._present[idx] for idx in indices]
+        batch._validated = self._validated
+        return batch
+
+    def errors(self) -> Dict[int, str]:
+        """Validates the batch against the event type's schema, column by column.
+
+        Returns:
+            dict: The error message of every invalid event keyed by its index, empty
+                if all events are valid.
+        """
+        plan = validation_plan(self.event_type)
+        if plan is None:
+            return self._event_errors()
+
+        errors: Dict[int, str] = {}
+        required = plan.required_mask
+        for row, present in enumerate(self._present):
+            if present & required != required:
+                missing = [
+                    prop
+                    for prop, check in plan.checks.items()
+                    if required >> check.index & 1 and not present >> check.index & 1
+                ]
+                errors[row] = f"Missing required properties {missing}"
+
+        for prop, check in plan.checks.items():
+            column = self._column_lists[check.index]
+            if all(present >> check.index & 1 for present in self._present):
+                values, rows = column, range(len(column))
+            else:
+                rows = [
+                    row
+                    for row, present in enumerate(self._present)
+                    if present >> check.index & 1
+                ]
+                values = [column[row] for row in rows]
+            if check.passes(values):
+                continue
+            for row, message in check.errors(prop, values, rows):
+                errors.setdefault(row, message)
+        return errors
+
+    def _event_errors(self) -> Dict[int, str]:
+        errors = {}
+        for row, event in enumerate(self):
+            error = best_match(event._validator.iter_errors(event._data))
+            if error is not None:
+                errors[row] = error.message
+        return errors
+
+    def validate(self) -> None:
+        """Validates the batch, see :meth:`errors`.
+
+        Raises:
+            ValidationError: For the first invalid event.
+        """
+        errors = self.errors()
+        if errors:
+            row = min(errors)
+            raise ValidationError(f"Event {row} of batch is invalid: {errors[row]}")
+        self._validated = True
+
+    def valid(self) -> Tuple["EventBatch", Dict[int, str]]:
+        """Validates the batch, dropping invalid events.
+
+        Returns:
+            tuple: The validated batch of the valid events, and the error messages of
+                the dropped events keyed by their index (see :meth:`errors`).
+        """
+        if self._validated:
+            return self, {}
+        errors = self.errors()
+        batch = self.drop(errors)
+        batch._validated = True
+        return batch, errors
+
+    def drop(self, indices: Iterable[int]) -> "EventBatch":
+        """Returns a batch without the events at the given indices."""
+        indices = set(indices)
+        if not indices:
+            return self
+        return self.take(row for row in range(len(self)) if row not in indices)
+
+    def rows(self, keys: Optional[Sequence[str]] = None) -> List[tuple]:
+        """Returns the events as tuples of their property values.
+
+        Missing properties are returned as None.
+
+        Args:
+            keys (:obj:`iter`): Names of the properties to return, in order. Defaults
+                to all of the event class'es properties.
+        """
+        if keys is None or list(keys) == self.event_type.properties:
+            return list(zip(*self._column_lists))
+        empty = [None] * len(self)
+        return list(zip(*(self.columns.get(key, empty) for key in keys)))
+
+    def _dicts(self) -> Iterator[dict]:
+        properties = self.event_type.properties
+        complete = (1 << len(properties)) - 1
+        for values, present in zip(zip(*self._column_lists), self._present):
+            if present == complete:
+                yield dict(zip(properties, values))
+            else:
+                yield {
+                    prop: value
+                    for idx, (prop, value) in enumerate(zip(properties, values))
+                    if present >> idx & 1
+                }
+
+    def iter_json(self, **kwargs) -> Iterator[str]:
+        """Yields every event serialized to a JSON formatted string.
+
+        Args:
+            **kwargs: Arbitrary keyword arguments, passed on to :func:`json.dumps`.
+        """
+        encoder = JSONEncoder(**kwargs)
+        for data in self._dicts():
+            yield encoder.encode(data)
+
+    def to_json(self, **kwargs) -> str:
+        """Serializes the batch to a JSON formatted array of events.
+
+        Args:
+            **kwargs: Arbitrary keyword arguments, passed on to :func:`json.dumps`.
+        """
+        return json.dumps(list(self._dicts()), cls=JSONEncoder, **kwargs)
+
+
+EventOrBatch = Union[Event, EventBatch]
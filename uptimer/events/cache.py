@@ -1,10 +1,14 @@
 import json
-from os import path
+from hashlib import sha256
+from os import makedirs, path, replace, scandir
+from tempfile import NamedTemporaryFile
+from typing import Dict, Optional, Tuple
 
 from cachetools import Cache
 from structlog import get_logger
 
-from uptimer.events import SCHEMATA_PATH
+from uptimer import __version__
+from uptimer.events import SCHEMA_BUNDLE_PATH, SCHEMATA_PATH
 
 logger = get_logger()
 
@@ -96,4 +100,176 @@ class SchemaCache(Cache):
         return data
 
 
+class SchemaBundle:
+    """Precompiled schemata of the event classes, persisted to disk as JSON.
+
+    Defining an event class resolves its JSON schema, collects its properties, and
+    checks the schema against its meta-schema (see
+    :class:`~uptimer.events.meta.EventMeta`). The bundle keeps the outcome of that
+    for all event classes in a single file, which is loaded with one read on the
+    first lookup, and saved once the event classes have been defined::
+
+        bundle = SchemaBundle("/var/cache/uptimer")
+        compiled = bundle.get("probe-event.json")  # None if not bundled yet
+        bundle.add("probe-event.json", compiled)
+        bundle.save()
+
+    The bundle records the content hash of every schema file it was compiled from,
+    next to the file's size and modification time. Only files whose size or
+    modification time changed are hashed again on loading, and any changed content
+    discards the bundle. Only schemata looked up by their name in
+    :const:`~uptimer.events.SCHEMATA_PATH` are bundled.
+    """
+
+    FORMAT_VERSION = 1
+    """Version of the bundle's layout, bundles of other versions are discarded."""
+
+    FILENAME = "schemata.json"
+
+    def __init__(
+        self,
+        directory: Optional[str] = SCHEMA_BUNDLE_PATH,
+        schemata_path: str = SCHEMATA_PATH,
+    ):
+        """Instantiates a SchemaBundle object.
+
+        Args:
+            directory (str): Directory the bundle is stored in, None disables the
+                bundle. The bundle is kept in memory only if the directory is not
+                writable.
+            schemata_path (str): Directory of the schema files the bundle covers.
+
+        """
+        self.directory = directory
+        self.schemata_path = schemata_path
+        self.dirty = False
+        self._files: Dict[str, list] = {}
+        self._compiled: Optional[Dict[str, dict]] = None
+
+    @property
+    def filename(self) -> Optional[str]:
+        if not self.directory:
+            return None
+        return path.join(self.directory, self.FILENAME)
+
+    def bundles(self, schema_name: str) -> bool:
+        """Whether the schema is looked up in the schemata path, and can be bundled.
+
+        Mirrors the lookup of :class:`SchemaCache`, which prefers existing paths.
+        """
+        return (
+            bool(self.directory)
+            and not path.isfile(schema_name)
+            and path.isfile(path.join(self.schemata_path, schema_name))
+        )
+
+    def get(self, schema_name: str) -> Optional[dict]:
+        """Returns the compiled schema, None if it is not bundled."""
+        if not self.bundles(schema_name):
+            return None
+        if self._compiled is None:
+            self.load()
+        return self._compiled.get(schema_name)
+
+    def add(self, schema_name: str, compiled: dict):
+        """Adds the compiled schema to the bundle, to be written by :meth:`save`."""
+        if not self.bundles(schema_name):
+            return
+        if self._compiled is None:
+            self.load()
+        self._compiled[schema_name] = compiled
+        self.dirty = True
+
+    def _stat_files(self) -> Dict[str, Tuple[int, int]]:
+        """Returns the size and modification time of the schema files, by name."""
+        stats = {}
+        for entry in scandir(self.schemata_path):
+            if entry.name.endswith(".json") and entry.is_file():
+                stat = entry.stat()
+                stats[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return stats
+
+    def _hash_file(self, name: str) -> str:
+        with open(path.join(self.schemata_path, name), "rb") as schema_fp:
+            return sha256(schema_fp.read()).hexdigest()
+
+    def _is_current(self, bundle: dict) -> bool:
+        """Whether the bundle has been compiled from the current schema files."""
+        if bundle.get("format") != self.FORMAT_VERSION:
+            return False
+        if bundle.get("version") != __version__:
+            return False
+        files = bundle.get("files", {})
+        stats = self._stat_files()
+        if set(files) != set(stats):
+            return False
+        for name, (size, mtime_ns) in stats.items():
+            recorded_size, recorded_mtime_ns, digest = files[name]
+            if (size, mtime_ns) == (recorded_size, recorded_mtime_ns):
+                continue
+            # Touched, e.g. by a checkout, but possibly unchanged
+            if self._hash_file(name) != digest:
+                return False
+            files[name] = [size, mtime_ns, digest]
+            self.dirty = True
+        return True
+
+    def load(self):
+        """Loads the bundle, or starts an empty one if it is missing or outdated."""
+        self._compiled = {}
+        filename = self.filename
+        if not filename or not path.isfile(filename):
+            return
+        try:
+            with open(filename, "rb") as bundle_fp:
+                bundle = json.loads(bundle_fp.read())
+            current = self._is_current(bundle)
+        except (OSError, ValueError, TypeError, KeyError) as exc:
+            logger.warning(f"Ignoring unreadable schema bundle {filename}: {exc}")
+            return
+        if not current:
+            logger.info(f"Discarding outdated schema bundle {filename}")
+            self.dirty = False
+            return
+        self._files = bundle["files"]
+        self._compiled = bundle["schemata"]
+        logger.debug(f"Loaded schema bundle {filename}", schemata=list(self._compiled))
+
+    def save(self):
+        """Writes the bundle atomically, if schemata have been added since loading.
+
+        Failing to write the bundle, e.g. to a read-only directory, is not an error.
+        """
+        filename = self.filename
+        if not filename or not self.dirty:
+            return
+        files = {}
+        for name, (size, mtime_ns) in self._stat_files().items():
+            recorded = self._files.get(name)
+            if recorded and recorded[:2] == [size, mtime_ns]:
+                files[name] = recorded
+            else:
+                files[name] = [size, mtime_ns, self._hash_file(name)]
+        bundle = dict(
+            format=self.FORMAT_VERSION,
+            version=__version__,
+            files=files,
+            schemata=self._compiled,
+        )
+        try:
+            makedirs(self.directory, exist_ok=True)
+            with NamedTemporaryFile(
+                "w", dir=self.directory, suffix=".tmp", delete=False
+            ) as bundle_fp:
+                json.dump(bundle, bundle_fp)
+            replace(bundle_fp.name, filename)
+        except OSError as exc:
+            logger.debug(f"Cannot save schema bundle {filename}: {exc}")
+            return
+        self._files = files
+        self.dirty = False
+        logger.debug(f"Saved schema bundle {filename}", schemata=list(self._compiled))
+
+
 schema_cache = SchemaCache()
+schema_bundle = SchemaBundle()
@@ -0,0 +1,296 @@
+"""Codecs encoding events into message bodies, and decoding them back.
+
+The :class:`JSONCodec` writes events as JSON objects, readable by anyone. Binary codecs
+instead write the values of an event as a row, in the order of its class'es
+:attr:`~uptimer.events.Event.properties`, with UUIDs as their 16 raw bytes and
+timestamps as integer microseconds since the epoch. The schema tells how to decode
+each value, so that decoding needs no trial casting (see
+:meth:`~uptimer.events.Event.from_uncast_dict`), and is much faster.
+
+Codecs are looked up by name through :func:`get_codec`.
+"""
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from importlib import import_module
+from operator import attrgetter
+from typing import ClassVar, Iterator, List, Tuple, Type
+from uuid import UUID
+
+from structlog import get_logger
+
+from uptimer import events
+from uptimer.events.base import Event
+from uptimer.events.batch import EventBatch
+from uptimer.events.formats import JSONEncoder
+from uptimer.exceptions import ImproperlyConfigured
+
+logger = get_logger()
+
+CODECS = ("json", "msgpack")
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+_ENVELOPE_CONSTANTS = ("schema_title", "schema_version")
+
+
+class Codec(ABC):
+    """Abstract base class of the codecs of events.
+
+    Codecs encode single events (:meth:`dumps`), and the events of a batch into one
+    envelope (:meth:`dumps_envelope`). Decoded events are not validated, unless asked
+    to.
+    """
+
+    name: ClassVar[str]
+
+    @abstractmethod
+    def dumps(self, event: Event) -> bytes:
+        pass  # pragma: no cover
+
+    def dumps_batch(self, batch: EventBatch) -> List[bytes]:
+        """Encodes every event of the batch like :meth:`dumps`."""
+        return [self.dumps(event) for event in batch]
+
+    @abstractmethod
+    def loads(self, body: bytes, *, validate=True) -> Event:
+        pass  # pragma: no cover
+
+    @abstractmethod
+    def dumps_envelope(self, batch: EventBatch) -> bytes:
+        pass  # pragma: no cover
+
+    @abstractmethod
+    def loads_envelope(self, body: bytes) -> Tuple[Type[Event], Iterator[Event]]:
+        """Returns the event type of an envelope, and its events without validation."""
+        pass  # pragma: no cover
+
+
+def _event_type(classname) -> Type[Event]:
+    if not classname:
+        raise ValueError("Body must contain 'schema_title' key")
+    return getattr(events, classname)
+
+
+class JSONCodec(Codec):
+    """Encodes events as JSON objects, and envelopes as JSON objects of rows.
+
+    Envelopes hold the schema title and version once, the names of the other
+    properties, and the events' values as rows, with the bitmask of the properties
+    each event has set.
+    """
+
+    name = "json"
+
+    def dumps(self, event):
+        return event.to_json().encode("ascii")
+
+    def dumps_batch(self, batch):
+        return [body.encode("ascii") for body in batch.iter_json()]
+
+    def loads(self, body, *, validate=True):
+        data = json.loads(body)
+        classname = data.get("schema_title")
+        event_type = _event_type(classname)
+        logger.debug(
+            f"Trying to create a {classname} instance from request: {body}",
+            classname=classname,
+        )
+        return event_type.from_json(data, validate=validate)
+
+    def dumps_envelope(self, batch):
+        properties = batch.event_type.properties
+        keep = [
+            idx
+            for idx, prop in enumerate(properties)
+            if prop not in _ENVELOPE_CONSTANTS
+        ]
+        present = [
+            sum(1 << pos for pos, idx in enumerate(keep) if mask >> idx & 1)
+            for mask in batch._present
+        ]
+        envelope = {
+            "schema_title": batch.columns["schema_title"][0],
+            "schema_version": batch.columns["schema_version"][0],
+            "properties": [properties[idx] for idx in keep],
+            "present": present,
+            "rows": batch.rows([properties[idx] for idx in keep]),
+        }
+        body = json.dumps(envelope, cls=JSONEncoder, separators=(",", ":"))
+        return body.encode("ascii")
+
+    def loads_envelope(self, body):
+        envelope = json.loads(body)
+        event_type = _event_type(envelope.get("schema_title"))
+        constants = {key: envelope[key] for key in _ENVELOPE_CONSTANTS}
+        properties = envelope["properties"]
+
+        def load():
+            for row, mask in zip(envelope["rows"], envelope["present"]):
+                data = {
+                    prop: value
+                    for idx, (prop, value) in enumerate(zip(properties, row))
+                    if mask >> idx & 1
+                }
+                data.update(constants)
+                yield event_type.from_uncast_dict(data, validate=False)
+
+        return event_type, load()
+
+
+def to_epoch(value: datetime) -> int:
+    """Returns the microseconds since the epoch, of naive datetimes as UTC."""
+    if not value.tzinfo:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - EPOCH) // _MICROSECOND
+
+
+def from_epoch(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+
+def uuid_from_bytes(value: bytes) -> UUID:
+    return UUID(bytes=value)
+
+
+@lru_cache(maxsize=None)
+def _converters(event_type: Type[Event]) -> Tuple[list, list]:
+    """Returns the encoders and decoders of the event type's values.
+
+    Both are lists of the slot index, the type of the values to convert, and the
+    conversion. Values of other types (e.g. a timestamp given as a string) are kept as
+    they are.
+    """
+    encoders = []
+    decoders = []
+    for idx, prop in enumerate(event_type.properties):
+        propformat = event_type.properties_dict[prop].get("format")
+        if propformat == "date-time":
+            encoders.append((idx, datetime, to_epoch))
+            decoders.append((idx, int, from_epoch))
+        elif propformat == "uuid":
+            encoders.append((idx, UUID, attrgetter("bytes")))
+            decoders.append((idx, bytes, uuid_from_bytes))
+    return encoders, decoders
+
+
+def _convert(values, converters: list) -> list:
+    row = list(values)
+    for idx, kind, convert in converters:
+        if isinstance(row[idx], kind):
+            row[idx] = convert(row[idx])
+    return row
+
+
+def to_row(event_type: Type[Event], values) -> list:
+    """Converts an event's slot values into the values of a binary encoded row."""
+    return _convert(values, _converters(event_type)[0])
+
+
+def from_row(event_type: Type[Event], row) -> list:
+    """Converts the values of a binary encoded row back into an event's slot values."""
+    return _convert(row, _converters(event_type)[1])
+
+
+def _check_row_layout(event_type: Type[Event], version, rows):
+    """Raises ValueError unless the rows have been encoded with the class'es schema.
+
+    Rows hold values by position only, decoding rows of another schema version would
+    assign values to the wrong properties.
+    """
+    expected = event_type.schema_spec["version"]
+    if version != expected:
+        raise ValueError(
+            f"Cannot decode {event_type.__name__} of schema version {version}, "
+            f"expected version {expected}"
+        )
+    if any(len(row) != len(event_type.properties) for row in rows):
+        raise ValueError(
+            f"Rows of {event_type.__name__} must hold "
+            f"{len(event_type.properties)} values"
+        )
+
+
+class MsgpackCodec(Codec):
+    """Encodes events as MessagePack arrays of their values, in schema order.
+
+    Events are arrays of the schema title and version, the bitmask of the properties
+    set, and the values of the properties (see :func:`to_row`), envelopes hold the
+    schema title and version, the bitmasks of all events, and their rows. Properties
+    that are not part of the schema are not encoded. Decoding fails with ValueError
+    for events of another schema version.
+
+    Requires the `msgpack` package.
+    """
+
+    name = "msgpack"
+
+    def __init__(self):
+        try:
+            self.msgpack = import_module("msgpack")
+        except ImportError:
+            raise ImproperlyConfigured(
+                "The msgpack codec requires the msgpack package"
+            ) from None
+
+    def _packb(self, data) -> bytes:
+        return self.msgpack.packb(data, use_bin_type=True)
+
+    def _unpackb(self, body):
+        return self.msgpack.unpackb(body, raw=False)
+
+    def dumps(self, event):
+        event_type = event.__class__
+        return self._packb(
+            [
+                event_type.__name__,
+                event_type.schema_spec["version"],
+                event._present,
+                to_row(event_type, event._values),
+            ]
+        )
+
+    def loads(self, body, *, validate=True):
+        classname, version, present, row = self._unpackb(body)
+        event_type = _event_type(classname)
+        _check_row_layout(event_type, version, [row])
+        event = event_type._from_slots(from_row(event_type, row), present)
+        if validate:
+            event.validate()
+        return event
+
+    def dumps_envelope(self, batch):
+        event_type = batch.event_type
+        return self._packb(
+            [
+                event_type.__name__,
+                event_type.schema_spec["version"],
+                batch._present,
+                [to_row(event_type, row) for row in batch.rows()],
+            ]
+        )
+
+    def loads_envelope(self, body):
+        classname, version, present, rows = self._unpackb(body)
+        event_type = _event_type(classname)
+        _check_row_layout(event_type, version, rows)
+        return event_type, (
+            event_type._from_slots(from_row(event_type, row), mask)
+            for row, mask in zip(rows, present)
+        )
+
+
+_CODEC_CLASSES = {codec.name: codec for codec in (JSONCodec, MsgpackCodec)}
+
+
+@lru_cache(maxsize=None)
+def get_codec(name: str = "json") -> Codec:
+    """Returns the codec of the name.
+
+    Raises:
+        ValueError: If the codec is unknown.
+        ImproperlyConfigured: If the package the codec requires is missing.
+    """
+    if name not in _CODEC_CLASSES:
+        raise ValueError(f"Unknown codec {name}, must be one of {CODECS}")
+    return _CODEC_CLASSES[name]()
@@ -1,6 +1,7 @@
 import json
 import re
 from datetime import datetime, timezone
+from functools import lru_cache
 from uuid import UUID as uuid
 
 import jsonschema
@@ -8,6 +9,10 @@ from structlog import get_logger
 
 format_checker = jsonschema.FormatChecker()
 
+# Format checker for validating events in their python-native representation, i.e.
+# without serializing datetime and UUID objects to strings first.
+native_format_checker = jsonschema.FormatChecker()
+
 uuid_re = re.compile(
     r"^[0-9a-fA-F]{8}\-[0-9a-fA-F]{4}\-[0-9a-fA-F]{4}\-[0-9a-fA-F]{4}\-[0-9a-fA-F]{12}$"
 )
@@ -22,6 +27,109 @@ def is_uuid(instance):
     return uuid_re.match(instance) is not None
 
 
+@native_format_checker.checks("uuid")
+def is_native_uuid(instance):
+    return isinstance(instance, uuid) or is_uuid(instance)
+
+
+_is_date_time, _date_time_raises = native_format_checker.checkers.get(
+    "date-time", (lambda instance: True, ())
+)
+
+
+@native_format_checker.checks("date-time", raises=_date_time_raises)
+def is_native_date_time(instance):
+    # Naive datetimes are valid as well, they are localized to UTC when serialized
+    return isinstance(instance, datetime) or _is_date_time(instance)
+
+
+def _is_native_string(checker, instance):
+    return isinstance(instance, (str, datetime, uuid))
+
+
+def _is_native_array(checker, instance):
+    return isinstance(instance, (list, tuple))
+
+
+def to_json_value(instance):
+    """Returns the instance as it is after a round-trip through JSON.
+
+    Datetimes and UUIDs become the strings :class:`JSONEncoder` serializes them to,
+    tuples become lists.
+    """
+    if isinstance(instance, datetime):
+        if not instance.tzinfo:
+            instance = instance.replace(tzinfo=timezone.utc)
+        return instance.isoformat()
+    if isinstance(instance, uuid):
+        return str(instance)
+    if isinstance(instance, (list, tuple)):
+        return [to_json_value(value) for value in instance]
+    if isinstance(instance, dict):
+        return {key: to_json_value(value) for key, value in instance.items()}
+    return instance
+
+
+# Formats the native format checker decides the same for native values as for their
+# JSON strings, the values are checked without serializing them
+NATIVE_FORMATS = {"date-time", "uuid"}
+
+# Keywords checking the serialized form of string and array values
+SERIALIZED_KEYWORDS = ("pattern", "minLength", "maxLength", "enum", "const")
+
+
+def _on_json_value(validate):
+    def validate_json_value(validator, value, instance, schema):
+        return validate(validator, value, to_json_value(instance), schema)
+
+    return validate_json_value
+
+
+def _on_json_format(validate):
+    def validate_format(validator, format_, instance, schema):
+        if format_ not in NATIVE_FORMATS:
+            instance = to_json_value(instance)
+        return validate(validator, format_, instance, schema)
+
+    return validate_format
+
+
+@lru_cache(maxsize=None)
+def _extend_native(validator_cls):
+    validators = {
+        keyword: _on_json_value(validator_cls.VALIDATORS[keyword])
+        for keyword in SERIALIZED_KEYWORDS
+        if keyword in validator_cls.VALIDATORS
+    }
+    if "format" in validator_cls.VALIDATORS:
+        validators["format"] = _on_json_format(validator_cls.VALIDATORS["format"])
+    return jsonschema.validators.extend(
+        validator_cls,
+        validators=validators,
+        type_checker=validator_cls.TYPE_CHECKER.redefine_many(
+            {"string": _is_native_string, "array": _is_native_array}
+        ),
+    )
+
+
+def native_validator_for(schema):
+    """Returns the validator class for the schema, accepting python-native types.
+
+    Instances validated with the returned class (and the `native_format_checker`)
+    may contain values of the types :class:`JSONEncoder` serializes to JSON strings
+    and arrays, that is :class:`datetime.datetime` and :class:`uuid.UUID` objects,
+    and tuples. The result is the same as when validating the instance after a
+    round-trip through JSON: keywords checking the contents of strings (such as
+    `pattern` and `maxLength`), `enum` and `const`, and formats other than
+    :const:`NATIVE_FORMATS` check the values serialized by :func:`to_json_value`.
+    Only the types and the `date-time` and `uuid` formats are checked on the native
+    values, which saves serializing most values.
+    """
+    return _extend_native(
+        jsonschema.validators.validator_for(schema, default=jsonschema.Draft7Validator)
+    )
+
+
 class JSONEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, datetime):
@@ -5,9 +5,21 @@ import jsonschema
 from dateutil.parser import parse as dateparse
 
 from uptimer.events import SCHEMATA_PATH
-from uptimer.events.cache import schema_cache
+from uptimer.events.cache import schema_bundle, schema_cache
+from uptimer.events.formats import native_format_checker, native_validator_for
 from uptimer.helpers import to_bool, to_none
 
+PROPERTY_CASTS = {
+    "date-time": dateparse,
+    "uuid": UUID,
+    "null": to_none,
+    "boolean": to_bool,
+    "integer": int,
+    "number": float,
+}
+"""Casts of values by the format or type of their property, by name."""
+_TYPE_CASTS = ("null", "boolean", "integer", "number")  # From most to least strict
+
 
 class EventDefinitionError(ValueError):
     pass
@@ -35,20 +47,28 @@ class EventMeta(ABCMeta, metaclass=ABCMeta):
         # Now resolve and parse the JSON schema for additional properties; generating
         # useful representations, the proper schema resolver for validation, etc.
         # Inserting them in the `attrs` dictionary will cause them to become regular
-        # class variables, available in every instantiated class object.
-        schema_spec = schema_cache[schema]
+        # class variables, available in every instantiated class object. Schemata
+        # compiled by a previous process are taken from the schema bundle.
+        compiled = schema_bundle.get(schema)
+        if compiled is None:
+            compiled = cls.compile_schema(name, schema)
+            schema_bundle.add(schema, compiled)
+
+        schema_spec = compiled["schema_spec"]
         if schema_spec["title"] != name:
             raise EventDefinitionError(
                 f"Name of class {name} must be equal to "
                 f"JSON schema title '{schema_spec['title']}'"
             )
-
-        properties_dict = cls._collect_properties(schema_spec)
+        properties_dict = compiled["properties_dict"]
         properties = list(properties_dict.keys())
-        property_cast_mapping = {
-            prop: cls.property_to_python(spec) for prop, spec in properties_dict.items()
-        }
         resolver = jsonschema.RefResolver(cls.schema_path, schema_spec)
+        validator = native_validator_for(schema_spec)(
+            schema_spec, resolver=resolver, format_checker=native_format_checker
+        )
+
+        # Subclasses only add class variables, keep their instances free of __dict__
+        attrs.setdefault("__slots__", ())
         attrs.update(
             dict(
                 schema=schema,
@@ -56,12 +76,44 @@ class EventMeta(ABCMeta, metaclass=ABCMeta):
                 schema_spec=schema_spec,
                 properties_dict=properties_dict,
                 properties=properties,
-                property_cast_mapping=property_cast_mapping,
+                _property_index={prop: idx for idx, prop in enumerate(properties)},
+                property_cast_mapping={
+                    prop: [PROPERTY_CASTS[name] for name in names]
+                    for prop, names in compiled["property_casts"].items()
+                },
                 _resolver=resolver,
+                _validator=validator,
             )
         )
         return super_new(cls, name, bases, attrs, **kwargs)
 
+    @classmethod
+    def compile_schema(cls, name, schema):
+        """Loads and checks the class'es schema, and derives its properties.
+
+        The schema is checked against its meta-schema once per class, as opposed to
+        :func:`jsonschema.validate` re-checking the schema on every call. The result
+        refers to the casts of the properties by their names in :const:`PROPERTY_CASTS`,
+        to be kept in the :class:`~uptimer.events.cache.SchemaBundle` as JSON.
+        """
+        schema_spec = schema_cache[schema]
+        try:
+            native_validator_for(schema_spec).check_schema(schema_spec)
+        except jsonschema.SchemaError as exc:
+            raise EventDefinitionError(
+                f"JSON schema of class {name} is invalid: {exc.message}"
+            )
+
+        properties_dict = cls._collect_properties(schema_spec)
+        return dict(
+            schema_spec=schema_spec,
+            properties_dict=properties_dict,
+            property_casts={
+                prop: cls.property_cast_names(spec)
+                for prop, spec in properties_dict.items()
+            },
+        )
+
     @staticmethod
     def _collect_properties(schema):
         """Collects a list of all (including nested and conditional) properties."""
@@ -90,30 +142,28 @@ class EventMeta(ABCMeta, metaclass=ABCMeta):
         Based on the event class'es schema, a list of callables is returned that a
         value might be tried against. The list is ordered from most to least strict
         as to prevent falsely casting values as a less strict type.
+        """
+        return [
+            PROPERTY_CASTS[name]
+            for name in EventMeta.property_cast_names(property_spec)
+        ]
+
+    @staticmethod
+    def property_cast_names(property_spec):
+        """
+        Returns the names of the :const:`PROPERTY_CASTS` for a schema property.
 
         Possible types taken from JSON schema validation specification
         http://json-schema.org/latest/json-schema-validation.html#rfc.section.6.1.1
         """
 
         propformat = property_spec.get("format")
-        if propformat == "date-time":
-            return [dateparse]
-        if propformat == "uuid":
-            return [UUID]
+        if propformat in ("date-time", "uuid"):
+            return [propformat]
 
         proptypes = property_spec.get("type")
         if not proptypes:
             return []
         if not isinstance(proptypes, list):
             proptypes = [proptypes]
-
-        callables = []
-        if "null" in proptypes:
-            callables.append(to_none)
-        if "boolean" in proptypes:
-            callables.append(to_bool)
-        if "integer" in proptypes:
-            callables.append(int)
-        if "number" in proptypes:
-            callables.append(float)
-        return callables
+        return [name for name in _TYPE_CASTS if name in proptypes]
@@ -1,25 +1,216 @@
-import json
+import gzip
+from importlib import import_module
+from itertools import repeat
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
 
+from jsonschema.exceptions import ValidationError as SchemaValidationError
 from structlog import get_logger
 
-from uptimer import events
+from uptimer.events.base import Event
+from uptimer.events.batch import EventBatch
+from uptimer.events.codecs import get_codec
+from uptimer.exceptions import ImproperlyConfigured, ValidationError
 
 logger = get_logger()
 
+ENVELOPE_HEADER = "uptimer-envelope"
+"""Record header of messages holding an envelope, its value names the compression."""
+ENVELOPE_COMPRESSIONS = ("none", "gzip", "lz4", "zstd")
+CODEC_HEADER = "uptimer-codec"
+"""Record header naming the codec of a message, see :mod:`uptimer.events.codecs`.
 
-def loads(body):
-    data = json.loads(body)
-    classname = data.get("schema_title")
+Messages without it are JSON encoded.
+"""
 
-    if not classname:
-        raise ValueError("Body must contain 'schema_title' key")
+DESERIALIZATION_ERRORS = (
+    ValueError,
+    TypeError,
+    AttributeError,
+    KeyError,
+    IndexError,
+    OSError,
+    ValidationError,
+    SchemaValidationError,
+)
+"""Errors raised for message bodies that cannot be deserialized into valid events."""
 
-    logger.debug(
-        f"Trying to create a {classname} instance from request: {body}",
-        classname=classname,
-    )
-    return getattr(events, classname).from_json(data)
 
+def _compression(compression: str):
+    """Returns the compress and decompress functions of the compression."""
+    if compression == "none":
+        return bytes, bytes
+    if compression == "gzip":
+        return gzip.compress, gzip.decompress
+    # Optional dependencies, only imported when used
+    modules = {"lz4": ("lz4.frame", "lz4"), "zstd": ("zstandard", "zstandard")}
+    if compression not in modules:
+        raise ValueError(
+            f"Unknown envelope compression {compression}, "
+            f"must be one of {ENVELOPE_COMPRESSIONS}"
+        )
+    module_name, package = modules[compression]
+    try:
+        module = import_module(module_name)
+    except ImportError:
+        raise ImproperlyConfigured(
+            f"Envelope compression {compression} requires the {package} package"
+        ) from None
+    if compression == "zstd":
+        return module.ZstdCompressor().compress, module.ZstdDecompressor().decompress
+    return module.compress, module.decompress
 
-def dumps(event):
-    return event.to_json().encode("ascii")
+
+def _header(headers: Optional[Sequence[Tuple[str, bytes]]], key: str):
+    for header, value in headers or ():
+        if header == key:
+            return value.decode("ascii")
+    return None
+
+
+def envelope_compression(headers: Optional[Sequence[Tuple[str, bytes]]]):
+    """Returns the compression of an envelope from a record's headers.
+
+    Returns:
+        str: The compression, or `None` for a message holding a single event.
+    """
+    return _header(headers, ENVELOPE_HEADER)
+
+
+def message_codec(headers: Optional[Sequence[Tuple[str, bytes]]], default="json"):
+    """Returns the codec of a message from a record's headers, `default` if unset."""
+    return _header(headers, CODEC_HEADER) or default
+
+
+def codec_headers(codec="json") -> List[Tuple[str, bytes]]:
+    """Returns the record headers of a message encoded by the codec.
+
+    JSON messages have no headers, to stay readable by consumers unaware of codecs.
+    """
+    if codec == "json":
+        return []
+    return [(CODEC_HEADER, codec.encode("ascii"))]
+
+
+def loads(body, *, validate=True, compression=None, codec="json"):
+    """Deserializes a message body into an event.
+
+    Args:
+        body (bytes): The message body.
+        validate (bool): Whether to validate the event.
+        compression (str): The compression of an envelope (see
+            :func:`dumps_envelope`), as named by the record's
+            :const:`ENVELOPE_HEADER`, `None` for a single event.
+        codec (str): The codec of the message, as named by the record's
+            :const:`CODEC_HEADER`.
+
+    Returns:
+        Event or EventBatch: The event, or the batch of the envelope's events, without
+            the events that are invalid.
+    """
+    if compression is not None:
+        batch = EventBatch(*_envelope_events(body, compression, codec))
+        return _valid_batches([batch])[0] if validate else batch
+    return get_codec(codec).loads(body, validate=validate)
+
+
+def loads_batch(
+    bodies: Iterable[bytes],
+    *,
+    validate=True,
+    compressions: Optional[Iterable[Optional[str]]] = None,
+    codecs: Optional[Iterable[str]] = None,
+) -> List[EventBatch]:
+    """Deserializes message bodies in bulk, into one EventBatch per event type.
+
+    Events are created without validation, and each batch is validated as a whole
+    through its columnar checks (see :meth:`EventBatch.valid`) if `validate` is set.
+    Bodies that cannot be deserialized, and invalid events, are logged and dropped.
+
+    Args:
+        bodies (:obj:`iter`): The message bodies.
+        validate (bool): Whether to validate the events.
+        compressions (:obj:`iter`): The envelope compression of each body, see
+            :func:`loads`. All bodies hold single events by default.
+        codecs (:obj:`iter`): The codec of each body, JSON by default.
+
+    Returns:
+        list: The batches, in the order their event types first occur in `bodies`.
+    """
+    batches = {}
+    if compressions is None:
+        compressions = repeat(None)
+    if codecs is None:
+        codecs = repeat("json")
+    for body, compression, codec in zip(bodies, compressions, codecs):
+        try:
+            if compression is not None:
+                event_type, body_events = _envelope_events(body, compression, codec)
+            else:
+                event = get_codec(codec).loads(body, validate=False)
+                event_type, body_events = event.__class__, [event]
+            if event_type not in batches:
+                batches[event_type] = EventBatch(event_type)
+            batches[event_type].extend(body_events)
+        except DESERIALIZATION_ERRORS as exc:
+            logger.error("Dropping message that cannot be deserialized", error=str(exc))
+
+    if not validate:
+        return list(batches.values())
+    return _valid_batches(batches.values())
+
+
+def _valid_batches(batches: Iterable[EventBatch]) -> List[EventBatch]:
+    valid_batches = []
+    for batch in batches:
+        batch, errors = batch.valid()
+        for message in errors.values():
+            logger.error(
+                "Dropping invalid event",
+                event_type=batch.event_type.__name__,
+                error=message,
+            )
+        valid_batches.append(batch)
+    return valid_batches
+
+
+def dumps(event, codec="json"):
+    # Events of batches are serialized in bulk by `dumps_batch`
+    if isinstance(event, bytes):
+        return event
+    return get_codec(codec).dumps(event)
+
+
+def dumps_batch(batch, codec="json"):
+    """Serializes every event of an :class:`~uptimer.events.EventBatch` like `dumps`."""
+    return get_codec(codec).dumps_batch(batch)
+
+
+def dumps_envelope(batch: EventBatch, compression="gzip", codec="json") -> bytes:
+    """Serializes the events of a batch into a single envelope.
+
+    Envelopes hold the events of one event type as rows of their values, encoded by
+    the codec (see :meth:`uptimer.events.codecs.Codec.dumps_envelope`). The envelope
+    is compressed, and must be sent with a record header :const:`ENVELOPE_HEADER`
+    naming the compression, see :func:`envelope_headers`.
+
+    Raises:
+        ValueError: If the batch is empty, or the compression is unknown.
+        ImproperlyConfigured: If the package of the compression is missing.
+    """
+    if not batch:
+        raise ValueError("Cannot serialize an empty batch into an envelope")
+    compress, _ = _compression(compression)
+    return compress(get_codec(codec).dumps_envelope(batch))
+
+
+def envelope_headers(compression="gzip", codec="json") -> List[Tuple[str, bytes]]:
+    """Returns the record headers of an envelope from :func:`dumps_envelope`."""
+    return [(ENVELOPE_HEADER, compression.encode("ascii"))] + codec_headers(codec)
+
+
+def _envelope_events(
+    body: bytes, compression: str, codec: str
+) -> Tuple[type, Iterator[Event]]:
+    """Returns the event type of an envelope, and its events without validation."""
+    _, decompress = _compression(compression)
+    return get_codec(codec).loads_envelope(decompress(body))
@@ -0,0 +1,105 @@
+"""Policies deciding when events are validated against their JSON schema.
+
+Validating every event on creation, and again before writing it, spends the cost
+of the schema check multiple times per event. Events track whether they have been
+validated, and whether they have been modified since (see
+:attr:`uptimer.events.Event.is_validated`), which allows a pipeline to pick when
+validation takes place::
+
+    policy = ValidationPolicy("writer")
+
+    # In the reader
+    event = ProbeEvent(..., validate=policy.validate_on_creation)
+
+    # In the writer, raises ValidationError for invalid events
+    policy.validate(event)
+
+    # Or for a whole EventBatch, dropping its invalid events
+    batch, errors = policy.validate_batch(batch)
+
+The available policies are:
+
+* ``creation`` (default): events are validated when they are created, and validated
+  again at the writer only if they have been modified since.
+* ``writer``: events are validated once, at the writer.
+* ``sampled``: only one in `sample_rate` events is validated, at the writer.
+"""
+from itertools import count
+from typing import Dict, Tuple
+
+from uptimer.events.base import Event
+from uptimer.events.batch import EventBatch
+
+VALIDATION_POLICIES = ("creation", "writer", "sampled")
+DEFAULT_VALIDATION_POLICY = "creation"
+DEFAULT_SAMPLE_RATE = 100
+
+
+class ValidationPolicy:
+    def __init__(
+        self,
+        policy: str = DEFAULT_VALIDATION_POLICY,
+        *,
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+    ) -> None:
+        """Instantiates a ValidationPolicy.
+
+        Args:
+            policy (str): One of :const:`VALIDATION_POLICIES`.
+            sample_rate (int): For the ``sampled`` policy, validate one event out of
+                every `sample_rate` events.
+        """
+        if policy not in VALIDATION_POLICIES:
+            raise ValueError(
+                f"Unknown validation policy {policy}, "
+                f"must be one of {list(VALIDATION_POLICIES)}"
+            )
+        if sample_rate < 1:
+            raise ValueError("Validation sample rate must be greater zero")
+
+        self.policy = policy
+        self.sample_rate = sample_rate
+        self._counter = count()
+
+    def __repr__(self):
+        return f"ValidationPolicy({self.policy!r}, sample_rate={self.sample_rate})"
+
+    @property
+    def validate_on_creation(self) -> bool:
+        """Whether events should be validated when they are created."""
+        return self.policy == "creation"
+
+    def validate(self, event: Event) -> bool:
+        """Validates the event at the writer boundary, if the policy requires it.
+
+        Returns:
+            bool: True if the event has been validated (now or before).
+
+        Raises:
+            ValidationError: If the validation of the event fails.
+        """
+        if self.policy == "sampled" and next(self._counter) % self.sample_rate:
+            return event.is_validated
+        event.ensure_validated()
+        return True
+
+    def validate_batch(self, batch: EventBatch) -> Tuple[EventBatch, Dict[int, str]]:
+        """Validates the events of the batch the policy requires validating.
+
+        The ``sampled`` policy counts the batch's events towards the sample rate, and
+        validates the sampled ones.
+
+        Returns:
+            tuple: The batch without the events that failed validation, and the error
+                messages of those keyed by their index in the given batch.
+        """
+        if self.policy != "sampled" or batch.is_validated:
+            return batch.valid()
+        sampled = [
+            row
+            for row in range(len(batch))
+            if not next(self._counter) % self.sample_rate
+        ]
+        errors = batch.take(sampled).errors()
+        errors = {sampled[idx]: message for idx, message in errors.items()}
+        return batch.drop(errors), errors
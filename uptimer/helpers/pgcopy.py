@@ -0,0 +1,251 @@
+"""Bulk loading of rows into Postgres tables through ``COPY ... FROM STDIN``.
+
+Rows (tuples of python-native values, as returned by :meth:`Event.to_tuple`) are
+encoded into a buffer in one of the formats of the `COPY`_ command, and streamed to
+the server in a single statement::
+
+    with connection.cursor() as cursor:
+        copy_rows(cursor, "probe_events", ["uuid", "event_time", ...], rows)
+
+The ``text`` format needs no knowledge of the table's column types. The ``binary``
+format saves the server from parsing the values, but has to encode every value as
+its column's type, which are looked up through :func:`get_column_types` first.
+
+.. _`COPY`: https://www.postgresql.org/docs/current/sql-copy.html
+"""
+import json
+import struct
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from io import BytesIO
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+from uuid import UUID
+
+from psycopg2 import sql
+from psycopg2.extensions import encodings
+
+from uptimer.events.formats import JSONEncoder
+
+COPY_FORMATS = ("text", "binary")
+
+BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+BINARY_TRAILER = struct.pack("!h", -1)
+
+POSTGRES_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+POSTGRES_EPOCH_DATE = date(2000, 1, 1)
+
+TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+Encoder = Callable[[Any], bytes]
+
+
+def _encode_text_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, cls=JSONEncoder)
+    return str(value).translate(TEXT_ESCAPES)
+
+
+def encode_text(rows: Iterable[Sequence], encoding: str = "utf-8") -> BytesIO:
+    """Encodes the rows in the text format of COPY, NULLs as ``\\N``."""
+    buffer = BytesIO()
+    for row in rows:
+        line = "\t".join(map(_encode_text_value, row))
+        buffer.write(line.encode(encoding) + b"\n")
+    buffer.seek(0)
+    return buffer
+
+
+def _microseconds(delta) -> int:
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _encode_timestamptz(value: datetime) -> bytes:
+    # Naive datetimes are taken to be in UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return struct.pack("!q", _microseconds(value - POSTGRES_EPOCH))
+
+
+def _encode_timestamp(value: datetime) -> bytes:
+    epoch = POSTGRES_EPOCH.replace(tzinfo=None)
+    return struct.pack("!q", _microseconds(value.replace(tzinfo=None) - epoch))
+
+
+def _encode_numeric(value) -> bytes:
+    """Encodes a number as numeric: base-10000 digits, weight, sign and scale."""
+    if isinstance(value, float):
+        value = Decimal(repr(value))
+    elif not isinstance(value, Decimal):
+        value = Decimal(value)
+    if value.is_nan():
+        return struct.pack("!hhHH", 0, 0, 0xC000, 0)
+    if not value.is_finite():
+        raise ValueError(f"Cannot encode {value} as numeric")
+
+    sign, digit_tuple, exponent = value.as_tuple()
+    scale = max(0, -exponent)
+    digits = "".join(map(str, digit_tuple))
+    if exponent > 0:
+        digits, exponent = digits + "0" * exponent, 0
+    # Align the digits to groups of four on both sides of the decimal point
+    padding = exponent % 4
+    digits, exponent = digits + "0" * padding, exponent - padding
+    digits = "0" * (-len(digits) % 4) + digits
+
+    groups = [int(digits[idx : idx + 4]) for idx in range(0, len(digits), 4)]
+    weight = len(groups) + exponent // 4 - 1
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+    return struct.pack(
+        f"!hhHH{len(groups)}H",
+        len(groups),
+        weight,
+        0x4000 if sign else 0,
+        scale,
+        *groups,
+    )
+
+
+def _encode_str(value) -> bytes:
+    return str(value).encode("utf-8")
+
+
+def _encode_json(value) -> bytes:
+    return json.dumps(value, cls=JSONEncoder).encode("utf-8")
+
+
+BINARY_ENCODERS: Dict[str, Encoder] = {
+    "boolean": lambda value: b"\x01" if value else b"\x00",
+    "smallint": struct.Struct("!h").pack,
+    "integer": struct.Struct("!i").pack,
+    "bigint": struct.Struct("!q").pack,
+    "real": struct.Struct("!f").pack,
+    "double precision": struct.Struct("!d").pack,
+    "numeric": _encode_numeric,
+    "text": _encode_str,
+    "character varying": _encode_str,
+    "character": _encode_str,
+    "uuid": lambda value: (value if isinstance(value, UUID) else UUID(value)).bytes,
+    "timestamp with time zone": _encode_timestamptz,
+    "timestamp without time zone": _encode_timestamp,
+    "date": lambda value: struct.pack("!i", (value - POSTGRES_EPOCH_DATE).days),
+    "json": _encode_json,
+    "jsonb": lambda value: b"\x01" + _encode_json(value),
+}
+"""Encoders of python-native values into Postgres' binary format, by column type."""
+
+
+def get_column_types(cursor, table: str) -> Dict[str, str]:
+    """Returns the type names of the table's columns, resolving domains to their type.
+
+    Type names are as formatted by Postgres without modifiers, e.g.
+    ``character varying`` for a ``varchar(255)`` column.
+    """
+    cursor.execute(
+        """
+        SELECT a.attname, format_type(COALESCE(NULLIF(t.typbasetype, 0), t.oid), NULL)
+        FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid
+        WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+        """,
+        (sql.Identifier(table).as_string(cursor),),
+    )
+    return dict(cursor.fetchall())
+
+
+def binary_encoders(
+    column_types: Dict[str, str], columns: Iterable[str]
+) -> List[Encoder]:
+    """Returns the binary encoder of each of the columns.
+
+    Raises:
+        ValueError: If a column is missing, or of a type without a binary encoder.
+    """
+    encoders = []
+    for column in columns:
+        type_name = column_types.get(column)
+        if type_name not in BINARY_ENCODERS:
+            raise ValueError(
+                f"Cannot encode column {column} of type {type_name} in binary format"
+            )
+        encoders.append(BINARY_ENCODERS[type_name])
+    return encoders
+
+
+def encode_binary(rows: Iterable[Sequence], encoders: Sequence[Encoder]) -> BytesIO:
+    """Encodes the rows in the binary format of COPY, using one encoder per column."""
+    buffer = BytesIO()
+    buffer.write(BINARY_HEADER)
+    field_count = struct.pack("!h", len(encoders))
+    null = struct.pack("!i", -1)
+    for row in rows:
+        buffer.write(field_count)
+        for encode, value in zip(encoders, row):
+            if value is None:
+                buffer.write(null)
+            else:
+                data = encode(value)
+                buffer.write(struct.pack("!i", len(data)))
+                buffer.write(data)
+    buffer.write(BINARY_TRAILER)
+    buffer.seek(0)
+    return buffer
+
+
+def copy_rows(
+    cursor,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence],
+    *,
+    copy_format: str = "text",
+    column_types: Optional[Dict[str, str]] = None,
+) -> None:
+    """Loads the rows into the table's columns with a single COPY statement.
+
+    Args:
+        cursor (:obj:`psycopg2.extensions.cursor`): Cursor to execute COPY with.
+        table (str): Name of the table.
+        columns (:obj:`list`): Names of the columns, in the order of the rows' values.
+        rows (:obj:`iter`): Tuples of values to load.
+        copy_format (str): One of :const:`COPY_FORMATS`.
+        column_types (dict): For the ``binary`` format, the type names of the
+            table's columns as returned by :func:`get_column_types`. Looked up if not
+            given.
+
+    Raises:
+        ValueError: If the rows cannot be encoded in the format.
+        psycopg2.Error: If the server rejects the data.
+    """
+    if copy_format not in COPY_FORMATS:
+        raise ValueError(
+            f"Unknown COPY format {copy_format}, must be one of {COPY_FORMATS}"
+        )
+
+    if copy_format == "binary":
+        if column_types is None:
+            column_types = get_column_types(cursor, table)
+        try:
+            buffer = encode_binary(rows, binary_encoders(column_types, columns))
+        except (struct.error, TypeError, AttributeError) as exc:
+            raise ValueError(f"Cannot encode rows in binary format: {exc}") from exc
+    else:
+        encoding = encodings.get(cursor.connection.encoding, "utf-8")
+        buffer = encode_text(rows, encoding)
+
+    query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT {})").format(
+        sql.Identifier(table),
+        sql.SQL(", ").join(map(sql.Identifier, columns)),
+        sql.SQL(copy_format),
+    )
+    cursor.copy_expert(query, buffer)
@@ -1,12 +1,26 @@
+import threading
+import time
+from contextlib import contextmanager
 from functools import lru_cache
+from typing import Callable, Iterator, List, Optional
 
 import psycopg2.extras
-from psycopg2 import connect
-from psycopg2.extensions import parse_dsn
+from psycopg2 import InterfaceError, OperationalError, connect, sql
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, connection, parse_dsn
+from psycopg2.pool import PoolError
+from structlog import get_logger
+
+logger = get_logger()
 
 # Passing UUID type requires it to be with psycopg2 registered
 psycopg2.extras.register_uuid()
 
+DEFAULT_POOL_MIN = 1
+DEFAULT_POOL_MAX = 4
+DEFAULT_POOL_TIMEOUT = 30.0
+DEFAULT_CHECK_AFTER = 5.0
+DEFAULT_IDLE_TIMEOUT = 60.0
+
 
 @lru_cache(maxsize=4)
 def get_postgres_conn(database_url):
@@ -17,3 +31,232 @@ def get_postgres_conn(database_url):
 
     conn_args = parse_dsn(database_url)
     return connect(**conn_args)
+
+
+class PostgresPool:
+    """Thread-safe pool of connections to a Postgres database.
+
+    Connections are borrowed from the pool for the duration of a ``with`` block::
+
+        pool = PostgresPool("postgres://localhost/uptimer", maxconn=4)
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.commit()
+
+    Connections that have been idle for a while are checked for liveness before
+    they are handed out, and transparently replaced if they have been closed (for
+    example by a restart of the server). Transactions left open by the borrower are
+    rolled back when the connection is returned. Connections above `minconn` are
+    kept open while idle, and closed once they have been idle for `idle_timeout`.
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        *,
+        minconn: int = DEFAULT_POOL_MIN,
+        maxconn: int = DEFAULT_POOL_MAX,
+        timeout: float = DEFAULT_POOL_TIMEOUT,
+        statement_timeout: Optional[int] = None,
+        check_after: float = DEFAULT_CHECK_AFTER,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        connect: Callable[..., connection] = connect,
+    ):
+        """Instantiates a PostgresPool, opening `minconn` connections.
+
+        Args:
+            database_url (str): Connection string of the database.
+            minconn (int): Number of connections kept open, even when idle.
+            maxconn (int): Maximum number of connections open at the same time.
+            timeout (float): Seconds to wait for a connection when all `maxconn`
+                connections are in use, before raising :class:`PoolError`.
+            statement_timeout (int): Milliseconds after which the server aborts any
+                statement of the pool's connections. Defaults to the server's
+                setting.
+            check_after (float): Seconds of idling after which a connection is
+                checked for liveness before it is handed out.
+            idle_timeout (float): Seconds of idling after which connections above
+                `minconn` are closed.
+            connect (:obj:`callable`): Function opening a connection from the
+                parsed connection string.
+        """
+        if not 0 <= minconn <= maxconn or maxconn < 1:
+            raise ValueError(
+                "Pool sizes must satisfy 0 <= minconn <= maxconn, 1 <= maxconn"
+            )
+        if statement_timeout is not None and statement_timeout < 0:
+            raise ValueError("Statement timeout must not be negative")
+
+        self.conn_args = parse_dsn(database_url)
+        if statement_timeout is not None:
+            options = self.conn_args.get("options", "")
+            self.conn_args[
+                "options"
+            ] = f"{options} -c statement_timeout={statement_timeout}".strip()
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_after = check_after
+        self.idle_timeout = idle_timeout
+        self._connect = connect
+
+        self._idle: List[tuple] = []  # (connection, time returned to the pool)
+        self._size = 0
+        self._closed = False
+        self._available = threading.Condition()
+
+        for _ in range(minconn):
+            self._idle.append((self._new_conn(), time.monotonic()))
+            self._size += 1
+
+    @property
+    def size(self) -> int:
+        """Number of open connections, idle or in use."""
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    @contextmanager
+    def connection(self) -> Iterator[connection]:
+        """Borrows a connection from the pool for the duration of the context.
+
+        Raises:
+            PoolError: If no connection became available within the pool's timeout,
+                or the pool has been closed.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def getconn(self) -> connection:
+        """Takes a live connection from the pool, see :meth:`connection`."""
+        deadline = time.monotonic() + self.timeout
+        with self._available:
+            while not self._idle and self._size >= self.maxconn:
+                remaining = deadline - time.monotonic()
+                if (
+                    self._closed
+                    or remaining <= 0
+                    or not self._available.wait(remaining)
+                ):
+                    raise PoolError(
+                        f"No connection available within {self.timeout}s, "
+                        f"all {self.maxconn} connections are in use"
+                    )
+            if self._closed:
+                raise PoolError("Connection pool is closed")
+            if self._idle:
+                conn, returned = self._idle.pop()
+            else:
+                conn, returned = None, None
+            # Count the connection as in use while (re)connecting outside the lock
+            self._size += conn is None
+
+        try:
+            if conn is None:
+                return self._new_conn()
+            if time.monotonic() - returned < self.check_after and not conn.closed:
+                return conn
+            if self._is_alive(conn):
+                return conn
+            logger.warning("Replacing dead Postgres connection")
+            conn.close()
+            return self._new_conn()
+        except Exception:
+            self._discard()
+            raise
+
+    def putconn(self, conn: connection) -> None:
+        """Returns a borrowed connection to the pool."""
+        if not conn.closed and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except (OperationalError, InterfaceError):
+                conn.close()
+
+        with self._available:
+            if conn.closed or self._closed:
+                self._size -= 1
+                conn.close()
+            else:
+                self._idle.append((conn, time.monotonic()))
+                self._close_expired()
+            self._available.notify()
+
+    def _close_expired(self):
+        """Closes connections idle for `idle_timeout`, down to `minconn` connections.
+
+        Idle connections are handed out last in, first out, so the connections idle
+        for longest are the first ones of the idle list. Call holding the lock.
+        """
+        expired = time.monotonic() - self.idle_timeout
+        while (
+            self._idle and self._size > self.minconn and self._idle[0][1] <= expired
+        ):
+            conn, _ = self._idle.pop(0)
+            conn.close()
+            self._size -= 1
+
+    def closeall(self) -> None:
+        """Closes all idle connections, and borrowed ones once they are returned."""
+        with self._available:
+            self._closed = True
+            for conn, _ in self._idle:
+                conn.close()
+            self._size -= len(self._idle)
+            self._idle.clear()
+            self._available.notify_all()
+
+    def _new_conn(self) -> connection:
+        return self._connect(**self.conn_args)
+
+    def _discard(self):
+        with self._available:
+            self._size -= 1
+            self._available.notify()
+
+    @staticmethod
+    def _is_alive(conn: connection) -> bool:
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (OperationalError, InterfaceError):
+            return False
+
+
+@lru_cache(maxsize=4)
+def get_postgres_pool(database_url, **kwargs):
+    """Return a shared connection pool for the same arguments.
+
+    If no pool exists, it will be created. See :class:`PostgresPool` for the
+    arguments.
+    """
+    return PostgresPool(database_url, **kwargs)
+
+
+def get_primary_key(cursor, table):
+    """Returns the names of the columns of the table's primary key, in key order.
+
+    Returns an empty list if the table has no primary key.
+    """
+    cursor.execute(
+        """
+        SELECT a.attname
+        FROM pg_index i
+        JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, position) ON TRUE
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+        WHERE i.indrelid = %s::regclass AND i.indisprimary
+        ORDER BY k.position
+        """,
+        (sql.Identifier(table).as_string(cursor),),
+    )
+    return [name for (name,) in cursor.fetchall()]
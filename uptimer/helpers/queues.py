@@ -0,0 +1,234 @@
+import pickle
+from collections import deque
+from queue import Full, Queue
+from tempfile import TemporaryFile
+from time import monotonic
+from typing import Any, Callable, List, Optional
+
+from structlog import get_logger
+
+logger = get_logger()
+
+
+def item_count(item) -> int:
+    """Weighs every item as one."""
+    return 1
+
+
+class BoundedQueue(Queue):
+    """FIFO queue bounded by the total weight of its items.
+
+    The weight of an item is given by the `weight` function, e.g. the number of events
+    in it, or its size in bytes. With the default :func:`item_count` the queue behaves
+    like a :obj:`queue.Queue` of `maxsize` items.
+
+    When the queue is full, :meth:`put` either blocks until consumers have made room
+    (the default), or, with `spill` set, pickles the item into a temporary file. Spilled
+    items are loaded back in order as the queue drains, so producers never block and
+    memory stays bounded, at the cost of disk space.
+
+    A single item weighing more than `maxsize` is still accepted into an empty queue.
+
+    Besides :meth:`get`, consumers can drain pages of items in one go through
+    :meth:`get_page`, once :meth:`flush_delay` says a page is due.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        *,
+        weight: Optional[Callable[[Any], int]] = None,
+        spill: bool = False,
+    ):
+        """Instantiates a BoundedQueue.
+
+        Args:
+            maxsize (int): Maximum total weight of the items held in memory, `0` for an
+                unbounded queue.
+            weight (:obj:`callable`): Function returning the weight of an item,
+                :func:`item_count` by default.
+            spill (bool): Whether to spill items to disk instead of blocking
+                producers when the queue is full.
+        """
+        self.weight = weight or item_count
+        self.spill = spill
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        self.queue = deque()  # (item, weight, time queued, is marker)
+        self.weight_total = 0
+        # Highest total weight of items queued at the same time, spilled included
+        self.high_watermark = 0
+        self.spilled_weight = 0
+        self._spilled = deque()  # (weight, time queued, is marker) of spilled items
+        self._spill_file = None
+        self._spill_offset = 0
+        self._markers = 0
+
+    @property
+    def spilled(self) -> int:
+        """Number of items spilled to disk."""
+        return len(self._spilled)
+
+    def _qsize(self):
+        # Spilled items are loaded back before the in-memory items run out
+        return self.weight_total
+
+    def _fits(self, weight):
+        return self.weight_total == 0 or self.weight_total + weight <= self.maxsize
+
+    def _put(self, item):
+        self._append(item, max(1, self.weight(item)))
+
+    def _get(self):
+        item, weight, _, marker = self.queue.popleft()
+        self.weight_total -= weight
+        self._markers -= marker
+        self._unspill()
+        return item
+
+    def put(self, item, block=True, timeout=None):
+        """Puts the item into the queue, see :obj:`queue.Queue.put`.
+
+        Raises:
+            queue.Full: If the queue stayed full for `timeout` seconds, or is full
+                when not blocking. Never raised when spilling to disk.
+        """
+        if self.maxsize <= 0:
+            return super().put(item, block, timeout)
+        weight = max(1, self.weight(item))
+        with self.not_full:
+            if self.spill:
+                if self._spilled or not self._fits(weight):
+                    self._spill(item, weight)
+                else:
+                    self._append(item, weight)
+            else:
+                self._wait_for_room(weight, block, timeout)
+                self._append(item, weight)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def put_unbounded(self, item):
+        """Puts a marker at the end of the queue regardless of the queue being full.
+
+        Used to enqueue markers that must not block, e.g. on shutdown. The marker is
+        not accounted for in :attr:`high_watermark`, and makes the items queued before
+        it due to be flushed, see :meth:`flush_delay`.
+        """
+        with self.not_full:
+            if self._spilled:
+                self._spill(item, 1, marker=True)
+            else:
+                self.queue.append((item, 1, monotonic(), True))
+                self.weight_total += 1
+            self._markers += 1
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def flush_delay(
+        self,
+        max_items: int,
+        max_weight: Optional[int] = None,
+        max_age: Optional[float] = None,
+    ) -> Optional[float]:
+        """Returns the seconds until a page of items is due to be flushed.
+
+        A page is due as soon as `max_items` items, or items of a total weight of
+        `max_weight`, are queued, the queue is full, a marker has been queued, or the
+        oldest item has been queued for `max_age` seconds, whichever comes first.
+
+        Returns:
+            float: `0` if a page is due, the seconds until the oldest item reaches
+                `max_age` otherwise, or `None` if the queue is empty or no `max_age`
+                is given.
+        """
+        with self.mutex:
+            if not self.queue:
+                return None
+            if (
+                self._markers
+                or self._spilled
+                or len(self.queue) >= max_items
+                or (max_weight and self.weight_total >= max_weight)
+                or (self.maxsize > 0 and self.weight_total >= self.maxsize)
+            ):
+                return 0.0
+            if max_age is None:
+                return None
+            return max(0.0, self.queue[0][2] + max_age - monotonic())
+
+    def get_page(self, max_items: int, max_weight: Optional[int] = None) -> List:
+        """Removes and returns up to `max_items` items from the queue without blocking.
+
+        The page ends after the first marker, or before the item that would make its
+        total weight exceed `max_weight`. The first item is always included. Items are
+        marked done on retrieval, see :obj:`queue.Queue.task_done`.
+        """
+        page = []
+        page_weight = 0
+        with self.not_full:
+            while self.queue and len(page) < max_items:
+                item, weight, _, marker = self.queue[0]
+                if max_weight and page and page_weight + weight > max_weight:
+                    break
+                self._get()
+                page_weight += weight
+                page.append(item)
+                if marker:
+                    break
+            if page:
+                self.unfinished_tasks = max(0, self.unfinished_tasks - len(page))
+                if not self.unfinished_tasks:
+                    self.all_tasks_done.notify_all()
+                self.not_full.notify_all()
+        return page
+
+    def _wait_for_room(self, weight, block, timeout):
+        if not block:
+            if not self._fits(weight):
+                raise Full
+        elif timeout is None:
+            while not self._fits(weight):
+                self.not_full.wait()
+        else:
+            deadline = monotonic() + timeout
+            while not self._fits(weight):
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    raise Full
+                self.not_full.wait(remaining)
+
+    def _append(self, item, weight):
+        self.queue.append((item, weight, monotonic(), False))
+        self.weight_total += weight
+        self.high_watermark = max(
+            self.high_watermark, self.weight_total + self.spilled_weight
+        )
+
+    def _spill(self, item, weight, marker=False):
+        if self._spill_file is None:
+            self._spill_file = TemporaryFile(prefix="uptimer-queue-")
+            logger.warning("Queue is full, spilling items to disk")
+        self._spill_file.seek(0, 2)
+        pickle.dump(item, self._spill_file, pickle.HIGHEST_PROTOCOL)
+        self._spilled.append((weight, monotonic(), marker))
+        self.spilled_weight += weight
+        if not marker:
+            self.high_watermark = max(
+                self.high_watermark, self.weight_total + self.spilled_weight
+            )
+
+    def _unspill(self):
+        while self._spilled and self._fits(self._spilled[0][0]):
+            self._spill_file.seek(self._spill_offset)
+            item = pickle.load(self._spill_file)
+            self._spill_offset = self._spill_file.tell()
+            weight, queued, marker = self._spilled.popleft()
+            self.spilled_weight -= weight
+            self.queue.append((item, weight, queued, marker))
+            self.weight_total += weight
+        if not self._spilled and self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+            self._spill_offset = 0
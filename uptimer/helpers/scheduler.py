@@ -0,0 +1,127 @@
+import heapq
+import random
+import time
+from itertools import count
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class Scheduler:
+    """Schedules recurring items on fixed, independent start-to-start intervals.
+
+    Items are kept in a heap ordered by their next due time. Popping the due items
+    reschedules them relative to their *previous due time* rather than the time they
+    were actually run at, so that the cadence of an item does not drift with the time
+    it takes to process it, or with the number of items scheduled::
+
+        from uptimer.helpers.scheduler import Scheduler
+
+        scheduler = Scheduler(jitter=1.0)
+        scheduler.add("fast", "https://example.com", interval=10)
+        scheduler.add("slow", "https://example.org", interval=60)
+
+        while True:
+            time.sleep(scheduler.time_until_due())
+            for item in scheduler.pop_due():
+                process(item)
+
+    When an item is popped later than its due time, the difference is recorded as the
+    item's scheduling lag. Lag growing consistently means items are not processed fast
+    enough to keep up with their intervals. Should an item be late by more than its
+    full interval, the missed runs are skipped instead of being caught up on in a
+    burst, and counted in :attr:`missed`.
+    """
+
+    def __init__(
+        self,
+        *,
+        jitter: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        """Instantiates an empty Scheduler.
+
+        Args:
+            jitter (float): Fraction of an item's interval (between 0 and 1) across
+                which the first due time of the item is spread randomly. With the
+                default of 1.0 items added at the same time will be distributed over
+                their full interval, 0 makes all items due immediately.
+            clock (:obj:`callable`): Monotonic clock returning the current time in
+                seconds.
+            rng (:obj:`callable`): Random number generator returning floats in the
+                range of [0, 1).
+        """
+        if not 0 <= jitter <= 1:
+            raise ValueError("Scheduler jitter must be between 0 and 1")
+
+        self.jitter = jitter
+        self.clock = clock
+        self.rng = rng
+        self._heap: List[tuple] = []
+        self._sequence = count()
+
+        self.lag: Dict[Hashable, float] = {}
+        """Lag in seconds of each item's most recent run behind its due time."""
+
+        self.missed: Dict[Hashable, int] = {}
+        """Count of runs skipped per item due to being late by a full interval."""
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, key: Hashable, item: Any, interval: float) -> None:
+        """Adds an item to be scheduled every `interval` seconds.
+
+        Args:
+            key: Hashable identifier of the item, used to report its lag.
+            item: The object to be returned from :meth:`pop_due` when due.
+            interval (float): Time in seconds between two consecutive runs.
+        """
+        if interval <= 0:
+            raise ValueError("Scheduling interval must be greater zero")
+
+        due = self.clock() + self.jitter * self.rng() * interval
+        self.lag[key] = 0.0
+        self.missed[key] = 0
+        heapq.heappush(self._heap, (due, next(self._sequence), key, item, interval))
+
+    def time_until_due(self) -> Optional[float]:
+        """Returns the time in seconds until the next item is due.
+
+        Returns:
+            float: Seconds until the next item is due, 0 if items are due already, or
+                None if the scheduler is empty.
+        """
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    def pop_due(self) -> List[Any]:
+        """Returns all items that are currently due, rescheduling them.
+
+        Returns:
+            list: The due items, ordered by their due time.
+        """
+        now = self.clock()
+        due_items = []
+        while self._heap and self._heap[0][0] <= now:
+            due, _, key, item, interval = heapq.heappop(self._heap)
+            lag = now - due
+            self.lag[key] = lag
+
+            next_due = due + interval
+            if next_due <= now:
+                missed = int(lag // interval)
+                self.missed[key] += missed
+                next_due += missed * interval
+
+            heapq.heappush(
+                self._heap, (next_due, next(self._sequence), key, item, interval)
+            )
+            due_items.append(item)
+
+        return due_items
+
+    @property
+    def max_lag(self) -> float:
+        """The highest lag of all scheduled items' most recent runs."""
+        return max(self.lag.values(), default=0.0)
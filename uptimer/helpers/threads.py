@@ -1,10 +1,10 @@
-from queue import Empty, Queue
-from random import choice
-from threading import Event, Thread
-from time import sleep
+from itertools import count
+from queue import Full
+from threading import Condition, Event, Thread
 
 from structlog import get_logger
 
+from uptimer.helpers.queues import BoundedQueue
 from uptimer.plugins import ShutdownMarker
 
 logger = get_logger()
@@ -35,15 +35,37 @@ class ProcessingThread(Thread):
     The ProcessingThread expects the first argument to be the callback that should be
     used to write out the data. In practice this means that a writer using the
     ProcessingThread has its writing logic in the callback instead of :meth:`write`.
+
+    Items put into differently named queues (e.g. one per database table) can be
+    flushed in parallel by several workers, see `workers` on :meth:`__init__`. Each
+    queue is flushed by at most one worker at a time, and workers take turns on the
+    queues with a page due, picking the one that has waited the longest since it was
+    last flushed, so that a busy queue cannot starve the others.
+
+    Queues are unbounded by default. With `max_queue_size`, :meth:`put` blocks while
+    the queue is full, slowing the producer down to the pace of the callback, or spills
+    items to disk, see :class:`~uptimer.helpers.queues.BoundedQueue`.
     """
 
-    _stop_event = Event()
     _data = None
 
     exception = None
     """Stores exception raised in the thread's activity loop, and its callback."""
 
-    def __init__(self, callback, *, page_size=100, block=True, timeout=5.0, **kwargs):
+    def __init__(
+        self,
+        callback,
+        *,
+        page_size=100,
+        block=True,
+        timeout=5.0,
+        max_page_weight=None,
+        workers=1,
+        max_queue_size=0,
+        item_weight=None,
+        spill=False,
+        **kwargs,
+    ):
         """Initializing a ProcessingThread object.
 
         All arguments given in addition to the ones mentioned below (wrapped up in
@@ -64,23 +86,50 @@ class ProcessingThread(Thread):
                 callback can/should handle when called. Be aware that the callback may
                 receive pages shorter than this value, when the queue is flushed
                 prematurely.
-            block (bool): If retrieving an element from the queue should be blocking
-                for :attr:`timeout` seconds. See :obj:`queue.Queue.get` for a more
-                detailed description of the behavior.
-            timeout (float): For what duration retrieving an element from the queue
-                should block when :attr:`block` is `True`. See :obj:`queue.Queue.get`
-                for a more detailed description of the behavior.
+            block (bool): If pages should wait to fill up for up to :attr:`timeout`
+                seconds. Otherwise whatever is queued is flushed right away.
+            timeout (float): Maximum age in seconds of the oldest item of a queue,
+                before a page is flushed regardless of its size. A page is flushed as
+                soon as it reaches `page_size` items, `max_page_weight`, or this age,
+                whichever comes first.
+            max_page_weight (int): Maximum total weight of the items of one page (see
+                `item_weight`), e.g. in events or bytes. Unlimited by default.
+            workers (int): Number of workers flushing pages in parallel, the thread
+                itself being the first one. `None` starts one worker per named queue
+                as the queues are created. The callback has to be thread-safe when
+                using more than one worker.
+            max_queue_size (int): Maximum total weight of the items of each named
+                queue, `0` for unbounded queues.
+            item_weight (:obj:`callable`): Function returning the weight of an item
+                put into the queue, e.g. its number of events or size in bytes. Every
+                item weighs one by default.
+            spill (bool): Whether :meth:`put` spills items to disk when a queue is
+                full, instead of blocking until the callback has made room.
             kwargs: Any number of *named* arguments to be passed along to the callback
                 when executed.
         """
+        if workers is not None and workers < 1:
+            raise ValueError("A ProcessingThread needs at least one worker")
 
         super().__init__()
         self.callback = callback
         self.page_size = page_size
         self.block = block
         self.timeout = timeout
+        self.max_page_weight = max_page_weight
         self.callback_args = kwargs
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.item_weight = item_weight
+        self.spill = spill
         self._data = {}
+        self._queues = {}
+        self._stop_event = Event()
+        self._changed = Condition()
+        self._busy = set()
+        self._last_flushed = {}
+        self._turns = count()
+        self._helpers = []
         self.queue_logger = get_logger()
 
     def __enter__(self):
@@ -92,6 +141,23 @@ class ProcessingThread(Thread):
         logger.debug("Exiting context, stopping thread.")
         self.stop()
 
+    def start(self):
+        """Starts the thread, and the additional workers it was configured with."""
+        super().start()
+        for _ in range((self.workers or 1) - 1):
+            self._start_helper()
+
+    def join(self, timeout=None):
+        """Waits for the thread and its additional workers to terminate."""
+        super().join(timeout)
+        for helper in list(self._helpers):
+            helper.join(timeout)
+
+    @property
+    def high_watermarks(self):
+        """Highest total weight queued at the same time in each of the named queues."""
+        return {name: queue.high_watermark for name, queue in self._queues.items()}
+
     @property
     def stopped(self):
         """Boolean property on the thread's stop event being set.
@@ -114,10 +180,12 @@ class ProcessingThread(Thread):
         :meth:`__exit__` when the ProcessingThread is used as a context manager.
         """
         logger.debug("Stopping. Will finish processing queue.")
-        for _, queue in self._data.items():
-            queue.put(ShutdownMarker())
+        for _, queue in list(self._data.items()):
+            queue.put_unbounded(ShutdownMarker())
         self.block = False
         self._stop_event.set()
+        with self._changed:
+            self._changed.notify_all()
         self.join()
 
     def put(self, obj, queue_name="main"):
@@ -125,28 +193,67 @@ class ProcessingThread(Thread):
 
         Before adding the element to the queue, the method asserts the thread being
         alive and having no previous exception set. If so, the exception is raised in
-        the caller's thread.
+        the caller's thread. The same check is repeated while waiting for room in a
+        full queue.
 
         Args:
             obj (any): The object that should be added to the queue.
         """
         self._check_liveness()
         if queue_name not in self._data:
-            self._data[queue_name] = Queue()
-
-        self._data[queue_name].put(obj)
+            queue = BoundedQueue(
+                self.max_queue_size, weight=self.item_weight, spill=self.spill
+            )
+            with self._changed:
+                self._data[queue_name] = self._queues[queue_name] = queue
+            if self.workers is None and len(self._helpers) + 1 < len(self._data):
+                self._start_helper()
+
+        queue = self._data[queue_name]
+        if not self.max_queue_size or self.spill:
+            queue.put(obj)
+        else:
+            self._put_blocking(queue, queue_name, obj)
+
+        # Wake the workers up for a new deadline, or a page that is due
+        if len(queue.queue) <= 1 or self._flush_delay(queue) == 0:
+            with self._changed:
+                self._changed.notify_all()
+
+    def _put_blocking(self, queue, queue_name, obj):
+        while True:
+            try:
+                queue.put(obj, timeout=self.timeout)
+                return
+            except Full:
+                logger.debug("Queue is full, waiting", queue_name=queue_name)
+                self._check_liveness()
+                if not self.is_alive():
+                    raise
 
     def run(self):
         """Method representing the thread’s activity.
 
         When started the thread will indefinitely pick up pages from the queue (which
         can be fed through :meth:`put`, with a maximum length of :attr:`page_size`. If
-        the page is not empty, the callback will be executed.
+        the page is not empty, the callback will be executed. Workers sleep until a
+        page is due, instead of polling the queues.
 
         Due to limitations in the way exceptions can be raised from a non-main thread.
         an exception occurring during processing will only be raised at the next time
         an object is added to the queue through :meth:`put`.
         """
+        self._work()
+
+    def _start_helper(self):
+        helper = Thread(
+            target=self._work, name=f"{self.name}-worker-{len(self._helpers) + 1}"
+        )
+        self._helpers.append(helper)
+        if self.is_alive():
+            helper.start()
+
+    def _work(self):
         try:
             while True:
                 page = self._get_page_from_queue()
@@ -163,7 +270,7 @@ class ProcessingThread(Thread):
                 # Only stop processing with signal *and* no queues or all queues empty
                 if self.stopped and (
                     len(self._data) == 0
-                    or all([q.empty() for _, q in self._data.items()])
+                    or all([q.empty() for _, q in list(self._data.items())])
                 ):
                     logger.debug("Finished processing queue after stop signal")
                     break
@@ -172,31 +279,60 @@ class ProcessingThread(Thread):
             logger.exception("Caught an unexpected exception")
             self.exception = e
 
-    def _get_page_from_queue(self):
-        page = []
-        if len(self._data) == 0:
-            self.queue_logger.debug("No queues present, cannot get page.")
-            sleep(0.05)
-            return page
-        try:
-            queue_name, selected_queue = choice(list(self._data.items()))
-            self.queue_logger.debug(
-                f"Selected queue {queue_name}", queue_name=queue_name
-            )
+    def _flush_delay(self, queue):
+        return queue.flush_delay(
+            self.page_size, self.max_page_weight, self.timeout if self.block else 0
+        )
 
-            for _ in range(self.page_size):
-                item = selected_queue.get(block=self.block, timeout=self.timeout)
-                selected_queue.task_done()
-                if isinstance(item, ShutdownMarker):
-                    logger.debug("Received shutdown marker")
-                    self._stop_event.set()
-                    del self._data[queue_name]
-                    return page
+    def _select_queue(self):
+        """Claims the queue whose page is due, waiting until one is.
+
+        Of the queues with a page due, the one that waited the longest since it was
+        last flushed is claimed. Queues claimed by other workers are skipped.
+
+        Returns:
+            tuple: The name of the queue and the queue, or `None` when stopped and no
+                queues are left.
+        """
+        with self._changed:
+            while True:
+                if not self._data:
+                    if self.stopped:
+                        return None
+                    self.queue_logger.debug("No queues present, waiting for items.")
+                delays = {
+                    name: self._flush_delay(queue)
+                    for name, queue in self._data.items()
+                    if name not in self._busy
+                }
+                due = [name for name, delay in delays.items() if delay == 0]
+                if due:
+                    name = min(due, key=lambda name: self._last_flushed.get(name, -1))
+                    self._busy.add(name)
+                    self._last_flushed[name] = next(self._turns)
+                    return name, self._data[name]
+                pending = [delay for delay in delays.values() if delay is not None]
+                self._changed.wait(min(pending, default=None))
 
-                page.append(item)
+    def _get_page_from_queue(self):
+        selected = self._select_queue()
+        if selected is None:
+            return []
 
-        except Empty:
-            pass
+        queue_name, selected_queue = selected
+        self.queue_logger.debug(f"Selected queue {queue_name}", queue_name=queue_name)
+        try:
+            page = selected_queue.get_page(self.page_size, self.max_page_weight)
+            if page and isinstance(page[-1], ShutdownMarker):
+                logger.debug("Received shutdown marker")
+                page.pop()
+                self._stop_event.set()
+                with self._changed:
+                    del self._data[queue_name]
+        finally:
+            with self._changed:
+                self._busy.discard(queue_name)
+                self._changed.notify_all()
         return page
 
     def _check_liveness(self):
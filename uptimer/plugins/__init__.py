@@ -7,6 +7,11 @@ from structlog import get_logger
 
 from uptimer.core import settings as dynaconf_settings
 from uptimer.events.base import Event
+from uptimer.events.validation import (
+    DEFAULT_SAMPLE_RATE,
+    DEFAULT_VALIDATION_POLICY,
+    ValidationPolicy,
+)
 from uptimer.plugins.settings import PluginSettings
 
 DEFAULT_PLUGIN_CLASSNAME = "Plugin"
@@ -44,6 +49,16 @@ class BasePlugin(ABC):
     more details.
     """
 
+    common_settings: ClassVar[Tuple[str, ...]] = (
+        "event_validation",
+        "event_validation_sample_rate",
+    )
+    """Tuple of optional settings shared by all plugins.
+
+    Common settings are parsed like :prop:`optional_settings`, and must not be
+    repeated in the plugin's own settings.
+    """
+
     def __init__(self, *args, **kwargs) -> None:
         # Give plugins their own logger
         class_name = f"{self.__class__.__module__}.{self.__class__.__qualname__}"
@@ -52,10 +67,18 @@ class BasePlugin(ABC):
 
         self.settings = PluginSettings(
             required=tuple(map(lambda x: x.lower(), self.required_settings)),
-            optional=tuple(map(lambda x: x.lower(), self.optional_settings)),
+            optional=tuple(
+                map(lambda x: x.lower(), self.optional_settings + self.common_settings)
+            ),
             # Sources must be given in order of precedence
             sources=(dynaconf_settings, kwargs),
         )
+        self.validation_policy = ValidationPolicy(
+            self.settings.event_validation or DEFAULT_VALIDATION_POLICY,
+            sample_rate=int(self.settings.event_validation_sample_rate)
+            if self.settings.event_validation_sample_rate
+            else DEFAULT_SAMPLE_RATE,
+        )
 
         super().__init__(*args)
 
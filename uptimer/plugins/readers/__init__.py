@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import ClassVar, Iterator
+from typing import ClassVar, Iterable, Iterator
 
 from uptimer.events import Event
 from uptimer.plugins import BasePlugin
@@ -17,6 +17,13 @@ class ReaderPlugin(BasePlugin):
         # ABC inherently raises TypeError for unimplemented methods
         pass  # pragma: no cover
 
+    def acknowledge(self, items: Iterable) -> None:
+        """Called with items yielded by :meth:`read` once the writer has written them.
+
+        Readers of sources that track their progress, e.g. by committing offsets, can
+        use this to only advance past events that have been durably written.
+        """
+
     @property
     @abstractmethod
     def event_type(self):
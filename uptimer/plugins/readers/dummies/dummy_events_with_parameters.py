@@ -27,4 +27,5 @@ class Plugin(ReaderPlugin):
             reader=random.choice(characters),
             integer_value=random.randint(0, 1_000_000),
             float_value=random.uniform(0, 1_000_000),
+            validate=self.validation_policy.validate_on_creation,
         )
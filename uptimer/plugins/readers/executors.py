@@ -0,0 +1,209 @@
+"""Executors running per-target probe functions for reader plugins.
+
+Reader plugins probing a number of targets can hand a per-target probe function
+to an executor, and yield the results from :meth:`ProbeExecutor.map` as they
+complete::
+
+    from uptimer.plugins.readers import ReaderPlugin
+    from uptimer.plugins.readers.executors import get_executor
+
+    class MyProbe(ReaderPlugin):
+        def read(self):
+            executor = get_executor("threads", max_workers=20, max_per_key=2)
+            try:
+                yield from executor.map(
+                    self.probe_target, self.targets, key=lambda t: t.hostname
+                )
+            finally:
+                executor.shutdown()
+
+The probe function may be blocking, it is run on a bounded thread pool by both the
+`threads` and the `asyncio` executors. Executors limit the number of concurrently
+running probes overall, and optionally per key (for example per hostname).
+"""
+import asyncio
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Hashable, Iterable, Iterator, Optional, TypeVar
+
+from structlog import get_logger
+
+logger = get_logger()
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+KeyFunc = Optional[Callable[[Any], Hashable]]
+
+
+class ProbeExecutor(ABC):
+    """Abstract base class for executors running a function on a set of items."""
+
+    def __init__(self, *, max_workers: int = 1, max_per_key: Optional[int] = None):
+        """Instantiates a ProbeExecutor.
+
+        Args:
+            max_workers (int): Maximum number of items processed concurrently.
+            max_per_key (int): Maximum number of items processed concurrently that
+                share the same key (as returned by the `key` function passed to
+                :meth:`map`). Defaults to no limit apart from `max_workers`.
+        """
+        if max_workers < 1 or (max_per_key is not None and max_per_key < 1):
+            raise ValueError("Executor limits must be greater zero")
+        self.max_workers = max_workers
+        self.max_per_key = max_per_key or max_workers
+
+    @abstractmethod
+    def map(
+        self, fn: Callable[..., R], items: Iterable[T], *, key: KeyFunc = None
+    ) -> Iterator[R]:
+        """Calls `fn` for every item, yielding the results as they complete.
+
+        Args:
+            fn (:obj:`callable`): Function called with each item.
+            items (:obj:`iter`): Items to process.
+            key (:obj:`callable`): Optional function returning the key an item is
+                limited by through `max_per_key`.
+
+        Returns:
+            Iterator over the return values of `fn` in order of completion.
+        """
+        pass  # pragma: no cover
+
+    @abstractmethod
+    def shutdown(self) -> None:
+        """Releases resources held by the executor, waiting for running calls."""
+        pass  # pragma: no cover
+
+
+class SequentialProbeExecutor(ProbeExecutor):
+    """Runs all items one after the other in the calling thread."""
+
+    def map(self, fn, items, *, key=None):
+        for item in items:
+            yield fn(item)
+
+    def shutdown(self):
+        """Nothing to release, items are run in the calling thread."""
+
+
+class ThreadPoolProbeExecutor(ProbeExecutor):
+    """Runs items on a bounded :class:`concurrent.futures.ThreadPoolExecutor`.
+
+    Items are only submitted to the pool once both a worker and a slot for their key
+    are available, so that items waiting for a busy key do not occupy workers other
+    keys' items could run on. The pool is kept between calls to :meth:`map`, allowing
+    the probe function to reuse per-thread state (such as connections).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="probe"
+        )
+
+    def map(self, fn, items, *, key=None):
+        waiting: "OrderedDict[Hashable, deque]" = OrderedDict()
+        for item in items:
+            waiting.setdefault(key(item) if key else None, deque()).append(item)
+
+        in_flight: dict = {}
+        per_key: Counter = Counter()
+        try:
+            self._submit_ready(fn, waiting, in_flight, per_key)
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    per_key[in_flight.pop(future)] -= 1
+                self._submit_ready(fn, waiting, in_flight, per_key)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def _submit_ready(self, fn, waiting, in_flight, per_key):
+        # Submit one item per key and pass, so keys are served round-robin
+        submitted = True
+        while submitted and len(in_flight) < self.max_workers:
+            submitted = False
+            for item_key in list(waiting):
+                if len(in_flight) >= self.max_workers:
+                    break
+                if per_key[item_key] >= self.max_per_key:
+                    continue
+                item = waiting[item_key].popleft()
+                if not waiting[item_key]:
+                    del waiting[item_key]
+                in_flight[self._pool.submit(fn, item)] = item_key
+                per_key[item_key] += 1
+                submitted = True
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+class AsyncioProbeExecutor(ProbeExecutor):
+    """Schedules items on an asyncio event loop.
+
+    The limits are enforced through :class:`asyncio.Semaphore`, and the (blocking)
+    function is run on the loop's executor, a thread pool sized to `max_workers`.
+    The results are yielded from the synchronous :meth:`map` by stepping the event
+    loop until the next call completes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="probe"
+        )
+
+    def map(self, fn, items, *, key=None):
+        loop = asyncio.new_event_loop()
+        results = self._map_async(loop, fn, items, key)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(results.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(results.aclose())
+            loop.close()
+
+    async def _map_async(self, loop, fn, items, key):
+        global_limit = asyncio.Semaphore(self.max_workers)
+        key_limits = defaultdict(lambda: asyncio.Semaphore(self.max_per_key))
+
+        async def run(item):
+            # Wait for a per-key slot first, so that items queueing up for a busy
+            # key don't block the global slots of other keys' items.
+            async with key_limits[key(item) if key else None], global_limit:
+                return await loop.run_in_executor(self._pool, fn, item)
+
+        pending = [loop.create_task(run(item)) for item in items]
+        try:
+            for next_done in asyncio.as_completed(pending):
+                yield await next_done
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+EXECUTORS = {
+    "sequential": SequentialProbeExecutor,
+    "threads": ThreadPoolProbeExecutor,
+    "asyncio": AsyncioProbeExecutor,
+}
+
+
+def get_executor(mode: str, **kwargs: Any) -> ProbeExecutor:
+    """Returns an instance of the executor registered as `mode` in `EXECUTORS`."""
+    if mode not in EXECUTORS:
+        raise ValueError(f"Unknown executor {mode}, must be one of {list(EXECUTORS)}")
+    return EXECUTORS[mode](**kwargs)
@@ -1,14 +1,34 @@
-from functools import lru_cache
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+from multiprocessing import get_context
+from threading import Lock
+from time import monotonic
+from typing import Dict, Iterable, Optional, Set, Tuple
 
 from kafka import KafkaConsumer
+from kafka.consumer.subscription_state import ConsumerRebalanceListener
+from kafka.structs import OffsetAndMetadata, TopicPartition
 from structlog import get_logger
 
 from uptimer import events
 from uptimer.events import serializer
+from uptimer.events.codecs import CODECS, get_codec
 from uptimer.plugins.readers import ReaderPlugin
 
 logger = get_logger()
 
+DESERIALIZER_POOLS = {
+    "thread": ThreadPoolExecutor,
+    # Spawned, as forking after the consumer started its threads can deadlock
+    "process": partial(ProcessPoolExecutor, mp_context=get_context("spawn")),
+}
+MIN_CHUNK_SIZE = 100
+"""Minimum number of messages deserialized per task, to amortize its overhead."""
+COMMIT_MODES = ("written", "auto")
+
 
 @lru_cache(maxsize=1)
 def get_consumer(
@@ -21,10 +41,14 @@ def get_consumer(
     ssl_keyfile,
     ssl_certfile,
     ssl_check_hostname,
+    enable_auto_commit=True,
+    partitions=None,
+    listener=None,
 ):
     logger.info("Connecting to Kafka as Consumer", topic=topic, group_id=group_id)
     consumer = KafkaConsumer(
-        value_deserializer=serializer.loads,
+        # Message values are the raw bodies, deserialized by the reader along with
+        # their headers
         bootstrap_servers=bootstrap_server,
         group_id=group_id,
         security_protocol=security_protocol,
@@ -32,12 +56,109 @@ def get_consumer(
         ssl_keyfile=ssl_keyfile,
         ssl_certfile=ssl_certfile,
         ssl_check_hostname=ssl_check_hostname,
+        enable_auto_commit=enable_auto_commit,
     )
 
-    consumer.subscribe([topic])
+    if partitions:
+        # Assigned statically, without the group coordinator rebalancing them
+        consumer.assign([TopicPartition(topic, partition) for partition in partitions])
+    else:
+        consumer.subscribe([topic], listener=listener)
     return consumer
 
 
+class PartitionListener(ConsumerRebalanceListener):
+    """Keeps the reader informed of the partitions assigned to it by the group."""
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def on_partitions_revoked(self, revoked):
+        self.reader.partitions_revoked(set(revoked))
+
+    def on_partitions_assigned(self, assigned):
+        self.reader.partitions_assigned(set(assigned))
+
+
+def parse_partitions(value) -> Tuple[int, ...]:
+    """Parses partitions given as comma separated string, single integer, or list.
+
+    Environment variables like `KAFKA_PARTITIONS=3` arrive as integers, and TOML
+    lists as lists.
+    """
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        value = value.split(",")
+    elif not isinstance(value, (list, tuple)):
+        value = [value]
+    return tuple(int(partition) for partition in value if str(partition).strip())
+
+
+def offset_and_metadata(offset: int) -> OffsetAndMetadata:
+    # kafka-python 2.1 added the leader epoch to OffsetAndMetadata
+    return OffsetAndMetadata._make((offset, "", -1)[: len(OffsetAndMetadata._fields)])
+
+
+class OffsetTracker:
+    """Tracks which polled messages have been written, to commit their offsets.
+
+    Messages are tracked in deliveries, the items yielded to the writer for a number
+    of messages (e.g. the events of a chunk of a poll), together with the offsets
+    following the delivery's last message of each partition. Once the writer has
+    acknowledged all items of a delivery, and of all deliveries before it, the
+    delivery's offsets become committable. Offsets never skip messages that have not
+    been written, even if later messages have been written before them.
+
+    Items are told apart by the `delivery_tag` the tracker sets on them, which is
+    kept by copies of the items (e.g. pickled ones), and by batches the writer
+    validates into new objects.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._tags = itertools.count()
+        self._deliveries = deque()  # [offsets, tags of unacknowledged items, count]
+        self._pending = {}  # Delivery by tag of its unacknowledged items
+        self._committable: Dict[TopicPartition, int] = {}
+        self.written = 0
+        """Number of messages written since the offsets have last been taken."""
+
+    def track(self, offsets: Dict[TopicPartition, int], items: list, count: int):
+        """Tracks a delivery of `count` messages, before its items are yielded."""
+        with self._lock:
+            for item in items:
+                item.delivery_tag = next(self._tags)
+            delivery = [offsets, {item.delivery_tag for item in items}, count]
+            self._deliveries.append(delivery)
+            for item in items:
+                self._pending[item.delivery_tag] = delivery
+            self._advance()
+
+    def acknowledge(self, items: Iterable):
+        """Marks the items as written."""
+        with self._lock:
+            for item in items:
+                tag = getattr(item, "delivery_tag", None)
+                delivery = self._pending.pop(tag, None)
+                if delivery is not None:
+                    delivery[1].discard(tag)
+            self._advance()
+
+    def take_committable(self) -> Dict[TopicPartition, int]:
+        """Returns the offsets to commit by partition, resetting :attr:`written`."""
+        with self._lock:
+            offsets, self._committable = self._committable, {}
+            self.written = 0
+            return offsets
+
+    def _advance(self):
+        while self._deliveries and not self._deliveries[0][1]:
+            offsets, _, count = self._deliveries.popleft()
+            self._committable.update(offsets)
+            self.written += count
+
+
 class Plugin(ReaderPlugin):
     plugin_type = "kafka topic reader"
     event_type = events.stubs.Event
@@ -52,8 +173,78 @@ class Plugin(ReaderPlugin):
         "kafka_security_protocol",  # Defaults to `"SSL"` in settings.toml
         "kafka_ssl_check_hostname",  # Defaults to `True` in settings.toml
         "kafka_group_id",
+        "kafka_batch_size",
+        "kafka_poll_timeout_ms",
+        "kafka_deserializer_pool",
+        "kafka_deserializer_workers",
+        "kafka_commit",
+        "kafka_commit_interval_ms",
+        "kafka_commit_messages",
+        "kafka_codec",
+        "kafka_partitions",
     )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Batch mode polls up to `batch_size` messages at a time
+        self.batch_size = (
+            int(self.settings.kafka_batch_size) if self.settings.kafka_batch_size else 0
+        )
+        self.poll_timeout_ms = (
+            int(self.settings.kafka_poll_timeout_ms)
+            if self.settings.kafka_poll_timeout_ms
+            else 1000
+        )
+        self.deserializer_pool = self.settings.kafka_deserializer_pool or "thread"
+        if self.deserializer_pool not in DESERIALIZER_POOLS:
+            raise ValueError(
+                f"Unknown deserializer pool {self.deserializer_pool}, "
+                f"must be one of {list(DESERIALIZER_POOLS)}"
+            )
+        self.deserializer_workers = (
+            int(self.settings.kafka_deserializer_workers)
+            if self.settings.kafka_deserializer_workers
+            else os.cpu_count() or 1
+        )
+        self.commit_mode = self.settings.kafka_commit or "written"
+        if self.commit_mode not in COMMIT_MODES:
+            raise ValueError(
+                f"Unknown commit mode {self.commit_mode}, "
+                f"must be one of {COMMIT_MODES}"
+            )
+        self.commit_interval = (
+            float(self.settings.kafka_commit_interval_ms) / 1000
+            if self.settings.kafka_commit_interval_ms
+            else 5.0
+        )
+        self.commit_messages = (
+            int(self.settings.kafka_commit_messages)
+            if self.settings.kafka_commit_messages
+            else 10000
+        )
+        # Codec of messages without codec header
+        self.codec = self.settings.kafka_codec or "json"
+        if self.codec not in CODECS:
+            raise ValueError(f"Unknown codec {self.codec}, must be one of {CODECS}")
+        get_codec(self.codec)
+        self.offsets = OffsetTracker() if self.commit_mode == "written" else None
+        self._last_commit = monotonic()
+
+        # Partitions assigned statically, instead of by the consumer group
+        self.static_partitions = parse_partitions(self.settings.kafka_partitions)
+        self.partitions: Optional[Set[TopicPartition]] = (
+            {
+                TopicPartition(self.settings.kafka_reader_topic, partition)
+                for partition in self.static_partitions
+            }
+            if self.static_partitions
+            else None
+        )
+        """Partitions the reader consumes, `None` until the group has assigned any."""
+        self._listener = PartitionListener(self)
+        self._consumer = None
+
     def read(self):
         consumer = get_consumer(
             topic=self.settings.kafka_reader_topic,
@@ -64,6 +255,167 @@ class Plugin(ReaderPlugin):
             ssl_certfile=self.settings.kafka_ssl_certfile,
             ssl_keyfile=self.settings.kafka_ssl_keyfile,
             ssl_check_hostname=self.settings.kafka_ssl_check_hostname,
+            enable_auto_commit=self.commit_mode == "auto",
+            partitions=self.static_partitions or None,
+            listener=self._listener,
+        )
+        self._consumer = consumer
+        if self.batch_size:
+            yield from self.read_batches(consumer)
+        else:
+            yield from self.read_messages(consumer)
+
+    def read_messages(self, consumer):
+        """Yields the event of every message polled from the consumer.
+
+        Messages holding an envelope (see :func:`serializer.dumps_envelope`) are
+        yielded as an EventBatch of the envelope's events. Messages that cannot be
+        deserialized are logged and dropped.
+        """
+        while True:
+            records = consumer.poll(timeout_ms=self.poll_timeout_ms)
+            for partition, partition_records in records.items():
+                for record in partition_records:
+                    try:
+                        item = self.loads(record)
+                    except serializer.DESERIALIZATION_ERRORS as exc:
+                        logger.error(
+                            "Dropping message that cannot be deserialized",
+                            error=str(exc),
+                        )
+                        self.track({partition: record.offset + 1}, [], 1)
+                        continue
+                    self.track({partition: record.offset + 1}, [item], 1)
+                    yield item
+            self.commit(consumer)
+
+    def loads(self, record):
+        """Deserializes a record with the codec and compression its headers name."""
+        return serializer.loads(
+            record.value,
+            validate=self.validation_policy.validate_on_creation,
+            compression=serializer.envelope_compression(record.headers),
+            codec=serializer.message_codec(record.headers, self.codec),
+        )
+
+    def read_batches(self, consumer):
+        """Yields EventBatches of the messages polled from the consumer.
+
+        The messages of every poll are split into one chunk per worker (of at least
+        :const:`MIN_CHUNK_SIZE` messages), which are deserialized and validated on the
+        deserializer pool by :func:`serializer.loads_batch`. The consumer keeps polling
+        while the pool works, with up to two chunks per worker pending. Batches are
+        yielded in the order of the polls.
+        """
+        loads = partial(
+            serializer.loads_batch,
+            validate=self.validation_policy.validate_on_creation,
         )
-        for data in consumer:
-            yield data.value
+        workers = self.deserializer_workers
+        pending = deque()
+        with DESERIALIZER_POOLS[self.deserializer_pool](workers) as pool:
+            while True:
+                records = consumer.poll(
+                    timeout_ms=self.poll_timeout_ms, max_records=self.batch_size
+                )
+                messages = [
+                    (partition, record)
+                    for partition, partition_records in records.items()
+                    for record in partition_records
+                ]
+                chunk_size = max(MIN_CHUNK_SIZE, -(-len(messages) // workers))
+                for start in range(0, len(messages), chunk_size):
+                    chunk = messages[start : start + chunk_size]
+                    offsets = {
+                        partition: record.offset + 1 for partition, record in chunk
+                    }
+                    bodies = [record.value for _, record in chunk]
+                    headers = [record.headers for _, record in chunk]
+                    future = pool.submit(
+                        loads,
+                        bodies,
+                        compressions=list(
+                            map(serializer.envelope_compression, headers)
+                        ),
+                        codecs=[
+                            serializer.message_codec(header, self.codec)
+                            for header in headers
+                        ],
+                    )
+                    pending.append((future, offsets, len(chunk)))
+
+                # Without new messages, hand over everything that is pending
+                while pending and (
+                    not messages or pending[0][0].done() or len(pending) > 2 * workers
+                ):
+                    future, offsets, count = pending.popleft()
+                    batches = future.result()
+                    self.track(offsets, batches, count)
+                    yield from batches
+                self.commit(consumer)
+
+    def track(self, offsets, items, count):
+        if self.offsets is not None:
+            self.offsets.track(offsets, items, count)
+
+    def acknowledge(self, items):
+        """Marks items yielded by :meth:`read` as written, to commit their offsets."""
+        if self.offsets is not None:
+            self.offsets.acknowledge(items)
+
+    def partitions_assigned(self, assigned: Set[TopicPartition]):
+        self.partitions = (self.partitions or set()) | assigned
+        logger.info(
+            "Assigned Kafka partitions",
+            partitions=sorted(partition.partition for partition in assigned),
+        )
+
+    def partitions_revoked(self, revoked: Set[TopicPartition]):
+        """Commits the written messages of the partitions before giving them up.
+
+        Messages of revoked partitions that are written later are not committed, the
+        partitions' new consumer reads them again.
+        """
+        if self._consumer is not None:
+            self.commit(self._consumer, force=True)
+        self.partitions = (self.partitions or set()) - revoked
+        logger.info(
+            "Revoked Kafka partitions",
+            partitions=sorted(partition.partition for partition in revoked),
+        )
+
+    def stop(self):
+        """Commits the offsets of the messages written so far, even if not yet due."""
+        if self._consumer is not None:
+            self.commit(self._consumer, force=True)
+
+    def commit(self, consumer, force=False):
+        """Commits the offsets of the written messages, when a commit is due.
+
+        Commits are batched, and due every `commit_interval` seconds, or once
+        `commit_messages` messages have been written since the last commit. Offsets
+        are only committed for the partitions the reader consumes.
+        """
+        if self.offsets is None:
+            return
+        if not force and (
+            monotonic() - self._last_commit < self.commit_interval
+            and self.offsets.written < self.commit_messages
+        ):
+            return
+        self._last_commit = monotonic()
+        offsets = self.offsets.take_committable()
+        if self.partitions is not None:
+            offsets = {
+                partition: offset
+                for partition, offset in offsets.items()
+                if partition in self.partitions
+            }
+        if offsets:
+            consumer.commit(
+                {
+                    partition: offset_and_metadata(offset)
+                    for partition, offset in offsets.items()
+                }
+            )
+            logger.debug("Committed offsets", partitions=len(offsets))
@@ -0,0 +1,251 @@
+"""Transport adapters controlling how the HTTP prober manages its connections.
+
+Probes reusing a kept-alive ("warm") connection skip the TCP and TLS handshakes, which
+hides their latency from the measured response time. Targets for which the
+handshakes are part of what should be measured can be probed through a "cold"
+adapter instead, which never reuses a connection.
+
+All connections created through the :class:`ProbeHTTPAdapter` time the phases of
+establishing them. The durations are collected for requests made within the
+:func:`record_timings` context manager::
+
+    with record_timings() as timings:
+        session.get("https://example.com")
+
+    timings.dns, timings.connect, timings.tls  # Seconds, or None if not measured
+
+Hostnames are resolved through the system resolver, unless another resolver (such
+as a :class:`~uptimer.plugins.readers.probes.resolver.DNSCache`) is set for the
+requests made within the :func:`resolve_with` context manager.
+"""
+import socket
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Iterator, List, Optional
+
+from requests import Session
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+CONNECTION_MODES = ("warm", "cold")
+
+Resolver = Callable[[str, int], List[str]]
+
+_local = threading.local()
+
+
+class ConnectionTimings:
+    """Durations in seconds of the phases of establishing connections.
+
+    Each phase is None as long as it has not been measured, for example when a
+    request was sent over a reused connection, or because it does not apply (such
+    as the TLS handshake for plain-text HTTP). Should a request establish more than
+    one connection (e.g. when following redirects), the durations are summed up.
+    """
+
+    PHASES = ("dns", "connect", "tls")
+
+    def __init__(self):
+        self.dns: Optional[float] = None
+        self.connect: Optional[float] = None
+        self.tls: Optional[float] = None
+
+    def add(self, phase: str, duration: float) -> None:
+        setattr(self, phase, (getattr(self, phase) or 0.0) + duration)
+
+    @property
+    def total(self) -> float:
+        """Sum of all measured phases."""
+        return sum(getattr(self, phase) or 0.0 for phase in self.PHASES)
+
+
+@contextmanager
+def record_timings() -> Iterator[ConnectionTimings]:
+    """Collects the connection timings of requests made by the current thread."""
+    timings = ConnectionTimings()
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = None
+
+
+@contextmanager
+def resolve_with(resolver: Optional[Resolver]) -> Iterator[None]:
+    """Resolves hostnames of connections created by the current thread with `resolver`.
+
+    Args:
+        resolver (:obj:`callable`): Function resolving a hostname and port into a
+            list of addresses, such as :meth:`DNSCache.resolve`. If None, hostnames
+            are resolved through :func:`resolve`.
+    """
+    _local.resolver = resolver
+    try:
+        yield
+    finally:
+        _local.resolver = None
+
+
+def _current_timings() -> ConnectionTimings:
+    # Connections created outside of `record_timings` are timed into the void
+    return getattr(_local, "timings", None) or ConnectionTimings()
+
+
+def resolve(host: str, port: int) -> List[str]:
+    """Resolves the host into the list of its addresses, in order of preference."""
+    addresses = []
+    for *_, sockaddr in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return addresses
+
+
+class TimedConnectionMixin:
+    """Times DNS resolution and the TCP connect when establishing a connection.
+
+    The hostname is resolved separately from connecting to it. The connection is then
+    established to each of the resolved addresses in turn until one succeeds, just as
+    :func:`urllib3.util.connection.create_connection` does.
+    """
+
+    _new_conn_duration: Optional[float] = None
+
+    def _new_conn(self):
+        timings = _current_timings()
+        host = self._dns_host
+        start_time = perf_counter()
+        try:
+            addresses = (getattr(_local, "resolver", None) or resolve)(host, self.port)
+        except socket.gaierror as exc:
+            raise NewConnectionError(
+                self, f"Failed to establish a new connection: {exc}"
+            )
+        finally:
+            resolved_time = perf_counter()
+            timings.add("dns", resolved_time - start_time)
+        if not addresses:
+            raise NewConnectionError(
+                self, f"Failed to establish a new connection: no addresses for {host}"
+            )
+
+        try:
+            for idx, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    conn = super()._new_conn()
+                    break
+                except ConnectTimeoutError:  # Also covers NewConnectionError
+                    if idx == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+
+        connected_time = perf_counter()
+        timings.add("connect", connected_time - resolved_time)
+        self._new_conn_duration = connected_time - start_time
+        return conn
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        self._new_conn_duration = None
+        start_time = perf_counter()
+        try:
+            super().connect()
+        finally:
+            # Only time the handshake if the connection could be established at all
+            if self._new_conn_duration is not None:
+                _current_timings().add(
+                    "tls", perf_counter() - start_time - self._new_conn_duration
+                )
+
+
+class ColdPoolMixin:
+    """Closes connections when they are returned to the pool.
+
+    The (closed) connection is put back into the pool nonetheless, to keep the pool's
+    bookkeeping intact. It will be reconnected on its next use.
+    """
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn.close()
+        super()._put_conn(conn)
+
+
+class ProbeHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class ProbeHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class ColdHTTPConnectionPool(ColdPoolMixin, ProbeHTTPConnectionPool):
+    pass
+
+
+class ColdHTTPSConnectionPool(ColdPoolMixin, ProbeHTTPSConnectionPool):
+    pass
+
+
+class ProbeHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter with timed connections, and optionally cold connections.
+
+    Args:
+        cold (bool): If True, connections are closed after each request, so that every
+            request is sent over a new connection.
+        kwargs: Passed on to :class:`requests.adapters.HTTPAdapter`, i.e.
+            `pool_connections` (the number of per-host pools to keep), `pool_maxsize`
+            (the maximum number of connections kept per host), and `pool_block`.
+    """
+
+    def __init__(self, *, cold: bool = False, **kwargs):
+        self.cold = cold
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        if self.cold:
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": ColdHTTPConnectionPool,
+                "https": ColdHTTPSConnectionPool,
+            }
+        else:
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": ProbeHTTPConnectionPool,
+                "https": ProbeHTTPSConnectionPool,
+            }
+
+    __attrs__ = HTTPAdapter.__attrs__ + ["cold"]
+
+
+def create_session(
+    *,
+    cold: bool = False,
+    verify=True,
+    pool_connections: int = DEFAULT_POOLSIZE,
+    pool_maxsize: int = DEFAULT_POOLSIZE,
+) -> Session:
+    """Creates a :class:`requests.Session` using the :class:`ProbeHTTPAdapter`.
+
+    Sessions using cold connections also ask the server to close the connection after
+    the response through the ``Connection: close`` header.
+    """
+    adapter = ProbeHTTPAdapter(
+        cold=cold, pool_connections=pool_connections, pool_maxsize=pool_maxsize
+    )
+    session = Session()
+    session.verify = verify
+    if cold:
+        session.headers["Connection"] = "close"
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -1,27 +1,107 @@
+import codecs
 import re
 import time
-from collections import namedtuple
+from collections import deque, namedtuple
 from os import path
 from pathlib import Path
-from typing import Any, Union
+from typing import Any, Iterable, Iterator, Optional, Pattern, Union
 from urllib.parse import urlparse
 
 import yaml
-from requests import RequestException, Session
+from requests import RequestException
+from requests.adapters import DEFAULT_POOLSIZE
 
 from uptimer import events
+from uptimer.helpers import to_bool
+from uptimer.helpers.scheduler import Scheduler
 from uptimer.plugins.mixins import DistributeWorkMixin
 from uptimer.plugins.readers import ReaderPlugin
+from uptimer.plugins.readers.executors import EXECUTORS, get_executor
+from uptimer.plugins.readers.probes.adapters import (
+    CONNECTION_MODES,
+    ConnectionTimings,
+    create_session,
+    record_timings,
+    resolve_with,
+)
+from uptimer.plugins.readers.probes.resolver import DEFAULT_TTL as DEFAULT_DNS_TTL
+from uptimer.plugins.readers.probes.resolver import DNSCache
 
 DEFAULT_TLS_VERIFY = True
+DEFAULT_PROBE_MODE = "sequential"
+DEFAULT_CONCURRENCY = 100
+DEFAULT_CONCURRENCY_PER_HOST = 4
+DEFAULT_JITTER = 1.0
 
+DEFAULT_MAX_BODY_SIZE = 10 * 1024 * 1024
+DEFAULT_REGEX_WINDOW = 4096
+BODY_CHUNK_SIZE = 64 * 1024
+MAX_DRAIN_SIZE = 16 * 1024
+IDLE_INTERVAL = 1.0
 
-session = Session()
+TIMING_PHASES = ("dns", "connect", "tls", "ttfb", "transfer")
 
 
 ProbeTarget = namedtuple("ProbeTarget", "protocol, hostname, port, path")
 
 
+def limit_bytes(chunks: Iterable[bytes], limit: int) -> Iterator[bytes]:
+    """Yields the chunks until their total size reaches the limit in bytes.
+
+    The chunk exceeding the limit is truncated, and no further chunks are read.
+    """
+    remaining = limit
+    for chunk in chunks:
+        if len(chunk) >= remaining:
+            yield chunk[:remaining]
+            return
+        remaining -= len(chunk)
+        yield chunk
+
+
+def search_stream(
+    regex: Pattern,
+    chunks: Iterable[bytes],
+    encoding: str = "utf-8",
+    window: int = DEFAULT_REGEX_WINDOW,
+) -> bool:
+    """Searches the regex in the text decoded from a stream of byte chunks.
+
+    Each chunk is searched together with the last `window` characters preceding it,
+    so that matches spanning chunk boundaries are found as long as they're no longer
+    than the window. Chunks are only consumed up to the first match.
+
+    Args:
+        regex (:obj:`re.Pattern`): Compiled regular expression to search for.
+        chunks (:obj:`iter`): The chunks of bytes to search.
+        encoding (str): Name of the encoding to decode the chunks with, falling back
+            to UTF-8 if unknown. Undecodable bytes are replaced.
+        window (int): Number of characters carried over into the next chunk's search.
+
+    Returns:
+        bool: True if the regex matches.
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    tail = ""
+    for chunk in chunks:
+        text = tail + decoder.decode(chunk)
+        if regex.search(text):
+            return True
+        tail = text[-window:] if window > 0 else ""
+
+    final = decoder.decode(b"", final=True)
+    return bool(final) and regex.search(tail + final) is not None
+
+
+def to_ms(seconds: Optional[float]) -> Optional[int]:
+    """Converts a duration in seconds to whole milliseconds, passing through None."""
+    return None if seconds is None else round(1000 * seconds)
+
+
 class HTTPProbe(DistributeWorkMixin, ReaderPlugin):
     plugin_type = "HTTP(S) prober"
     event_type = events.ProbeEvent
@@ -30,15 +110,31 @@ class HTTPProbe(DistributeWorkMixin, ReaderPlugin):
         "probe_regexes",
         "probe_timeout",
         "probe_tls_verify",
+        "probe_max_body_size",
+        "probe_regex_window",
         "probe_interval",
+        "probe_intervals",
+        "probe_jitter",
+        "probe_mode",
+        "probe_concurrency",
+        "probe_concurrency_per_host",
+        "probe_pool_connections",
+        "probe_pool_maxsize",
+        "probe_keepalive",
+        "probe_connection_modes",
+        "probe_dns_cache",
+        "probe_dns_ttl",
     )
     _shutdown = False
     targets = None
+    scheduler = None
+    executor = None
+    dns_cache = None
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        session.verify = self._parse_tls_verify(self.settings.probe_tls_verify)
+        self.tls_verify = self._parse_tls_verify(self.settings.probe_tls_verify)
 
         self.probe_interval = (
             int(self.settings.probe_interval) if self.settings.probe_interval else 30
@@ -46,6 +142,41 @@ class HTTPProbe(DistributeWorkMixin, ReaderPlugin):
         self.probe_timeout = (
             int(self.settings.probe_timeout) if self.settings.probe_timeout else 10
         )
+        self.probe_max_body_size = (
+            int(self.settings.probe_max_body_size)
+            if self.settings.probe_max_body_size
+            else DEFAULT_MAX_BODY_SIZE
+        )
+        self.probe_regex_window = (
+            int(self.settings.probe_regex_window)
+            if self.settings.probe_regex_window is not None
+            else DEFAULT_REGEX_WINDOW
+        )
+        if self.probe_max_body_size < 1 or self.probe_regex_window < 0:
+            raise ValueError(
+                "PROBE_MAX_BODY_SIZE must be greater zero, "
+                "PROBE_REGEX_WINDOW must not be negative"
+            )
+        self.probe_mode = self._parse_probe_mode(self.settings.probe_mode)
+        self.probe_concurrency = (
+            int(self.settings.probe_concurrency)
+            if self.settings.probe_concurrency
+            else DEFAULT_CONCURRENCY
+        )
+        self.probe_concurrency_per_host = (
+            int(self.settings.probe_concurrency_per_host)
+            if self.settings.probe_concurrency_per_host
+            else DEFAULT_CONCURRENCY_PER_HOST
+        )
+        if self.probe_concurrency < 1 or self.probe_concurrency_per_host < 1:
+            raise ValueError("PROBE_CONCURRENCY settings must be greater zero")
+        self.probe_jitter = (
+            float(self.settings.probe_jitter)
+            if self.settings.probe_jitter is not None
+            else DEFAULT_JITTER
+        )
+        if not 0 <= self.probe_jitter <= 1:
+            raise ValueError("PROBE_JITTER must be between 0 and 1")
 
         # Parse PROBE_URLS and PROBE_REGEXES from settings, ensure they are of equal
         # length (either by using a single regex for all URLs or one for each, or none
@@ -55,7 +186,62 @@ class HTTPProbe(DistributeWorkMixin, ReaderPlugin):
             self.settings.probe_regexes, expected_count=len(probe_urls)
         )
 
+        intervals = self._parse_probe_intervals(
+            self.settings.probe_intervals, expected_count=len(probe_urls)
+        )
+        connection_modes = self._parse_connection_modes(
+            self.settings.probe_connection_modes,
+            keepalive=self.settings.probe_keepalive,
+            expected_count=len(probe_urls),
+        )
+
         self.targets = self._compile_target_list(regexes, probe_urls)
+        self.intervals = {url.strip(): i for url, i in zip(probe_urls, intervals)}
+        self.connection_modes = {
+            url.strip(): mode for url, mode in zip(probe_urls, connection_modes)
+        }
+        self.sessions = self._create_sessions()
+
+        dns_cached = self._parse_dns_cache(
+            self.settings.probe_dns_cache, expected_count=len(probe_urls)
+        )
+        self.dns_cached = {url.strip(): c for url, c in zip(probe_urls, dns_cached)}
+        if any(dns_cached):
+            self.dns_cache = DNSCache(
+                ttl=float(self.settings.probe_dns_ttl)
+                if self.settings.probe_dns_ttl
+                else DEFAULT_DNS_TTL
+            )
+
+    def _create_sessions(self):
+        """Creates the sessions shared by all probes, one per connection mode in use.
+
+        Unless configured otherwise through `PROBE_POOL_CONNECTIONS` and
+        `PROBE_POOL_MAXSIZE`, the connection pools are sized to keep one pool per
+        probed host, with each pool holding as many connections as there may be
+        concurrent requests to the host. This allows warm connections to be reused
+        between probing rounds instead of being evicted or discarded.
+        """
+        hostnames = {target.hostname for _, target, _ in self.targets}
+        pool_connections = (
+            int(self.settings.probe_pool_connections)
+            if self.settings.probe_pool_connections
+            else max(len(hostnames), DEFAULT_POOLSIZE)
+        )
+        pool_maxsize = (
+            int(self.settings.probe_pool_maxsize)
+            if self.settings.probe_pool_maxsize
+            else max(self.probe_concurrency_per_host, DEFAULT_POOLSIZE)
+        )
+        return {
+            mode: create_session(
+                cold=mode == "cold",
+                verify=self.tls_verify,
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+            )
+            for mode in set(self.connection_modes.values())
+        }
 
     def _compile_target_list(self, regexes, probe_urls):
         targets = []
@@ -112,6 +298,15 @@ class HTTPProbe(DistributeWorkMixin, ReaderPlugin):
 
         raise ValueError(f"Unexpected value for PROBE_TLS_VERIFY: {tls_verify}")
 
+    @staticmethod
+    def _parse_probe_mode(probe_mode: Any) -> str:
+        if not probe_mode:
+            return DEFAULT_PROBE_MODE
+        if isinstance(probe_mode, str) and probe_mode.lower() in EXECUTORS:
+            return probe_mode.lower()
+
+        raise ValueError(f"Unexpected value for PROBE_MODE: {probe_mode}")
+
     @staticmethod
     def _parse_probe_param(param):
         if isinstance(param, list):
@@ -146,49 +341,265 @@ class HTTPProbe(DistributeWorkMixin, ReaderPlugin):
                 "Number of PROBE_REGEXES must match number of PROBE_URLS or be 1"
             )
 
+    def _parse_probe_intervals(self, intervals, expected_count=1):
+        if not intervals:
+            return [self.probe_interval for _ in range(expected_count)]
+
+        if not isinstance(intervals, (int, float)):
+            intervals = self._parse_probe_param(intervals)
+        if not isinstance(intervals, list):
+            intervals = [intervals]
+
+        intervals = [float(i) for i in intervals]
+        if any(i <= 0 for i in intervals):
+            raise ValueError("PROBE_INTERVALS must be greater zero")
+        if len(intervals) == 1:
+            return [intervals[0] for _ in range(expected_count)]
+        elif len(intervals) == expected_count:
+            return intervals
+        else:
+            raise ValueError(
+                "Number of PROBE_INTERVALS must match number of PROBE_URLS or be 1"
+            )
+
+    def _parse_connection_modes(self, modes, keepalive=None, expected_count=1):
+        if keepalive is None:
+            keepalive = True
+        elif isinstance(keepalive, str):
+            keepalive = to_bool(keepalive)
+
+        if not modes:
+            default_mode = "warm" if keepalive else "cold"
+            return [default_mode for _ in range(expected_count)]
+
+        modes = [str(m).lower() for m in self._parse_probe_param(modes)]
+        if any(m not in CONNECTION_MODES for m in modes):
+            raise ValueError(
+                f"PROBE_CONNECTION_MODES must be one of {CONNECTION_MODES}: {modes}"
+            )
+        if len(modes) == 1:
+            return [modes[0] for _ in range(expected_count)]
+        elif len(modes) == expected_count:
+            return modes
+        else:
+            raise ValueError(
+                "Number of PROBE_CONNECTION_MODES must match number of PROBE_URLS "
+                "or be 1"
+            )
+
+    def _parse_dns_cache(self, enabled, expected_count=1):
+        if enabled is None:
+            return [True for _ in range(expected_count)]
+
+        if not isinstance(enabled, (bool, int)):
+            enabled = self._parse_probe_param(enabled)
+        if not isinstance(enabled, list):
+            enabled = [enabled]
+
+        enabled = [to_bool(e) if isinstance(e, str) else bool(e) for e in enabled]
+        if len(enabled) == 1:
+            return [enabled[0] for _ in range(expected_count)]
+        elif len(enabled) == expected_count:
+            return enabled
+        else:
+            raise ValueError(
+                "Number of PROBE_DNS_CACHE must match number of PROBE_URLS or be 1"
+            )
+
+    @property
+    def dns_cache_stats(self):
+        """Hit and miss counters of the DNS cache, empty if the cache is disabled."""
+        if self.dns_cache is None:
+            return {}
+        return self.dns_cache.stats
+
+    @property
+    def scheduling_lag(self):
+        """Seconds each target's most recent probe has been started behind schedule.
+
+        Consistently growing lag indicates the prober is saturated, i.e. it cannot
+        keep up probing the targets at their configured intervals.
+        """
+        if self.scheduler is None:
+            return {}
+        return dict(self.scheduler.lag)
+
     def read(self):
+        self.executor = get_executor(
+            self.probe_mode,
+            max_workers=self.probe_concurrency,
+            max_per_key=self.probe_concurrency_per_host,
+        )
+        try:
+            # A negative interval probes all targets exactly once
+            if self.probe_interval < 0:
+                yield from self._probe_round(self.targets)
+            else:
+                yield from self._probe_scheduled()
+        finally:
+            self.executor.shutdown()
+            if self.dns_cache is not None:
+                self.dns_cache.shutdown()
+
+    def _probe_scheduled(self):
+        self.scheduler = Scheduler(jitter=self.probe_jitter)
+        for target in self.targets:
+            url = target[0]
+            self.scheduler.add(url, target, interval=self.intervals[url])
+
+        if not self.scheduler:
+            # E.g. distributed workers without a share of the targets
+            self.logger.info("No targets to probe, idling until stopped.")
+
+        missed_before = 0
+        while self._shutdown is not True:
+            time_until_due = self.scheduler.time_until_due()
+            if time_until_due is None:
+                time.sleep(IDLE_INTERVAL)
+                continue
+            if time_until_due:
+                time.sleep(time_until_due)
+                continue
+
+            due_targets = self.scheduler.pop_due()
+            max_lag = max(
+                (self.scheduler.lag[url] for url, _, _ in due_targets), default=0.0
+            )
+            missed = sum(self.scheduler.missed.values())
+            if missed > missed_before:
+                self.logger.warning(
+                    f"Prober is saturated, skipped {missed - missed_before} probes",
+                    missed=missed - missed_before,
+                    max_lag=max_lag,
+                )
+                missed_before = missed
 
-        while True:
-            yield from self._probe_all()
+            yield from self._probe_round(due_targets, max_lag=max_lag)
 
-            if self._shutdown is True or self.probe_interval < 0:
-                self.logger.debug("Shutting down loop.")
-                break
+        self.logger.debug("Shutting down loop.")
 
-            time.sleep(self.probe_interval)
+    def _probe_round(self, targets, **log_data):
+        start_time = time.time()
+        yield from self.executor.map(
+            lambda probe: self._probe_target(*probe),
+            targets,
+            key=lambda probe: probe[1].hostname,
+        )
 
-    def _probe_all(self):
+        round_time = time.time() - start_time
+        self.logger.info(
+            f"Finished probing {len(targets)} targets in {round_time:.2f} s",
+            round_time=round_time,
+            target_count=len(targets),
+            probe_mode=self.probe_mode,
+            dns_cache=self.dns_cache_stats,
+            **log_data,
+        )
 
-        for url, target, regex in self.targets:
-            self.logger.info(f"Probing {target.hostname}")
+    def _probe_target(self, url, target, regex):
+        self.logger.info(f"Probing {target.hostname}")
+
+        error = ""
+        matches_regex = True
+        timings = {phase: None for phase in TIMING_PHASES}
+        start_time = time.perf_counter()
+        try:
+            status_code, matches_regex = self._fetch(url, regex, timings)
+        except RequestException as exc:
+            error = str(exc)
+            status_code = 0
+
+        response_time_ms = round(1000 * (time.perf_counter() - start_time))
+
+        if regex and not error:
+            self.logger.info(f"Matches regex /{regex.pattern}/: {matches_regex}")
+
+        self.logger.info(f"Done after {response_time_ms} ms", **timings)
+        return self.event_type(
+            **target._asdict(),
+            status_code=status_code,
+            response_time_ms=response_time_ms,
+            error=error,
+            matches_regex=matches_regex,
+            regex=regex.pattern if regex else "",
+            validate=self.validation_policy.validate_on_creation,
+            **{f"{phase}_ms": duration for phase, duration in timings.items()},
+        )
 
-            error = ""
-            response = None
-            matches_regex = True
-            start_time = time.time()
+    def _fetch(self, url, regex, timings):
+        """Requests the URL, recording the duration of each phase in `timings`.
+
+        Phases that were not measured, such as the connection setup when reusing a
+        connection, or the ones following a failed phase, are left as None.
+
+        Returns:
+            tuple: The response's status code, and whether its body matches the regex
+                (always True if there's no regex).
+        """
+        connection_mode = self.connection_modes[url]
+        session = self.sessions[connection_mode]
+        resolver = self.dns_cache.resolve if self.dns_cached[url] else None
+        with record_timings() as connection_timings, resolve_with(resolver):
+            start_time = time.perf_counter()
             try:
-                response = session.get(url, timeout=self.probe_timeout)
-                status_code = response.status_code
-            except RequestException as exc:
-                error = str(exc)
-                status_code = 0
-
-            response_time_ms = round(1000 * (time.time() - start_time))
-
-            if regex and response:
-                matches_regex = regex.search(response.text) is not None
-                self.logger.info(f"Matches regex /{regex.pattern}/: {matches_regex}")
-
-            yield self.event_type(
-                **target._asdict(),
-                status_code=status_code,
-                response_time_ms=response_time_ms,
-                error=error,
-                matches_regex=matches_regex,
-                regex=regex.pattern if regex else "",
+                response = session.get(url, timeout=self.probe_timeout, stream=True)
+            finally:
+                for phase in ConnectionTimings.PHASES:
+                    timings[phase] = to_ms(getattr(connection_timings, phase))
+
+        headers_time = time.perf_counter()
+        # The time to first byte excludes the connection setup preceding the request
+        timings["ttfb"] = to_ms(
+            max(0.0, headers_time - start_time - connection_timings.total)
+        )
+        try:
+            matches_regex = self._read_body(
+                response, regex, drain=connection_mode == "warm"
             )
+        finally:
+            # Releases the connection if the body has been read completely, and
+            # closes it otherwise.
+            response.close()
+        if matches_regex is not None:
+            timings["transfer"] = to_ms(time.perf_counter() - headers_time)
+        return response.status_code, matches_regex is not False
+
+    def _read_body(self, response, regex, drain=False) -> Optional[bool]:
+        """Streams the response body, searching it for the regex.
+
+        Reading stops at the first match, or after `PROBE_MAX_BODY_SIZE` bytes. Without
+        a regex the body is skipped, unless `drain` is set and the body is announced to
+        be at most :const:`MAX_DRAIN_SIZE` bytes: draining reads and discards the body
+        so that its connection can be reused. Skipped bodies close their connection.
+
+        Returns:
+            bool: Whether the body matches the regex, True if there's no regex, or
+                None if the body was skipped.
+        """
+        if regex is None and not (drain and self._is_drainable(response)):
+            return None
+
+        chunks = limit_bytes(
+            response.iter_content(chunk_size=BODY_CHUNK_SIZE), self.probe_max_body_size
+        )
+        if regex is None:
+            deque(chunks, maxlen=0)
+            return True
+        return search_stream(
+            regex,
+            chunks,
+            encoding=response.encoding or "utf-8",
+            window=self.probe_regex_window,
+        )
 
-            self.logger.info(f"Done after {response_time_ms} ms")
+    @staticmethod
+    def _is_drainable(response) -> bool:
+        """Whether the response's Content-Length is small enough to drain its body."""
+        try:
+            length = int(response.headers.get("Content-Length", ""))
+        except ValueError:
+            return False
+        return 0 <= length <= MAX_DRAIN_SIZE
 
     def stop(self):
         self._shutdown = True
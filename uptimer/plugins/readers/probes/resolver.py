@@ -0,0 +1,153 @@
+"""In-process DNS cache for the HTTP prober.
+
+Probing many targets at short intervals would otherwise send a DNS lookup to the
+system resolver for every new connection, and add the resolver's varying latency to
+the measurements. :class:`DNSCache` keeps resolved addresses for a fixed time to
+live, and refreshes entries still in use in the background shortly before they
+expire, so that probes of frequently probed hosts never wait for a lookup::
+
+    cache = DNSCache(ttl=60)
+    cache.resolve("example.com", 443)  # Miss, resolved synchronously
+    cache.resolve("example.com", 443)  # Hit
+    cache.stats  # {"hits": 1, "misses": 1, "refreshes": 0, "errors": 0, ...}
+
+The TTLs of the actual DNS records are not available through
+:func:`socket.getaddrinfo`, hence the cache applies the same configurable TTL to all
+entries.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from structlog import get_logger
+
+from uptimer.plugins.readers.probes.adapters import Resolver, resolve
+
+logger = get_logger()
+
+DEFAULT_TTL = 60.0
+DEFAULT_REFRESH_AHEAD = 0.2
+
+
+class CacheEntry(NamedTuple):
+    addresses: List[str]
+    expires: float
+
+
+class DNSCache:
+    """Thread-safe cache of resolved hostnames."""
+
+    def __init__(
+        self,
+        *,
+        ttl: float = DEFAULT_TTL,
+        refresh_ahead: float = DEFAULT_REFRESH_AHEAD,
+        resolver: Resolver = resolve,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Instantiates an empty DNSCache.
+
+        Args:
+            ttl (float): Seconds for which resolved addresses are kept.
+            refresh_ahead (float): Fraction of the TTL (between 0 and 1) before the
+                expiry of an entry, within which a cache hit triggers a refresh of
+                the entry in the background. 0 disables background refreshes.
+            resolver (:obj:`callable`): Function resolving a hostname and port into
+                a list of addresses.
+            clock (:obj:`callable`): Monotonic clock returning the current time in
+                seconds.
+        """
+        if ttl <= 0:
+            raise ValueError("DNS cache TTL must be greater zero")
+        if not 0 <= refresh_ahead <= 1:
+            raise ValueError("DNS cache refresh_ahead must be between 0 and 1")
+
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.resolver = resolver
+        self.clock = clock
+
+        self._entries: Dict[str, CacheEntry] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Counters of cache hits, misses, background refreshes and their errors."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "entries": len(self),
+        }
+
+    def resolve(self, host: str, port: int) -> List[str]:
+        """Returns the cached addresses of the host, resolving it on a miss.
+
+        Errors resolving the host are raised and not cached.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is not None and entry.expires > now:
+                self.hits += 1
+                if entry.expires - now < self.refresh_ahead * self.ttl:
+                    self._schedule_refresh(host, port)
+                return entry.addresses
+            self.misses += 1
+
+        addresses = self.resolver(host, port)
+        self._store(host, addresses)
+        return addresses
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def shutdown(self) -> None:
+        """Waits for running background refreshes to finish."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _store(self, host, addresses):
+        with self._lock:
+            self._entries[host] = CacheEntry(addresses, self.clock() + self.ttl)
+
+    def _schedule_refresh(self, host, port):
+        # Must be called holding the lock
+        if host in self._refreshing:
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="dns-refresh"
+            )
+        self._refreshing.add(host)
+        self._pool.submit(self._refresh, host, port)
+
+    def _refresh(self, host, port):
+        addresses = None
+        try:
+            addresses = self.resolver(host, port)
+        except OSError as exc:
+            # Keep serving the current entry until it expires
+            logger.warning(f"Failed to refresh DNS cache entry of {host}: {exc}")
+        finally:
+            with self._lock:
+                if addresses is None:
+                    self.errors += 1
+                else:
+                    self.refreshes += 1
+                    self._entries[host] = CacheEntry(addresses, self.clock() + self.ttl)
+                self._refreshing.discard(host)
@@ -1,6 +1,10 @@
 from abc import abstractmethod
+from typing import Callable, ClassVar, Iterable, Optional
+
+from jsonschema.exceptions import ValidationError as SchemaValidationError
 
 from uptimer.events.base import Event
+from uptimer.events.batch import EventBatch
 from uptimer.exceptions import ValidationError
 from uptimer.plugins import BasePlugin
 
@@ -16,11 +20,61 @@ class WriterPlugin(BasePlugin):
     event_type = Event
     """Event type to validate the given payload data against."""
 
+    on_written: ClassVar[Optional[Callable[[list], None]]] = None
+    """Callback for the items of the payload once they are written, see :meth:`written`.
+
+    Set by the processors to the reader's `acknowledge` method, e.g. for the Kafka
+    reader to commit the offsets of the messages written.
+    """
+
     @abstractmethod
     def write(self, payload):
         # ABC inherently raises TypeError for unimplemented methods
         pass  # pragma: no cover
 
+    def iter_valid(self, payload):
+        """Yields the payload's events, validated as the validation policy requires.
+
+        Invalid events are logged and skipped. Besides events, the payload may contain
+        :class:`uptimer.events.EventBatch` objects, which are validated column by
+        column, and yielded without their invalid events.
+        """
+        for item in payload:
+            if isinstance(item, EventBatch):
+                batch, errors = self.validation_policy.validate_batch(item)
+                for row, message in errors.items():
+                    self.logger.error(
+                        f"Error validating event {row} of batch: {message}",
+                        event_type=batch.event_type.__name__,
+                    )
+                if not batch:
+                    self.written([item])
+                    continue
+                # Reported as the payload's batch, see `written`
+                batch.delivery_tag = item.delivery_tag
+                yield batch
+                continue
+
+            try:
+                self.validation_policy.validate(item)
+            except SchemaValidationError:
+                self.logger.exception("Error validating event", exc_info=True)
+                self.written([item])
+                continue
+            yield item
+
+    def written(self, items: Iterable):
+        """Reports items to :attr:`on_written` once they are durably written.
+
+        Writers call this with the items yielded by :meth:`iter_valid`, which reports
+        the items it drops as written right away, as they will never be written.
+        Readers tell items apart by their `delivery_tag`, which batches validated into
+        new objects keep, as do copies of items, e.g. items spilled to disk.
+        """
+        if self.on_written is None:
+            return
+        self.on_written(list(items))
+
     @classmethod
     def validate_event_type(
         cls,
@@ -83,7 +137,7 @@ class WriterPlugin(BasePlugin):
             return event.to_json()
         elif to_tuple_by_keys:
             if ignore_missing_keys:
-                return tuple(event.get(key, None) for key in to_tuple_by_keys)
+                return event.to_tuple(to_tuple_by_keys)
             else:
                 return tuple(event[key] for key in to_tuple_by_keys)
         return event
@@ -1,13 +1,21 @@
+from collections import deque
 from functools import lru_cache
+from threading import Lock
+from time import monotonic
+from typing import List, Optional
 
 from kafka import KafkaProducer
 from structlog import get_logger
 
-from uptimer.events import Event, serializer
+from uptimer.events import Event, EventBatch, serializer
+from uptimer.events.codecs import CODECS, get_codec
 from uptimer.plugins.writers import WriterPlugin
 
 logger = get_logger()
 
+PRODUCER_MODES = ("sync", "async")
+WIRE_FORMATS = ("event", "envelope")
+
 
 @lru_cache(maxsize=1)
 def get_producer(
@@ -18,6 +26,10 @@ def get_producer(
     ssl_keyfile,
     ssl_certfile,
     ssl_check_hostname,
+    linger_ms=0,
+    batch_size=16384,
+    max_in_flight=5,
+    compression_type=None,
 ):
     logger.info("Connecting to Kafka as Producer")
     return KafkaProducer(
@@ -28,12 +40,10 @@ def get_producer(
         ssl_keyfile=ssl_keyfile,
         ssl_certfile=ssl_certfile,
         ssl_check_hostname=ssl_check_hostname,
-    )
-
-
-def send_error_callback(excp):
-    logger.exception(
-        "Sending message to topic failed", exc_info=excp, error=type(excp).__name__
+        linger_ms=linger_ms,
+        batch_size=batch_size,
+        max_in_flight_requests_per_connection=max_in_flight,
+        compression_type=compression_type,
     )
 
 
@@ -50,30 +60,334 @@ class Plugin(WriterPlugin):
     optional_settings = (
         "kafka_security_protocol",  # Defaults to `"SSL"` in settings.toml
         "kafka_ssl_check_hostname",  # Defaults to `True` in settings.toml
+        "kafka_producer_mode",
+        "kafka_linger_ms",
+        "kafka_producer_batch_bytes",
+        "kafka_max_in_flight",
+        "kafka_flush_bytes",
+        "kafka_flush_interval_ms",
+        "kafka_retry_buffer_size",
+        "kafka_compression_type",
+        "kafka_wire_format",
+        "kafka_envelope_compression",
+        "kafka_envelope_size",
+        "kafka_envelope_max_age_ms",
+        "kafka_codec",
+        "kafka_partition_key",
     )
 
     _type_unset = "__event_type_unset__"
 
-    def write(self, payload):
-        producer = get_producer(
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.mode = self.settings.kafka_producer_mode or "sync"
+        if self.mode not in PRODUCER_MODES:
+            raise ValueError(
+                f"Unknown producer mode {self.mode}, must be one of {PRODUCER_MODES}"
+            )
+        self.linger_ms = (
+            int(self.settings.kafka_linger_ms) if self.settings.kafka_linger_ms else 0
+        )
+        self.batch_bytes = (
+            int(self.settings.kafka_producer_batch_bytes)
+            if self.settings.kafka_producer_batch_bytes
+            else 16384
+        )
+        self.max_in_flight = (
+            int(self.settings.kafka_max_in_flight)
+            if self.settings.kafka_max_in_flight
+            else 5
+        )
+        # Unflushed data after which the async mode waits for the broker
+        self.flush_bytes = (
+            int(self.settings.kafka_flush_bytes)
+            if self.settings.kafka_flush_bytes
+            else 16 * 1024 * 1024
+        )
+        self.flush_interval = (
+            float(self.settings.kafka_flush_interval_ms) / 1000
+            if self.settings.kafka_flush_interval_ms
+            else 10.0
+        )
+        self.retry_buffer_size = (
+            int(self.settings.kafka_retry_buffer_size)
+            if self.settings.kafka_retry_buffer_size
+            else 10000
+        )
+        self.compression_type = self.settings.kafka_compression_type or None
+        self.wire_format = self.settings.kafka_wire_format or "event"
+        if self.wire_format not in WIRE_FORMATS:
+            raise ValueError(
+                f"Unknown wire format {self.wire_format}, must be one of {WIRE_FORMATS}"
+            )
+        self.envelope_compression = self.settings.kafka_envelope_compression or "gzip"
+        if self.envelope_compression not in serializer.ENVELOPE_COMPRESSIONS:
+            raise ValueError(
+                f"Unknown envelope compression {self.envelope_compression}, "
+                f"must be one of {serializer.ENVELOPE_COMPRESSIONS}"
+            )
+        self.envelope_size = (
+            int(self.settings.kafka_envelope_size)
+            if self.settings.kafka_envelope_size
+            else 1000
+        )
+        # Age after which envelopes are sent, even if they are not full yet
+        self.envelope_max_age = (
+            float(self.settings.kafka_envelope_max_age_ms) / 1000
+            if self.settings.kafka_envelope_max_age_ms
+            else 1.0
+        )
+        self.codec = self.settings.kafka_codec or "json"
+        if self.codec not in CODECS:
+            raise ValueError(f"Unknown codec {self.codec}, must be one of {CODECS}")
+        get_codec(self.codec)
+        # Properties whose values key the messages, e.g. `hostname:port`
+        self.partition_key = tuple(
+            prop
+            for prop in (self.settings.kafka_partition_key or "").split(":")
+            if prop
+        )
+        self.retries = deque()  # (value, sent callback, headers, key) of failed sends
+        self._retries_lock = Lock()
+        self.dropped = 0
+        self._unflushed_bytes = 0
+        self._last_flush = monotonic()
+
+    @property
+    def producer(self):
+        return get_producer(
             bootstrap_server=self.settings.kafka_bootstrap_server,
             security_protocol=self.settings.kafka_security_protocol,
             ssl_cafile=self.settings.kafka_ssl_cafile,
             ssl_keyfile=self.settings.kafka_ssl_keyfile,
             ssl_certfile=self.settings.kafka_ssl_certfile,
             ssl_check_hostname=self.settings.kafka_ssl_check_hostname,
+            linger_ms=self.linger_ms,
+            batch_size=self.batch_bytes,
+            max_in_flight=self.max_in_flight,
+            compression_type=self.compression_type,
+        )
+
+    def sent_callback(self, item, count):
+        """Returns a callback reporting the item as written once `count` sends are done.
+
+        Sends are done when they succeed, or when their message is dropped. Failed
+        sends kept for a retry are only done once the retry succeeds, see
+        :meth:`send_failed`.
+        """
+        remaining = [count]
+        lock = Lock()
+
+        def sent(_):
+            with lock:
+                remaining[0] -= 1
+                done = remaining[0] == 0
+            if done:
+                self.written([item])
+
+        return sent
+
+    def send(self, producer, value, sent, headers=None, key=None):
+        producer.send(
+            self.settings.kafka_writer_topic, value, key=key, headers=headers
+        ).add_callback(sent).add_errback(self.send_failed, value, sent, headers, key)
+        self._unflushed_bytes += len(value)
+
+    def partition_keys(self, batch: EventBatch) -> List[Optional[bytes]]:
+        """Returns the message key of every event of the batch.
+
+        Keys join the values of the :attr:`partition_key` properties with colons, so
+        that Kafka sends all events of e.g. the same hostname to the same partition.
+        Events without any of the properties, and all events if no partition key is
+        configured, are sent without key, to partitions in turn.
+        """
+        if not self.partition_key:
+            return [None] * len(batch)
+        return list(map(self._key, batch.rows(self.partition_key)))
+
+    @staticmethod
+    def _key(values) -> Optional[bytes]:
+        parts = [str(value) for value in values if value is not None]
+        return ":".join(parts).encode("utf-8") if parts else None
+
+    def send_envelope(self, producer, batch, callbacks, key=None):
+        """Sends the events of the batch as one envelope, see :meth:`add_to_envelopes`.
+
+        Args:
+            callbacks (list): The sent callbacks of the items with events in the batch.
+            key (bytes): The partition key shared by the events.
+        """
+
+        def sent(metadata):
+            for callback in callbacks:
+                callback(metadata)
+
+        value = serializer.dumps_envelope(batch, self.envelope_compression, self.codec)
+        headers = serializer.envelope_headers(self.envelope_compression, self.codec)
+        self.send(producer, value, sent, headers, key)
+
+    def add_to_envelopes(self, producer, item, envelopes):
+        """Adds the events of the item to the envelopes pending for their type and key.
+
+        Envelopes are sent as soon as they hold :attr:`envelope_size` events, the
+        events of an item spread over as many envelopes as needed. The item is reported
+        as written once all of these have been sent.
+
+        Args:
+            envelopes (dict): Pending envelopes by event type and partition key, as
+                EventBatches and the sent callbacks of their items, to be sent by
+                :meth:`send_envelopes`.
+
+        Returns:
+            int: The number of events added.
+        """
+        if isinstance(item, EventBatch):
+            batch = item
+        else:
+            event = self.validate_event_type(item, strict=False)
+            batch = EventBatch(event.__class__, [event])
+
+        # Envelopes only hold events of the same key
+        rows_by_key = {}
+        for row, key in enumerate(self.partition_keys(batch)):
+            rows_by_key.setdefault(key, []).append(row)
+        if len(rows_by_key) == 1:
+            groups = {key: batch for key in rows_by_key}
+        else:
+            groups = {key: batch.take(rows) for key, rows in rows_by_key.items()}
+
+        # Count the envelopes the item's events end up in, before sending any
+        envelope_count = 0
+        for key, group in groups.items():
+            pending, _ = envelopes.get((batch.event_type, key), ((), None))
+            overflow = max(0, len(group) - (self.envelope_size - len(pending)))
+            envelope_count += 1 + -(-overflow // self.envelope_size)
+        sent = self.sent_callback(item, envelope_count)
+
+        for key, group in groups.items():
+            pending, callbacks = envelopes.pop((batch.event_type, key), None) or (
+                EventBatch(batch.event_type),
+                [],
+            )
+            start = 0
+            while start < len(group):
+                end = start + self.envelope_size - len(pending)
+                pending.extend(group[start:end])
+                callbacks.append(sent)
+                start = end
+                if len(pending) >= self.envelope_size:
+                    self.send_envelope(producer, pending, callbacks, key)
+                    pending, callbacks = EventBatch(batch.event_type), []
+            if pending:
+                envelopes[(batch.event_type, key)] = (pending, callbacks)
+        return len(batch)
+
+    def send_envelopes(self, producer, envelopes):
+        """Sends the pending envelopes, full or not, and clears them."""
+        for (_, key), (pending, callbacks) in envelopes.items():
+            self.send_envelope(producer, pending, callbacks, key)
+        envelopes.clear()
+
+    def send_events(self, producer, item):
+        """Sends every event of the item as a message of its own.
+
+        Returns:
+            int: The number of events sent.
+        """
+        if isinstance(item, EventBatch):
+            # Serialized in bulk, the producer passes the bytes on as they are
+            values = serializer.dumps_batch(item, self.codec)
+            keys = self.partition_keys(item)
+        else:
+            event = self.validate_event_type(item, strict=False)
+            values = [serializer.dumps(event, self.codec)]
+            keys = [self._key(event.to_tuple(self.partition_key))]
+        sent = self.sent_callback(item, len(values))
+        headers = serializer.codec_headers(self.codec)
+        for value, key in zip(values, keys):
+            self.send(producer, value, sent, headers, key)
+        return len(values)
+
+    def send_failed(self, value, sent, headers, key, excp):
+        """Keeps the message of a failed send in the retry buffer.
+
+        The buffer is bounded by :attr:`retry_buffer_size`, messages failing while it
+        is full, or with an error that is not retriable, are logged and dropped. Their
+        sends are done, so that readers can move past them.
+        """
+        logger.exception(
+            "Sending message to topic failed", exc_info=excp, error=type(excp).__name__
+        )
+        with self._retries_lock:
+            if getattr(excp, "retriable", False) and (
+                len(self.retries) < self.retry_buffer_size
+            ):
+                self.retries.append((value, sent, headers, key))
+                return
+            self.dropped += 1
+        logger.error(
+            "Dropping message that cannot be sent",
+            error=type(excp).__name__,
+            dropped=self.dropped,
         )
+        sent(None)
+
+    def retry(self, producer):
+        """Sends the messages of the retry buffer again."""
+        with self._retries_lock:
+            retries, self.retries = self.retries, deque()
+        if retries:
+            self.logger.info(
+                f"Retrying {len(retries)} failed messages.", retry_count=len(retries)
+            )
+        for value, sent, headers, key in retries:
+            self.send(producer, value, sent, headers, key)
+
+    def flush(self, producer):
+        """Blocks until all messages sent have been acknowledged or have failed."""
+        producer.flush()
+        self._unflushed_bytes = 0
+        self._last_flush = monotonic()
+
+    def flush_due(self) -> bool:
+        return (
+            self._unflushed_bytes >= self.flush_bytes
+            or monotonic() - self._last_flush >= self.flush_interval
+        )
+
+    def write(self, payload):
+        producer = self.producer
+        self.retry(producer)
         count = 0
         event_type = self._type_unset
+        envelopes = {}
+        envelopes_since = monotonic()
+
+        # Streaming readers never exhaust the payload, hence pending envelopes are
+        # sent once they are `envelope_max_age` old, or before the producer flushes
+        for item in self.iter_valid(payload):
+            if self.wire_format == "envelope":
+                if not envelopes:
+                    envelopes_since = monotonic()
+                count += self.add_to_envelopes(producer, item, envelopes)
+            else:
+                count += self.send_events(producer, item)
 
-        for event in payload:
             if event_type is self._type_unset:
-                event_type = event.__class__.__name__
-            producer.send(
-                self.settings.kafka_writer_topic,
-                self.validate_event_type(event, strict=False),
-            ).add_errback(send_error_callback)
-            count += 1
+                item_type = (
+                    item.event_type if isinstance(item, EventBatch) else item.__class__
+                )
+                event_type = item_type.__name__
+            flush_due = self.mode == "async" and self.flush_due()
+            if envelopes and (
+                flush_due or monotonic() - envelopes_since >= self.envelope_max_age
+            ):
+                self.send_envelopes(producer, envelopes)
+            if flush_due:
+                self.flush(producer)
+                self.retry(producer)
+        self.send_envelopes(producer, envelopes)
 
         log_data = dict(
             event_count=count,
@@ -91,4 +405,16 @@ class Plugin(WriterPlugin):
                 f"Posted {count} events to {self.settings.kafka_writer_topic}.",
                 **log_data,
             )
-            producer.flush()
+            if self.mode == "sync":
+                self.flush(producer)
+
+    def stop(self):
+        """Sends the messages left in the retry buffer, and flushes the producer."""
+        producer = self.producer
+        self.retry(producer)
+        self.flush(producer)
+        if self.retries:
+            self.logger.error(
+                f"Could not send {len(self.retries)} messages before shutting down.",
+                retry_count=len(self.retries),
+            )
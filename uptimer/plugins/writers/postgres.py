@@ -1,13 +1,31 @@
-from jsonschema.exceptions import ValidationError
+from collections import Counter
+from functools import partial
+from threading import Lock
+
+from psycopg2 import Error as PostgresError
 from psycopg2 import sql
 from psycopg2.errors import DataError, IntegrityError
-from psycopg2.extras import execute_batch
+from psycopg2.extras import execute_batch, execute_values
 
-from uptimer.events import Event
-from uptimer.helpers.postgres import get_postgres_conn
+from uptimer.events import Event, EventBatch
+from uptimer.helpers.pgcopy import COPY_FORMATS, copy_rows, get_column_types
+from uptimer.helpers.postgres import (
+    DEFAULT_POOL_MAX,
+    DEFAULT_POOL_MIN,
+    get_postgres_pool,
+    get_primary_key,
+)
 from uptimer.helpers.threads import ProcessingThread
+from uptimer.plugins import load_plugin
 from uptimer.plugins.writers import WriterPlugin
 
+INGEST_MODES = ("copy", "insert")
+ON_CONFLICT_MODES = ("error", "ignore", "update")
+QUEUE_OVERFLOW_MODES = ("block", "spill")
+
+ROW_ERRORS = (DataError, IntegrityError)
+"""Errors caused by the values of single rows, which are isolated and dead-lettered."""
+
 
 class Plugin(WriterPlugin):
     plugin_type = "postgres event writer"
@@ -16,100 +34,369 @@ class Plugin(WriterPlugin):
     optional_settings = (
         "postgres_pagesize",
         "postgres_queue_timeout",
+        "postgres_ingest",
+        "postgres_copy_format",
+        "postgres_dead_letter",
+        "postgres_on_conflict",
+        "postgres_pool_min",
+        "postgres_pool_max",
+        "postgres_statement_timeout",
+        "postgres_queue_limit",
+        "postgres_queue_overflow",
     )
 
     def __init__(self, *args, **kwargs):
-        super().__init__()
+        super().__init__(*args, **kwargs)
 
-        self.postgres_conn = get_postgres_conn(self.settings.database_url)
+        self.pool = get_postgres_pool(
+            self.settings.database_url,
+            minconn=int(self.settings.postgres_pool_min or DEFAULT_POOL_MIN),
+            maxconn=int(self.settings.postgres_pool_max or DEFAULT_POOL_MAX),
+            statement_timeout=int(self.settings.postgres_statement_timeout)
+            if self.settings.postgres_statement_timeout
+            else None,
+        )
         self.page_size = self.settings.postgres_pagesize or 5000
         self.timeout = (
             float(self.settings.postgres_queue_timeout)
             if self.settings.postgres_queue_timeout
             else 2.0
         )
+        # Events queued per table before backpressure is applied on the reader
+        self.queue_limit = (
+            int(self.settings.postgres_queue_limit)
+            if self.settings.postgres_queue_limit
+            else 4 * self.page_size
+        )
+        self.queue_overflow = self.settings.postgres_queue_overflow or "block"
+        if self.queue_overflow not in QUEUE_OVERFLOW_MODES:
+            raise ValueError(
+                f"Unknown queue overflow mode {self.queue_overflow}, "
+                f"must be one of {QUEUE_OVERFLOW_MODES}"
+            )
+        self.ingest = self.settings.postgres_ingest or "copy"
+        if self.ingest not in INGEST_MODES:
+            raise ValueError(
+                f"Unknown ingest mode {self.ingest}, must be one of {INGEST_MODES}"
+            )
+        self.copy_format = self.settings.postgres_copy_format or "text"
+        if self.copy_format not in COPY_FORMATS:
+            raise ValueError(
+                f"Unknown COPY format {self.copy_format}, "
+                f"must be one of {COPY_FORMATS}"
+            )
+        self.on_conflict = self.settings.postgres_on_conflict or "error"
+        if self.on_conflict not in ON_CONFLICT_MODES:
+            raise ValueError(
+                f"Unknown conflict mode {self.on_conflict}, "
+                f"must be one of {ON_CONFLICT_MODES}"
+            )
+        self._column_types = {}
+        self._primary_keys = {}
+        self.stats = Counter()
+        self._stats_lock = Lock()
+
+        self.dead_letter_writer = None
+        if self.settings.postgres_dead_letter:
+            self.dead_letter_writer = load_plugin(self.settings.postgres_dead_letter)
 
     def write(self, payload):
+        # Pages of different tables are flushed in parallel, each on a connection of
+        # its own, by as many workers as the pool has connections
+        with ProcessingThread(
+            self.write_callback,
+            page_size=self.page_size,
+            timeout=self.timeout,
+            max_page_weight=self.page_size,
+            workers=self.pool.maxconn,
+            max_queue_size=self.queue_limit,
+            item_weight=self.event_count,
+            spill=self.queue_overflow == "spill",
+        ) as processor:
+            for item in self.iter_valid(payload):
+                if isinstance(item, EventBatch):
+                    processor.put(item, queue_name=item.event_type)
+                else:
+                    processor.put(item, queue_name=item.__class__)
 
-        with self.postgres_conn:
-            with ProcessingThread(
-                self.write_callback,
-                page_size=self.page_size,
-                timeout=self.timeout,
-                connection=self.postgres_conn,
-            ) as processor:
-                for event in payload:
-                    try:
-                        event.validate()
-                    except ValidationError:
-                        self.logger.exception("Error validating event", exc_info=True)
-                        continue
-
-                    processor.put(event, queue_name=event.__class__)
-
-    def write_callback(self, payload, *, connection):
+        high_watermark = max(processor.high_watermarks.values(), default=0)
+        with self._stats_lock:
+            self.stats["queue_high_watermark"] = max(
+                self.stats["queue_high_watermark"], high_watermark
+            )
+        self.logger.info(
+            f"Queued at most {high_watermark} events per table.",
+            queue_high_watermark=high_watermark,
+        )
+
+    @staticmethod
+    def event_count(item):
+        """Weighs queued items by their number of events."""
+        return len(item) if isinstance(item, EventBatch) else 1
+
+    def write_callback(self, payload, *, connection=None):
         if not isinstance(payload, list) or len(payload) == 0:
             raise ValueError("Got unexpected payload")
+        if connection is None:
+            with self.pool.connection() as connection:
+                return self.write_callback(payload, connection=connection)
 
         cursor = connection.cursor()
         first_event = payload[0]
-        table = first_event.__class__.table
-        keys = first_event.__class__.properties
+        event_type = (
+            first_event.event_type
+            if isinstance(first_event, EventBatch)
+            else first_event.__class__
+        )
+        table = event_type.table
+        keys = event_type.properties
+        values = self.to_rows(payload, keys)
+
+        logging_properties = {
+            "event_count": len(values),
+            "event_type": event_type.__name__,
+            "table": table,
+        }
+        self.logger.info(
+            f"Writing {len(values)} {event_type.__name__}s to table {table}.",
+            **logging_properties,
+        )
+
+        self.load_table_info(cursor, table)
+        counts, offending = self.write_page(
+            connection, cursor, table, keys, values, logging_properties
+        )
+        cursor.close()
+
+        counts["skipped"] = (
+            len(values) - counts["inserted"] - counts["updated"] - len(offending)
+        )
+        counts["rejected"] = len(offending)
+        with self._stats_lock:
+            self.stats.update(counts)
+        self.logger.info(
+            f"Wrote {len(values)} {event_type.__name__}s to table {table}: "
+            + ", ".join(f"{count} {name}" for name, count in counts.items()),
+            **logging_properties,
+            **counts,
+        )
+
+        if offending:
+            self.dead_letter(event_type, keys, offending)
+        self.written(payload)
+
+    def load_table_info(self, cursor, table):
+        """Looks up the catalog information of the table the settings require."""
+        if self.copy_format == "binary" and table not in self._column_types:
+            self._column_types[table] = get_column_types(cursor, table)
+        if self.on_conflict != "error" and table not in self._primary_keys:
+            primary_key = get_primary_key(cursor, table)
+            if not primary_key:
+                raise ValueError(
+                    f"Table {table} has no primary key to detect conflicts with"
+                )
+            self._primary_keys[table] = primary_key
+
+    def write_page(self, connection, cursor, table, keys, values, logging_properties):
+        """Writes the rows of a page, falling back to INSERT if COPY fails.
+
+        Returns:
+            tuple: The counts of inserted and updated rows, and the offending rows
+                as returned by :meth:`write_isolating`.
+        """
+        write_rows = self.copy_rows if self.ingest == "copy" else self.insert_rows
+        try:
+            return self.write_isolating(
+                connection, cursor, partial(write_rows, table, keys), values
+            )
+        except (PostgresError, ValueError) as exc:
+            if self.ingest != "copy":
+                self.logger.exception(
+                    "Caught unhandled exception. Reraising.", **logging_properties
+                )
+                raise
+            self.logger.warning(
+                "COPY failed, falling back to INSERT.",
+                **logging_properties,
+                exc_info=exc,
+            )
+            connection.rollback()
+        return self.write_isolating(
+            connection, cursor, partial(self.insert_rows, table, keys), values
+        )
+
+    def copy_rows(self, table, keys, cursor, rows):
+        """Writes the rows with a single COPY statement.
+
+        To resolve conflicts, the rows are copied into a temporary staging table, and
+        inserted into the table from there.
+        """
+        copy_table = table
+        if self.on_conflict != "error":
+            copy_table = f"{table}_staging"
+            cursor.execute(
+                sql.SQL(
+                    "CREATE TEMPORARY TABLE IF NOT EXISTS {staging} (LIKE {table}) "
+                    "ON COMMIT DROP; TRUNCATE {staging}"
+                ).format(
+                    staging=sql.Identifier(copy_table), table=sql.Identifier(table)
+                )
+            )
+        copy_rows(
+            cursor,
+            copy_table,
+            keys,
+            rows,
+            copy_format=self.copy_format,
+            column_types=self._column_types.get(table),
+        )
+        if self.on_conflict == "error":
+            return Counter(inserted=len(rows))
+
+        source = sql.SQL("SELECT {} FROM {}").format(
+            sql.SQL(", ").join(map(sql.Identifier, keys)), sql.Identifier(copy_table)
+        )
+        cursor.execute(self.conflict_query(table, keys, source))
+        return self.conflict_counts(cursor.fetchall())
+
+    def insert_rows(self, table, keys, cursor, rows):
+        """Writes the rows with INSERT statements, sent in pages."""
+        if self.on_conflict != "error":
+            query = self.conflict_query(table, keys, sql.SQL("VALUES %s"))
+            results = execute_values(
+                cursor, query, rows, page_size=self.page_size, fetch=True
+            )
+            return self.conflict_counts(results)
 
         query = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
             sql.Identifier(table),
             sql.SQL(", ").join(map(sql.Identifier, keys)),
             sql.SQL(", ").join(sql.Placeholder() * len(keys)),
         )
+        execute_batch(cursor, query, rows, page_size=self.page_size)
+        return Counter(inserted=len(rows))
 
-        self.logger.debug(f"DB insert query: {query}", query=query)
+    def conflict_query(self, table, keys, source):
+        """Builds the INSERT of rows from `source`, resolving conflicts on the table's
+        primary key.
 
-        values = tuple(
-            Plugin.validate_event_type(
-                event, strict=False, to_tuple_by_keys=keys, ignore_missing_keys=True
+        The query returns whether each row it wrote has been inserted (as opposed to
+        updated). Rows skipped on conflict are not returned. Rows without columns
+        besides the primary key have nothing to update, so they are skipped.
+        """
+        primary_key = self._primary_keys[table]
+        updated = [key for key in keys if key not in primary_key]
+        if self.on_conflict == "ignore" or not updated:
+            action = sql.SQL("NOTHING")
+        else:
+            action = sql.SQL("UPDATE SET ") + sql.SQL(", ").join(
+                sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(key))
+                for key in updated
             )
-            for event in payload
+        return sql.SQL(
+            "INSERT INTO {} ({}) {} ON CONFLICT ({}) DO {} RETURNING (xmax = 0)"
+        ).format(
+            sql.Identifier(table),
+            sql.SQL(", ").join(map(sql.Identifier, keys)),
+            source,
+            sql.SQL(", ").join(map(sql.Identifier, primary_key)),
+            action,
         )
 
-        logging_properties = {
-            "event_count": len(payload),
-            "event_type": first_event.__class__.__name__,
-            "table": table,
-        }
-        self.logger.info(
-            f"Writing {len(payload)} {first_event.__class__.__name__}s "
-            f"to table {table}.",
-            **logging_properties,
-        )
+    @staticmethod
+    def conflict_counts(results):
+        inserted = sum(1 for (is_insert,) in results if is_insert)
+        return Counter(inserted=inserted, updated=len(results) - inserted)
+
+    def write_isolating(self, connection, cursor, write_rows, rows):
+        """Writes the rows in one transaction, isolating rows the database rejects.
 
+        If writing the rows fails on a row-level error (such as a duplicate key, or a
+        value out of range), they are split in half recursively, each half written
+        within a savepoint, until the offending rows are isolated. A few offending
+        rows out of `n` take O(k log n) statements to find, instead of one per row.
+
+        Args:
+            write_rows (:obj:`callable`): Function writing rows through a cursor,
+                returning a :class:`collections.Counter` of the rows written.
+
+        Returns:
+            tuple: The sum of the counts returned by `write_rows`, and a list of
+                tuples of the offending rows and the errors raised writing them.
+        """
         try:
-            execute_batch(cursor, query, values, page_size=self.page_size)
+            counts = write_rows(cursor, rows)
             connection.commit()
-        except IntegrityError as exc:  # UniqueViolation is a subclass of IntegrityError
+            return counts, []
+        except ROW_ERRORS as exc:
+            connection.rollback()
+            if len(rows) == 1:
+                return Counter(), [(rows[0], exc)]
             self.logger.warning(
-                "Caught integrity violation.", **logging_properties, exc_info=exc
-            )
-            connection.commit()
-            self.try_single_inserts(connection, cursor, query, values)
-        except DataError:
-            self.logger.exception("Caught database error.", **logging_properties)
-            connection.commit()
-        except Exception:  # pragma: no cover
-            self.logger.exception(
-                "Caught unhandled exception. Reraising.", **logging_properties
+                f"Caught {type(exc).__name__}, isolating offending rows.",
+                row_count=len(rows),
+                exc_info=exc,
             )
-            raise
-        cursor.close()
 
-    def try_single_inserts(self, connection, cursor, query, values):
-        self.logger.info("Trying insert with single rows")
+        counts, offending = Counter(), []
+        middle = len(rows) // 2
+        self._bisect(cursor, write_rows, rows[:middle], counts, offending)
+        self._bisect(cursor, write_rows, rows[middle:], counts, offending)
+        connection.commit()
+        return counts, offending
+
+    def _bisect(self, cursor, write_rows, rows, counts, offending):
+        cursor.execute("SAVEPOINT isolate_rows")
+        try:
+            written = write_rows(cursor, rows)
+        except ROW_ERRORS as exc:
+            cursor.execute("ROLLBACK TO SAVEPOINT isolate_rows")
+            cursor.execute("RELEASE SAVEPOINT isolate_rows")
+            if len(rows) == 1:
+                offending.append((rows[0], exc))
+                return
+            middle = len(rows) // 2
+            self._bisect(cursor, write_rows, rows[:middle], counts, offending)
+            self._bisect(cursor, write_rows, rows[middle:], counts, offending)
+        else:
+            cursor.execute("RELEASE SAVEPOINT isolate_rows")
+            counts.update(written)
+
+    def dead_letter(self, event_type, keys, offending):
+        """Passes the events of offending rows on to the dead-letter writer."""
+        for row, exc in offending:
+            self.logger.warning(f"Found offending row: {row}", row=row, exc_info=exc)
+        if self.dead_letter_writer is None:
+            return
+
+        events = [
+            event_type._from_slots(
+                row, sum(1 << idx for idx, value in enumerate(row) if value is not None)
+            )
+            for row, _ in offending
+        ]
+        self.logger.info(
+            f"Writing {len(events)} offending {event_type.__name__}s "
+            f"to {self.dead_letter_writer}.",
+            event_count=len(events),
+            event_type=event_type.__name__,
+        )
+        self.dead_letter_writer.write(iter(events))
 
-        for row in values:
-            try:
-                cursor.execute(query, vars=row)
-            except IntegrityError as exc:
-                self.logger.warning(
-                    f"Found offending row: {row}", row=row, exc_info=exc
+    @classmethod
+    def to_rows(cls, payload, keys):
+        """Returns the rows of the payload's events and event batches as tuples."""
+        rows = []
+        for item in payload:
+            if isinstance(item, EventBatch):
+                rows.extend(item.rows(keys))
+            else:
+                rows.append(
+                    cls.validate_event_type(
+                        item,
+                        strict=False,
+                        to_tuple_by_keys=keys,
+                        ignore_missing_keys=True,
+                    )
                 )
-            finally:
-                connection.commit()
+        return tuple(rows)
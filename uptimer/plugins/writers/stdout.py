@@ -1,6 +1,7 @@
 import sys
+from itertools import islice
 
-from uptimer.events import Event
+from uptimer.events import Event, EventBatch
 from uptimer.plugins.writers import WriterPlugin
 
 
@@ -12,15 +13,28 @@ class Stdout(WriterPlugin):
         self.logger.info("Outputting payload to stdout")
 
         truncate = self.settings.stdout_truncate_settings
-        for idx, event in enumerate(payload):
-            if truncate and idx >= truncate:
+        remaining = int(truncate) if truncate else None
+        for item in self.iter_valid(payload):
+            bodies = self.to_json(item)
+            if remaining is not None:
+                bodies = list(islice(bodies, remaining))
+                remaining -= len(bodies)
+            for body in bodies:
+                sys.stdout.write(body + "\n")
+            sys.stdout.flush()
+            # Items cut short by the truncation are reported as well, as they are
+            # never going to be written completely
+            self.written([item])
+            if remaining == 0:
                 break
-            sys.stdout.write(
-                self.validate_event_type(event, strict=False).to_json(
-                    indent=2, sort_keys=2
-                )
-                + "\n"
-            )
+
+    def to_json(self, item):
+        """Returns the serialized events of an event, or of an event batch."""
+        if isinstance(item, EventBatch):
+            return item.iter_json(indent=2, sort_keys=2)
+        return [
+            self.validate_event_type(item, strict=False).to_json(indent=2, sort_keys=2)
+        ]
 
     plugin_type = "Stdout Writer"
 